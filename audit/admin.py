@@ -1,4 +1,5 @@
 from django.contrib import admin
+from swap.utils.msisdn import normalize_msisdn, InvalidMSISDN
 from .models import AuditLog
 
 @admin.register(AuditLog)
@@ -13,3 +14,19 @@ class AuditLogAdmin(admin.ModelAdmin):
 
     readonly_fields = ("created_at",)
 
+    # Date drill-down lets PostgreSQL prune monthly partitions
+    date_hierarchy = "created_at"
+
+    # Skip the unfiltered COUNT(*) over the whole table
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Exact matches hit the (msisdn, created_at) / (event, created_at)
+        # indexes; the default icontains search scans every partition.
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        try:
+            return queryset.filter(msisdn=normalize_msisdn(term)), False
+        except InvalidMSISDN:
+            return queryset.filter(event=term.upper()), False
@@ -0,0 +1,82 @@
+"""
+Gzipped JSONL archives of audit rows that have aged out of the database.
+
+One file per calendar month: ``<ARCHIVE_DIR>/auditlog-YYYY-MM.jsonl.gz``.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+FILE_PREFIX = "auditlog-"
+FILE_SUFFIX = ".jsonl.gz"
+
+
+def archive_dir():
+    return settings.AUDIT_RETENTION["ARCHIVE_DIR"]
+
+
+def archive_path(month):
+    return os.path.join(archive_dir(), f"{FILE_PREFIX}{month.year:04d}-{month.month:02d}{FILE_SUFFIX}")
+
+
+def write_archive(month, rows):
+    """
+    Write ``rows`` (dicts with id, msisdn, event, metadata, created_at) for
+    ``month``. The file is written under a temporary name and renamed, so a
+    crash never leaves a truncated archive behind. Returns the row count.
+    """
+    path = archive_path(month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    count = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            row = {**row, "created_at": row["created_at"].isoformat()}
+            f.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def archived_months():
+    if not os.path.isdir(archive_dir()):
+        return []
+    months = []
+    for name in os.listdir(archive_dir()):
+        if name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX):
+            year, month = name[len(FILE_PREFIX):-len(FILE_SUFFIX)].split("-")
+            months.append(datetime(int(year), int(month), 1, tzinfo=dt_timezone.utc))
+    return sorted(months)
+
+
+def iter_archived(msisdn=None, event=None, since=None, until=None):
+    """
+    Yield archived audit rows matching the filters, oldest month first.
+    Files for months entirely outside [since, until) are never opened.
+    """
+    for month in archived_months():
+        next_month = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+        if since and next_month <= since:
+            continue
+        if until and month >= until:
+            continue
+
+        with gzip.open(archive_path(month), "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if msisdn and row["msisdn"] != msisdn:
+                    continue
+                if event and row["event"] != event:
+                    continue
+                row["created_at"] = parse_datetime(row["created_at"])
+                if since and row["created_at"] < since:
+                    continue
+                if until and row["created_at"] >= until:
+                    continue
+                yield row
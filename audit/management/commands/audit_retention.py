@@ -0,0 +1,108 @@
+from itertools import chain
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from audit import partitions
+from audit.archive import iter_archived, write_archive
+from audit.models import AuditLog
+
+FIELDS = ("id", "msisdn", "event", "metadata", "created_at")
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly audit partitions, then archive months older "
+        "than the retention window to gzipped JSONL and drop them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-months", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        config = settings.AUDIT_RETENTION
+        keep_months = config["KEEP_MONTHS"] if options["keep_months"] is None else options["keep_months"]
+        now = timezone.now()
+        cutoff = partitions.retention_cutoff(now, keep_months)
+
+        if not partitions.is_partitioned():
+            self._archive_unpartitioned(cutoff, options["dry_run"])
+            return
+
+        if not options["dry_run"]:
+            partitions.ensure_future_partitions(now, config["MONTHS_AHEAD"])
+
+        for month, name in partitions.monthly_partitions():
+            if month >= cutoff:
+                break
+            if options["dry_run"]:
+                self.stdout.write(f"Would archive and drop {name}")
+                continue
+
+            archived = list(iter_archived(since=month, until=partitions.add_months(month, 1)))
+            with transaction.atomic():
+                with connection.chunked_cursor() as cursor:
+                    cursor.execute(f'SELECT {", ".join(FIELDS)} FROM "{name}" ORDER BY created_at, id')
+                    count = write_archive(month, chain(archived, (dict(zip(FIELDS, row)) for row in cursor)))
+                partitions.detach_and_drop(name)
+            self.stdout.write(f"Archived {count - len(archived)} rows from {name}")
+
+        self._archive_default(cutoff, options["dry_run"])
+
+    def _archive_default(self, cutoff, dry_run):
+        """Archive DEFAULT-partition rows older than the cutoff, e.g. from before their month had a partition."""
+        oldest = partitions.oldest_default_row()
+        if not oldest:
+            return
+
+        table = partitions.DEFAULT_PARTITION
+        month = partitions.month_start(oldest)
+        while month < cutoff:
+            next_month = partitions.add_months(month, 1)
+            bounds = [month, next_month]
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT {", ".join(FIELDS)} FROM "{table}" '
+                        f"WHERE created_at >= %s AND created_at < %s ORDER BY created_at, id",
+                        bounds,
+                    )
+                    rows = [dict(zip(FIELDS, row)) for row in cursor.fetchall()]
+                if rows and dry_run:
+                    self.stdout.write(f"Would archive {len(rows)} rows for {month:%Y-%m} from {table}")
+                elif rows:
+                    # Keep whatever an earlier run already archived for this month
+                    archived = list(iter_archived(since=month, until=next_month))
+                    write_archive(month, chain(archived, rows))
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'DELETE FROM "{table}" WHERE created_at >= %s AND created_at < %s', bounds)
+                    self.stdout.write(f"Archived {len(rows)} rows for {month:%Y-%m} from {table}")
+            month = next_month
+
+    def _archive_unpartitioned(self, cutoff, dry_run):
+        """Fallback for databases without partitioning: archive and delete by month."""
+        oldest = AuditLog.objects.order_by("created_at").values_list("created_at", flat=True).first()
+        if not oldest:
+            return
+
+        month = partitions.month_start(oldest)
+        while month < cutoff:
+            next_month = partitions.add_months(month, 1)
+            rows = AuditLog.objects.filter(created_at__gte=month, created_at__lt=next_month)
+            if not rows.exists():
+                pass
+            elif dry_run:
+                self.stdout.write(f"Would archive {rows.count()} rows for {month:%Y-%m}")
+            else:
+                # Keep whatever an earlier run already archived for this month
+                archived = list(iter_archived(since=month, until=next_month))
+                with transaction.atomic():
+                    count = write_archive(
+                        month, chain(archived, rows.order_by("created_at", "id").values(*FIELDS).iterator())
+                    )
+                    rows.delete()
+                self.stdout.write(f"Archived {count - len(archived)} rows for {month:%Y-%m}")
+            month = next_month
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from audit.archive import iter_archived
+from audit.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = "Search audit events across the live table and the on-disk archives (JSONL output)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--msisdn")
+        parser.add_argument("--event")
+        parser.add_argument("--since", help="ISO 8601 datetime, inclusive")
+        parser.add_argument("--until", help="ISO 8601 datetime, exclusive")
+
+    def _parse(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+    def handle(self, *args, **options):
+        since = self._parse(options["since"])
+        until = self._parse(options["until"])
+
+        for row in iter_archived(options["msisdn"], options["event"], since, until):
+            self.stdout.write(json.dumps(row, cls=DjangoJSONEncoder))
+
+        live = AuditLog.objects.order_by("created_at", "id")
+        if options["msisdn"]:
+            live = live.filter(msisdn=options["msisdn"])
+        if options["event"]:
+            live = live.filter(event=options["event"])
+        if since:
+            live = live.filter(created_at__gte=since)
+        if until:
+            live = live.filter(created_at__lt=until)
+
+        for row in live.values("id", "msisdn", "event", "metadata", "created_at").iterator():
+            self.stdout.write(json.dumps(row, cls=DjangoJSONEncoder))
@@ -0,0 +1,51 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from audit.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = "Load audit events spooled to disk while the database was unavailable."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"] or settings.AUDIT_BUFFER["SPOOL_PATH"]
+
+        # Move the file aside first so a live worker can keep spooling. A
+        # leftover file from an interrupted replay is finished first.
+        replay_path = f"{path}.replaying"
+        if not os.path.exists(replay_path):
+            if not os.path.exists(path):
+                self.stdout.write("No spool file")
+                return
+            os.replace(path, replay_path)
+
+        # One transaction for the whole file: a replay that stops partway
+        # loads nothing, so the next run can start the file over
+        loaded = 0
+        batch = []
+        with transaction.atomic(), open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                record["created_at"] = parse_datetime(record["created_at"])
+                batch.append(AuditLog(**record))
+                if len(batch) >= options["batch_size"]:
+                    AuditLog.objects.bulk_create(batch)
+                    loaded += len(batch)
+                    batch = []
+            if batch:
+                AuditLog.objects.bulk_create(batch)
+                loaded += len(batch)
+
+        os.remove(replay_path)
+        self.stdout.write(f"Replayed {loaded} audit events")
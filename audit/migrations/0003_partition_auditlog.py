@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+MONTHS_AHEAD = 3
+
+
+def _add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def partition_auditlog(apps, schema_editor):
+    """
+    Rebuild audit_auditlog as a table range-partitioned by month on
+    created_at. PostgreSQL requires the partition key in the primary key,
+    so the table's key becomes (id, created_at); ids still come from one
+    shared sequence. Other databases keep the plain table.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(created_at), max(id) FROM audit_auditlog")
+        oldest, max_id = cursor.fetchone()
+
+        cursor.execute("ALTER TABLE audit_auditlog RENAME TO audit_auditlog_legacy")
+        cursor.execute(
+            "ALTER TABLE audit_auditlog_legacy RENAME CONSTRAINT audit_auditlog_pkey TO audit_auditlog_legacy_pkey"
+        )
+        # Drops the identity sequence so its name can be reused below
+        cursor.execute("ALTER TABLE audit_auditlog_legacy ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute("CREATE SEQUENCE audit_auditlog_id_seq")
+        cursor.execute("""
+            CREATE TABLE audit_auditlog (
+                id bigint NOT NULL DEFAULT nextval('audit_auditlog_id_seq'),
+                msisdn varchar(15) NOT NULL,
+                event varchar(100) NOT NULL,
+                metadata jsonb NULL,
+                created_at timestamp with time zone NOT NULL,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """)
+        cursor.execute("ALTER SEQUENCE audit_auditlog_id_seq OWNED BY audit_auditlog.id")
+        cursor.execute("CREATE TABLE audit_auditlog_default PARTITION OF audit_auditlog DEFAULT")
+
+        now = datetime.now(timezone.utc)
+        month = datetime((oldest or now).year, (oldest or now).month, 1, tzinfo=timezone.utc)
+        last = _add_months(datetime(now.year, now.month, 1, tzinfo=timezone.utc), MONTHS_AHEAD)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE "audit_auditlog_y{month.year:04d}m{month.month:02d}" '
+                f"PARTITION OF audit_auditlog FOR VALUES FROM (%s) TO (%s)",
+                [month, _add_months(month, 1)],
+            )
+            month = _add_months(month, 1)
+
+        cursor.execute("""
+            INSERT INTO audit_auditlog (id, msisdn, event, metadata, created_at)
+            SELECT id, msisdn, event, metadata, created_at FROM audit_auditlog_legacy
+        """)
+        cursor.execute("DROP TABLE audit_auditlog_legacy")
+        if max_id:
+            cursor.execute("SELECT setval('audit_auditlog_id_seq', %s)", [max_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_alter_auditlog_created_at'),
+    ]
+
+    operations = [
+        # The partitioned table has the same columns, so Django's model state
+        # is unchanged and reversing is a no-op.
+        migrations.RunPython(partition_auditlog, migrations.RunPython.noop),
+    ]
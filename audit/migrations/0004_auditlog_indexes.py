@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0003_partition_auditlog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['msisdn', 'created_at'], name='audit_msisdn_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['event', 'created_at'], name='audit_event_created_idx'),
+        ),
+    ]
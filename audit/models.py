@@ -1,8 +1,19 @@
 from django.db import models
+from django.utils import timezone
 
 class AuditLog(models.Model):
     msisdn = models.CharField(max_length=15)
     event = models.CharField(max_length=100)
     metadata = models.JSONField(null=True, blank=True)
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Stamped when the event is logged; buffered rows are inserted later
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # On PostgreSQL the table is range-partitioned by month on created_at
+        # (migration 0003, audit/partitions.py); these indexes cascade to
+        # every partition.
+        indexes = [
+            models.Index(fields=["msisdn", "created_at"], name="audit_msisdn_created_idx"),
+            models.Index(fields=["event", "created_at"], name="audit_event_created_idx"),
+        ]
@@ -0,0 +1,114 @@
+"""
+Monthly range partitions for ``audit_auditlog`` (PostgreSQL only).
+
+Partitions are named ``audit_auditlog_yYYYYmMM`` and cover
+[first of month, first of next month). A DEFAULT partition catches rows
+outside any created range so inserts never fail. PostgreSQL refuses to
+create a partition whose range already has rows in DEFAULT, so
+``ensure_partition`` moves them into the new partition in the same
+transaction.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+TABLE = "audit_auditlog"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def retention_cutoff(now, keep_months):
+    """Months starting before this are archived: the current month plus ``keep_months`` full months are kept."""
+    return add_months(month_start(now), -keep_months)
+
+
+def partition_name(month):
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def ensure_partition(month):
+    month = month_start(month)
+    bounds = [month, add_months(month, 1)]
+    name = partition_name(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return
+
+        in_range = "created_at >= %s AND created_at < %s"
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_range})', bounds)
+        stray = cursor.fetchone()[0]
+        if stray:
+            cursor.execute(f'CREATE TEMP TABLE audit_stray (LIKE "{TABLE}") ON COMMIT DROP')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range} RETURNING *) '
+                f"INSERT INTO audit_stray SELECT * FROM moved",
+                bounds,
+            )
+
+        cursor.execute(f'CREATE TABLE "{name}" PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)', bounds)
+
+        if stray:
+            cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM audit_stray')
+            cursor.execute("DROP TABLE audit_stray")
+
+
+def ensure_future_partitions(now, months_ahead):
+    current = month_start(now)
+    for offset in range(months_ahead + 1):
+        ensure_partition(add_months(current, offset))
+
+
+def monthly_partitions():
+    """[(month_start, table_name)] for every dated partition, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    prefix = f"{TABLE}_y"
+    partitions = []
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        year, month = name[len(prefix):].split("m")
+        partitions.append((datetime(int(year), int(month), 1, tzinfo=dt_timezone.utc), name))
+    return sorted(partitions)
+
+
+def oldest_default_row():
+    """created_at of the oldest row in the DEFAULT partition, or None."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT min(created_at) FROM "{DEFAULT_PARTITION}"')
+        return cursor.fetchone()[0]
+
+
+def detach_and_drop(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+        cursor.execute(f'DROP TABLE "{name}"')
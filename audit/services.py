@@ -1,4 +1,34 @@
+import threading
+
+from django.conf import settings
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_audit_buffer():
+    """The per-process AuditBuffer, or None when buffering is disabled."""
+    global _buffer
+    config = getattr(settings, "AUDIT_BUFFER", {})
+    if not config.get("ENABLED"):
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            from .sink import AuditBuffer
+            _buffer = AuditBuffer(
+                max_events=config.get("MAX_EVENTS", 500),
+                flush_interval=config.get("FLUSH_INTERVAL", 2.0),
+                spool_path=config["SPOOL_PATH"],
+            )
+    return _buffer
+
+
 def log_audit(msisdn, event, metadata=None):
+    buffer = get_audit_buffer()
+    if buffer:
+        buffer.add(msisdn, event, metadata)
+        return
+
     from .models import AuditLog
     AuditLog.objects.create(
         msisdn=msisdn,
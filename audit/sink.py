@@ -0,0 +1,106 @@
+"""
+In-process buffer for audit events.
+
+``log_audit`` hands events to ``AuditBuffer`` (when AUDIT_BUFFER["ENABLED"]),
+which writes them with a single ``bulk_create`` once MAX_EVENTS are queued
+or FLUSH_INTERVAL seconds have passed, and once more at interpreter exit.
+If the database is unavailable the batch is appended to a local JSONL spool
+file; ``python manage.py replay_audit_spool`` loads it back.
+
+Ordering: rows are not inserted in ``log_audit`` call order. An event
+enters the buffer when its caller's transaction commits, which may be
+after events logged later by shorter transactions. Spooled events are only
+inserted when the spool is replayed, after anything flushed meanwhile.
+``created_at`` is stamped when ``log_audit`` is called, so sort on it.
+
+Events are only buffered once the caller's transaction commits, so a
+rolled-back request still leaves no audit row, as with the direct write.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from functools import partial
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    def __init__(self, max_events, flush_interval, spool_path):
+        self.max_events = max_events
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self._events = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._stop = threading.Event()
+        atexit.register(self.close)
+
+    def add(self, msisdn, event, metadata=None):
+        record = {
+            "msisdn": msisdn,
+            "event": event,
+            "metadata": metadata,
+            "created_at": timezone.now(),
+        }
+        transaction.on_commit(partial(self._append, record))
+
+    def _append(self, record):
+        with self._lock:
+            self._events.append(record)
+            full = len(self._events) >= self.max_events
+            self._ensure_timer()
+        if full:
+            self.flush()
+
+    def _ensure_timer(self):
+        if self._timer is None or not self._timer.is_alive():
+            self._timer = threading.Thread(target=self._run_timer, name="audit-flush", daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def close(self):
+        """Stop the timer thread and write what is left; run at exit."""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join(timeout=self.flush_interval)
+        return self.flush()
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of events flushed."""
+        from audit.models import AuditLog
+
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+            if not events:
+                return 0
+
+            try:
+                AuditLog.objects.bulk_create([AuditLog(**e) for e in events])
+            except DatabaseError as e:
+                logger.error(f"Audit flush failed, spooling {len(events)} events: {e}")
+                self._spool(events)
+            return len(events)
+
+    def _spool(self, events):
+        os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            for e in events:
+                # isoformat() keeps microseconds; DjangoJSONEncoder rounds to ms
+                record = {**e, "created_at": e["created_at"].isoformat()}
+                f.write(json.dumps(record, cls=DjangoJSONEncoder) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
@@ -1,3 +1,163 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from audit import partitions
+from audit.archive import iter_archived
+from audit.models import AuditLog
+from audit.sink import AuditBuffer
+
+
+def utc(year, month, day=1):
+    return datetime(year, month, day, tzinfo=dt_timezone.utc)
+
+
+class AuditBufferTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool_path = os.path.join(directory.name, "spool", "audit.jsonl")
+        self.buffer = AuditBuffer(max_events=3, flush_interval=3600, spool_path=self.spool_path)
+
+    def log(self, count, start=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(start, start + count):
+                self.buffer.add(f"2547000001{i:02d}", "SWAP_STARTED", {"n": i})
+
+    def test_flushes_when_full_and_on_demand(self):
+        self.log(2)
+        self.assertFalse(AuditLog.objects.exists())
+        self.log(1, start=2)
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+        self.log(1, start=3)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(sorted(m["n"] for m in AuditLog.objects.values_list("metadata", flat=True)), [0, 1, 2, 3])
+
+    def test_close_stops_the_timer_and_flushes(self):
+        self.log(1)
+        timer = self.buffer._timer
+        self.assertTrue(timer.is_alive())
+
+        self.assertEqual(self.buffer.close(), 1)
+        self.assertFalse(timer.is_alive())
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+    def test_events_wait_for_commit(self):
+        self.buffer.add("254700000100", "SWAP_STARTED")
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_spools_on_failure_then_replays(self):
+        with mock.patch.object(AuditLog.objects, "bulk_create", side_effect=DatabaseError("down")):
+            self.log(3)
+        self.assertFalse(AuditLog.objects.exists())
+        with open(self.spool_path) as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+        call_command("replay_audit_spool", path=self.spool_path, batch_size=2, stdout=io.StringIO())
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertFalse(os.path.exists(self.spool_path))
+        self.assertFalse(os.path.exists(f"{self.spool_path}.replaying"))
+
+    def test_interrupted_replay_loads_nothing_twice(self):
+        with mock.patch.object(AuditLog.objects, "bulk_create", side_effect=DatabaseError("down")):
+            self.log(3)
+
+        real_bulk_create = AuditLog.objects.bulk_create
+        calls = []
+
+        def fail_second_batch(objs, *args, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 2:
+                raise DatabaseError("lost connection")
+            return real_bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(AuditLog.objects, "bulk_create", side_effect=fail_second_batch):
+            with self.assertRaises(DatabaseError):
+                call_command("replay_audit_spool", path=self.spool_path, batch_size=2, stdout=io.StringIO())
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertTrue(os.path.exists(f"{self.spool_path}.replaying"))
+
+        call_command("replay_audit_spool", path=self.spool_path, batch_size=2, stdout=io.StringIO())
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+
+class PartitionMonthTests(SimpleTestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(partitions.month_start(utc(2026, 3, 31) + timedelta(hours=5)), utc(2026, 3))
+        self.assertEqual(partitions.add_months(utc(2026, 11), 2), utc(2027, 1))
+        self.assertEqual(partitions.add_months(utc(2026, 1), -1), utc(2025, 12))
+        self.assertEqual(partitions.add_months(utc(2026, 3), -27), utc(2023, 12))
+        self.assertEqual(partitions.partition_name(utc(2026, 3)), "audit_auditlog_y2026m03")
+
+    def test_retention_cutoff(self):
+        now = utc(2026, 3, 15)
+        self.assertEqual(partitions.retention_cutoff(now, 12), utc(2025, 3))
+        # 0 keeps only the current month
+        self.assertEqual(partitions.retention_cutoff(now, 0), utc(2026, 3))
+
+
+class AuditRetentionTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        retention = {**settings.AUDIT_RETENTION, "ARCHIVE_DIR": directory.name, "MONTHS_AHEAD": 1}
+        override = override_settings(AUDIT_RETENTION=retention)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def retention(self, **options):
+        out = io.StringIO()
+        call_command("audit_retention", stdout=out, **options)
+        return out.getvalue()
+
+    def test_keep_months_zero_archives_everything_before_this_month(self):
+        last_month = partitions.add_months(partitions.month_start(timezone.now()), -1)
+        AuditLog.objects.create(msisdn="254700000200", event="OLD", created_at=last_month + timedelta(days=3))
+        AuditLog.objects.create(msisdn="254700000200", event="NEW")
+
+        self.retention(keep_months=0)
+        self.assertEqual(list(AuditLog.objects.values_list("event", flat=True)), ["NEW"])
+        self.assertEqual([r["event"] for r in iter_archived()], ["OLD"])
+
+    def test_later_rows_are_added_to_an_archived_month(self):
+        last_month = partitions.add_months(partitions.month_start(timezone.now()), -1)
+        AuditLog.objects.create(msisdn="254700000202", event="FIRST", created_at=last_month + timedelta(days=1))
+        self.retention(keep_months=0)
+
+        # e.g. replayed from the spool after the month was archived
+        AuditLog.objects.create(msisdn="254700000202", event="LATE", created_at=last_month + timedelta(days=2))
+        self.retention(keep_months=0)
+
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual([r["event"] for r in iter_archived()], ["FIRST", "LATE"])
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "needs a partitioned audit table")
+    def test_default_partition_rows(self):
+        if not partitions.is_partitioned():
+            self.skipTest("audit table is not partitioned")
+        future = partitions.add_months(partitions.month_start(timezone.now()), 24)
+        ancient = utc(2001, 5, 2)
+        AuditLog.objects.create(msisdn="254700000201", event="FUTURE", created_at=future)
+        AuditLog.objects.create(msisdn="254700000201", event="ANCIENT", created_at=ancient)
+
+        # Creating the future month's partition moves its row out of DEFAULT
+        partitions.ensure_partition(future)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT event FROM "{partitions.partition_name(future)}"')
+            self.assertEqual(cursor.fetchall(), [("FUTURE",)])
+
+        self.retention()
+        self.assertEqual(list(AuditLog.objects.values_list("event", flat=True)), ["FUTURE"])
+        self.assertEqual([r["event"] for r in iter_archived()], ["ANCIENT"])
 
-# Create your tests here.
@@ -0,0 +1,190 @@
+# Generated by blockchain/compile_contracts.py from blockchain/abis/*.json. Do not edit.
+
+ABIS = {'AccessControl': [{'inputs': [], 'stateMutability': 'nonpayable', 'type': 'constructor'},
+                   {'anonymous': False,
+                    'inputs': [{'indexed': True, 'internalType': 'bytes32', 'name': 'role', 'type': 'bytes32'},
+                               {'indexed': True, 'internalType': 'address', 'name': 'account', 'type': 'address'},
+                               {'indexed': True, 'internalType': 'address', 'name': 'sender', 'type': 'address'},
+                               {'indexed': False, 'internalType': 'uint256', 'name': 'timestamp', 'type': 'uint256'}],
+                    'name': 'RoleGranted',
+                    'type': 'event'},
+                   {'anonymous': False,
+                    'inputs': [{'indexed': True, 'internalType': 'bytes32', 'name': 'role', 'type': 'bytes32'},
+                               {'indexed': True, 'internalType': 'address', 'name': 'account', 'type': 'address'},
+                               {'indexed': True, 'internalType': 'address', 'name': 'sender', 'type': 'address'},
+                               {'indexed': False, 'internalType': 'uint256', 'name': 'timestamp', 'type': 'uint256'}],
+                    'name': 'RoleRevoked',
+                    'type': 'event'},
+                   {'inputs': [],
+                    'name': 'ADMIN_ROLE',
+                    'outputs': [{'internalType': 'bytes32', 'name': '', 'type': 'bytes32'}],
+                    'stateMutability': 'view',
+                    'type': 'function'},
+                   {'inputs': [],
+                    'name': 'AGENT_ROLE',
+                    'outputs': [{'internalType': 'bytes32', 'name': '', 'type': 'bytes32'}],
+                    'stateMutability': 'view',
+                    'type': 'function'},
+                   {'inputs': [],
+                    'name': 'SYSTEM_ROLE',
+                    'outputs': [{'internalType': 'bytes32', 'name': '', 'type': 'bytes32'}],
+                    'stateMutability': 'view',
+                    'type': 'function'},
+                   {'inputs': [{'internalType': 'address', 'name': 'account', 'type': 'address'}],
+                    'name': 'getAgentType',
+                    'outputs': [{'internalType': 'string', 'name': '', 'type': 'string'}],
+                    'stateMutability': 'view',
+                    'type': 'function'},
+                   {'inputs': [{'internalType': 'address', 'name': 'account', 'type': 'address'},
+                               {'internalType': 'string', 'name': 'agentType', 'type': 'string'}],
+                    'name': 'grantAgentRole',
+                    'outputs': [],
+                    'stateMutability': 'nonpayable',
+                    'type': 'function'},
+                   {'inputs': [{'internalType': 'bytes32', 'name': 'role', 'type': 'bytes32'},
+                               {'internalType': 'address', 'name': 'account', 'type': 'address'}],
+                    'name': 'grantRole',
+                    'outputs': [],
+                    'stateMutability': 'nonpayable',
+                    'type': 'function'},
+                   {'inputs': [{'internalType': 'bytes32', 'name': 'role', 'type': 'bytes32'},
+                               {'internalType': 'address', 'name': 'account', 'type': 'address'}],
+                    'name': 'hasRole',
+                    'outputs': [{'internalType': 'bool', 'name': '', 'type': 'bool'}],
+                    'stateMutability': 'view',
+                    'type': 'function'},
+                   {'inputs': [],
+                    'name': 'owner',
+                    'outputs': [{'internalType': 'address', 'name': '', 'type': 'address'}],
+                    'stateMutability': 'view',
+                    'type': 'function'},
+                   {'inputs': [{'internalType': 'bytes32', 'name': 'role', 'type': 'bytes32'},
+                               {'internalType': 'address', 'name': 'account', 'type': 'address'}],
+                    'name': 'revokeRole',
+                    'outputs': [],
+                    'stateMutability': 'nonpayable',
+                    'type': 'function'}],
+ 'SIMSwapManager': [{'inputs': [], 'stateMutability': 'nonpayable', 'type': 'constructor'},
+                    {'anonymous': False,
+                     'inputs': [{'indexed': True, 'internalType': 'bytes32', 'name': 'swapId', 'type': 'bytes32'},
+                                {'indexed': True, 'internalType': 'address', 'name': 'approver', 'type': 'address'},
+                                {'indexed': False, 'internalType': 'uint256', 'name': 'timestamp', 'type': 'uint256'}],
+                     'name': 'SIMSwapApproved',
+                     'type': 'event'},
+                    {'anonymous': False,
+                     'inputs': [{'indexed': True, 'internalType': 'bytes32', 'name': 'swapId', 'type': 'bytes32'},
+                                {'indexed': True, 'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'},
+                                {'indexed': False, 'internalType': 'uint256', 'name': 'timestamp', 'type': 'uint256'}],
+                     'name': 'SIMSwapInitiated',
+                     'type': 'event'},
+                    {'anonymous': False,
+                     'inputs': [{'indexed': True, 'internalType': 'bytes32', 'name': 'swapId', 'type': 'bytes32'},
+                                {'indexed': False,
+                                 'internalType': 'enum SIMSwapManager.VerificationType',
+                                 'name': 'verificationType',
+                                 'type': 'uint8'},
+                                {'indexed': False, 'internalType': 'uint256', 'name': 'timestamp', 'type': 'uint256'}],
+                     'name': 'VerificationCompleted',
+                     'type': 'event'},
+                    {'inputs': [{'internalType': 'bytes32', 'name': 'swapId', 'type': 'bytes32'}],
+                     'name': 'approveSIMSwap',
+                     'outputs': [],
+                     'stateMutability': 'nonpayable',
+                     'type': 'function'},
+                    {'inputs': [{'internalType': 'bytes32', 'name': 'swapId', 'type': 'bytes32'},
+                                {'internalType': 'enum SIMSwapManager.VerificationType',
+                                 'name': 'verificationType',
+                                 'type': 'uint8'}],
+                     'name': 'completeVerification',
+                     'outputs': [],
+                     'stateMutability': 'nonpayable',
+                     'type': 'function'},
+                    {'inputs': [{'internalType': 'bytes32', 'name': 'swapId', 'type': 'bytes32'}],
+                     'name': 'getSwapDetails',
+                     'outputs': [{'components': [{'internalType': 'bytes32', 'name': 'swapId', 'type': 'bytes32'},
+                                                 {'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'},
+                                                 {'internalType': 'bytes32', 'name': 'oldSimHash', 'type': 'bytes32'},
+                                                 {'internalType': 'bytes32', 'name': 'newSimHash', 'type': 'bytes32'},
+                                                 {'internalType': 'enum SIMSwapManager.SwapStatus',
+                                                  'name': 'status',
+                                                  'type': 'uint8'},
+                                                 {'internalType': 'bool',
+                                                  'name': 'personalDetailsVerified',
+                                                  'type': 'bool'},
+                                                 {'internalType': 'bool', 'name': 'biometricVerified', 'type': 'bool'},
+                                                 {'internalType': 'bool', 'name': 'idDocumentVerified', 'type': 'bool'},
+                                                 {'internalType': 'bool',
+                                                  'name': 'securityQuestionsVerified',
+                                                  'type': 'bool'},
+                                                 {'internalType': 'address', 'name': 'approver', 'type': 'address'},
+                                                 {'internalType': 'uint256', 'name': 'timestamp', 'type': 'uint256'}],
+                                  'internalType': 'struct SIMSwapManager.SIMSwap',
+                                  'name': '',
+                                  'type': 'tuple'}],
+                     'stateMutability': 'view',
+                     'type': 'function'},
+                    {'inputs': [{'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'}],
+                     'name': 'getUserSwapHistory',
+                     'outputs': [{'internalType': 'bytes32[]', 'name': '', 'type': 'bytes32[]'}],
+                     'stateMutability': 'view',
+                     'type': 'function'},
+                    {'inputs': [{'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'},
+                                {'internalType': 'bytes32', 'name': 'oldSimHash', 'type': 'bytes32'},
+                                {'internalType': 'bytes32', 'name': 'newSimHash', 'type': 'bytes32'}],
+                     'name': 'initiateSIMSwap',
+                     'outputs': [{'internalType': 'bytes32', 'name': '', 'type': 'bytes32'}],
+                     'stateMutability': 'nonpayable',
+                     'type': 'function'},
+                    {'inputs': [],
+                     'name': 'owner',
+                     'outputs': [{'internalType': 'address', 'name': '', 'type': 'address'}],
+                     'stateMutability': 'view',
+                     'type': 'function'}],
+ 'UserRegistry': [{'inputs': [], 'stateMutability': 'nonpayable', 'type': 'constructor'},
+                  {'anonymous': False,
+                   'inputs': [{'indexed': True, 'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'},
+                              {'indexed': False,
+                               'internalType': 'bytes32',
+                               'name': 'newIdentityHash',
+                               'type': 'bytes32'},
+                              {'indexed': False, 'internalType': 'uint256', 'name': 'timestamp', 'type': 'uint256'}],
+                   'name': 'IdentityUpdated',
+                   'type': 'event'},
+                  {'anonymous': False,
+                   'inputs': [{'indexed': True, 'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'},
+                              {'indexed': False, 'internalType': 'bytes32', 'name': 'identityHash', 'type': 'bytes32'},
+                              {'indexed': False, 'internalType': 'uint256', 'name': 'timestamp', 'type': 'uint256'}],
+                   'name': 'UserRegistered',
+                   'type': 'event'},
+                  {'inputs': [{'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'}],
+                   'name': 'getRegistrationTimestamp',
+                   'outputs': [{'internalType': 'uint256', 'name': '', 'type': 'uint256'}],
+                   'stateMutability': 'view',
+                   'type': 'function'},
+                  {'inputs': [{'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'}],
+                   'name': 'getUserIdentity',
+                   'outputs': [{'internalType': 'bytes32', 'name': '', 'type': 'bytes32'}],
+                   'stateMutability': 'view',
+                   'type': 'function'},
+                  {'inputs': [{'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'}],
+                   'name': 'isUserRegistered',
+                   'outputs': [{'internalType': 'bool', 'name': '', 'type': 'bool'}],
+                   'stateMutability': 'view',
+                   'type': 'function'},
+                  {'inputs': [],
+                   'name': 'owner',
+                   'outputs': [{'internalType': 'address', 'name': '', 'type': 'address'}],
+                   'stateMutability': 'view',
+                   'type': 'function'},
+                  {'inputs': [{'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'},
+                              {'internalType': 'bytes32', 'name': 'identityHash', 'type': 'bytes32'}],
+                   'name': 'registerUser',
+                   'outputs': [],
+                   'stateMutability': 'nonpayable',
+                   'type': 'function'},
+                  {'inputs': [{'internalType': 'bytes32', 'name': 'phoneHash', 'type': 'bytes32'},
+                              {'internalType': 'bytes32', 'name': 'newIdentityHash', 'type': 'bytes32'}],
+                   'name': 'updateIdentity',
+                   'outputs': [],
+                   'stateMutability': 'nonpayable',
+                   'type': 'function'}]}
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Block, BlockchainTransaction
+from .models import Block, BlockchainTransaction, TransactionIntent
 
 @admin.register(Block)
 class BlockAdmin(admin.ModelAdmin):
@@ -42,4 +42,23 @@ class BlockchainTransactionAdmin(admin.ModelAdmin):
 
     @admin.display(description='Transaction Hash')
     def tx_hash_short(self, obj):
-        return f"{obj.tx_hash[:12]}..." if obj.tx_hash else "-"
\ No newline at end of file
+        return f"{obj.tx_hash[:12]}..." if obj.tx_hash else "-"
+
+
+@admin.register(TransactionIntent)
+class TransactionIntentAdmin(admin.ModelAdmin):
+    list_display = (
+        'function_name',
+        'status',
+        'attempts',
+        'nonce',
+        'tx_hash',
+        'request_id',
+        'created_at',
+        'submitted_at'
+    )
+
+    list_filter = ('status', 'function_name')
+    search_fields = ('idempotency_key', 'tx_hash', 'request_id', 'user_id')
+    readonly_fields = ('created_at', 'submitted_at')
+    ordering = ('-created_at',)
@@ -1,13 +1,20 @@
 import os
 import json
-from solcx import compile_files, install_solc
+import pprint
+import sys
+
+ABI_DIR = 'blockchain/abis'
+ABI_CACHE = 'blockchain/abi_cache.py'
+
 
 def compile_contracts():
+    from solcx import compile_files, install_solc
+
     print("Installing solc 0.8.20...")
     install_solc('0.8.20')
 
     contract_dir = 'blockchain/contracts'
-    abi_dir = 'blockchain/abis'
+    abi_dir = ABI_DIR
     os.makedirs(abi_dir, exist_ok=True)
 
     contracts = [
@@ -39,5 +46,31 @@ def compile_contracts():
         with open(bytecode_file, 'w') as f:
             f.write(bytecode)
 
+    write_abi_cache()
+
+
+def write_abi_cache(abi_dir=ABI_DIR, path=ABI_CACHE):
+    """
+    Write every ABI in abi_dir into one Python module as literals. The
+    service imports it from bytecode instead of parsing the JSON files
+    (see blockchain.services.load_abi).
+    """
+    abis = {}
+    for filename in sorted(os.listdir(abi_dir)):
+        if filename.endswith('.json'):
+            with open(os.path.join(abi_dir, filename)) as f:
+                abis[filename[:-len('.json')]] = json.load(f)
+
+    with open(path, 'w') as f:
+        f.write("# Generated by blockchain/compile_contracts.py from blockchain/abis/*.json. Do not edit.\n\n")
+        f.write(f"ABIS = {pprint.pformat(abis, indent=1, width=120, sort_dicts=False)}\n")
+
+    print(f"Wrote ABI cache for {', '.join(abis)} to {path}")
+
+
 if __name__ == "__main__":
-    compile_contracts()
+    # --cache-only: rebuild the ABI cache from the existing JSON, without solc
+    if "--cache-only" in sys.argv:
+        write_abi_cache()
+    else:
+        compile_contracts()
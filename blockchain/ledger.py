@@ -0,0 +1,152 @@
+from django.db import transaction
+from django.utils import timezone
+
+from blockchain.merkle import merkle_proof, merkle_root
+from blockchain.models import Block, LedgerBatch, LedgerCheckpoint, LedgerHead
+
+HEAD_ID = 1
+
+
+def append_block(event, msisdn):
+    """
+    Append one block to the hash chain in constant time.
+
+    The single LedgerHead row is locked for the duration of the append, so
+    the previous hash is read without scanning Block and parallel writers
+    serialize on that row. The hash is computed before the one INSERT, and
+    the unique index on Block.index rejects any fork that slips through.
+    """
+    return append_blocks([(event, msisdn)])[0]
+
+
+def append_blocks(entries):
+    """
+    Append ``(event, msisdn)`` entries in order, locking the head once and
+    inserting every block with one bulk INSERT. Returns the blocks.
+    """
+    if not entries:
+        return []
+
+    with transaction.atomic():
+        head, _ = LedgerHead.objects.select_for_update().get_or_create(pk=HEAD_ID)
+
+        blocks = []
+        index, previous_hash = head.index, head.hash
+        for event, msisdn in entries:
+            index += 1
+            block = Block(
+                index=index,
+                timestamp=timezone.now(),
+                event=event,
+                msisdn=msisdn,
+                previous_hash=previous_hash,
+            )
+            block.hash = previous_hash = block.calculate_hash()
+            blocks.append(block)
+        Block.objects.bulk_create(blocks)
+
+        LedgerHead.objects.filter(pk=HEAD_ID).update(index=index, hash=previous_hash)
+
+    return blocks
+
+
+def seal_batches(batch_size, flush=False):
+    """
+    Group unsealed blocks into LedgerBatch rows of ``batch_size`` blocks.
+    A trailing partial batch is only sealed when ``flush`` is set.
+    Returns the batches created.
+    """
+    last = LedgerBatch.objects.order_by("-end_index").first()
+    next_index = last.end_index + 1 if last else 1
+    tip = LedgerHead.objects.filter(pk=HEAD_ID).values_list("index", flat=True).first() or 0
+
+    created = []
+    while next_index <= tip:
+        end_index = min(next_index + batch_size - 1, tip)
+        if end_index - next_index + 1 < batch_size and not flush:
+            break
+
+        hashes = list(
+            Block.objects
+            .filter(index__range=(next_index, end_index))
+            .order_by("index")
+            .values_list("hash", flat=True)
+        )
+        created.append(LedgerBatch.objects.create(
+            start_index=next_index,
+            end_index=end_index,
+            merkle_root=merkle_root(hashes),
+        ))
+        next_index = end_index + 1
+
+    return created
+
+
+def verify_chain(chunk_size=5000):
+    """
+    Re-hash only the blocks appended since the last checkpoint.
+
+    Stops at the first block whose link or hash does not match, records it
+    as ``broken_index`` and leaves the checkpoint just before it.
+    Returns the updated LedgerCheckpoint.
+    """
+    checkpoint, _ = LedgerCheckpoint.objects.get_or_create(pk=HEAD_ID)
+    expected_index = checkpoint.verified_index + 1
+    previous_hash = checkpoint.verified_hash
+    broken_index = None
+
+    blocks = (
+        Block.objects
+        .filter(index__gte=expected_index)
+        .order_by("index")
+        .iterator(chunk_size=chunk_size)
+    )
+    for block in blocks:
+        if (
+            block.index != expected_index
+            or block.previous_hash != previous_hash
+            or block.hash != block.calculate_hash()
+        ):
+            broken_index = expected_index
+            break
+        previous_hash = block.hash
+        expected_index += 1
+
+    checkpoint.verified_index = expected_index - 1
+    checkpoint.verified_hash = previous_hash
+    checkpoint.broken_index = broken_index
+    checkpoint.verified_at = timezone.now()
+    checkpoint.save()
+    return checkpoint
+
+
+def inclusion_proof(block):
+    """
+    Merkle proof that ``block`` is part of its sealed batch, or None if
+    unsealed. Only batch roots are stored, so each proof reads the batch's
+    block hashes and rebuilds the tree: O(batch size), at most
+    BLOCKCHAIN_CONFIG["LEDGER_BATCH_SIZE"] hashes.
+    """
+    batch = LedgerBatch.objects.filter(
+        start_index__lte=block.index, end_index__gte=block.index
+    ).first()
+    if not batch:
+        return None
+
+    hashes = list(
+        Block.objects
+        .filter(index__range=(batch.start_index, batch.end_index))
+        .order_by("index")
+        .values_list("hash", flat=True)
+    )
+    return batch, merkle_proof(hashes, block.index - batch.start_index)
+
+
+def chain_integrity():
+    """VERIFIED, PENDING (checkpoint behind the tip) or BROKEN, without re-hashing."""
+    checkpoint = LedgerCheckpoint.objects.filter(pk=HEAD_ID).first()
+    if checkpoint and checkpoint.broken_index:
+        return "BROKEN"
+    tip = LedgerHead.objects.filter(pk=HEAD_ID).values_list("index", flat=True).first() or 0
+    verified = checkpoint.verified_index if checkpoint else 0
+    return "VERIFIED" if verified >= tip else "PENDING"
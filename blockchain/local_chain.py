@@ -0,0 +1,51 @@
+"""
+In-process stand-in for Base Sepolia. Deploys the contracts from
+blockchain/abis to an eth-tester chain and points a BlockchainService at it
+with the chain's first funded account as the signer. eth-tester mines every
+transaction as it is sent.
+
+    with local_chain() as w3:
+        ...  # blockchain_service sends real, signed transactions to w3
+
+Needs the eth-tester and py-evm packages (`pip install "web3[tester]"`).
+"""
+import contextlib
+import os
+
+from blockchain.services import CONTRACT_NAMES, DEFAULT_ABI_DIR, blockchain_service, load_abi
+
+
+def deploy_contracts(w3, deployer):
+    """Deploy every contract in CONTRACT_NAMES. Returns {contract key: address}."""
+    addresses = {}
+    for name, contract_name in CONTRACT_NAMES.items():
+        with open(os.path.join(DEFAULT_ABI_DIR, f"{contract_name}_bytecode.txt")) as f:
+            bytecode = f.read().strip()
+        contract = w3.eth.contract(abi=load_abi(contract_name), bytecode=bytecode)
+        tx_hash = contract.constructor().transact({"from": deployer})
+        addresses[name] = w3.eth.wait_for_transaction_receipt(tx_hash).contractAddress
+    return addresses
+
+
+@contextlib.contextmanager
+def local_chain(service=blockchain_service):
+    from web3 import EthereumTesterProvider, Web3
+
+    provider = EthereumTesterProvider()
+    w3 = Web3(provider)
+    key = provider.ethereum_tester.backend.account_keys[0]
+    addresses = deploy_contracts(w3, w3.eth.accounts[0])
+
+    saved = vars(service).copy()
+    vars(service).clear()
+    service.__init__()
+    service.enabled = True
+    service.contract_addresses = addresses
+    service.private_key = key.to_hex()
+    service.chain_id = w3.eth.chain_id
+    service.w3 = w3
+    try:
+        yield w3
+    finally:
+        vars(service).clear()
+        vars(service).update(saved)
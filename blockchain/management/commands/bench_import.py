@@ -0,0 +1,85 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+MARKER = "-- first use --\n"
+
+# What a worker does at boot, then the first blockchain call of a request
+CHILD = """
+import sys
+import time
+import django
+django.setup()
+import swap.views, vetting.views
+from blockchain.services import blockchain_service
+sys.stderr.write({marker!r})
+started = time.perf_counter()
+blockchain_service.contracts
+print(time.perf_counter() - started)
+""".format(marker=MARKER)
+
+MODULES = ("swap.views", "blockchain.services", "web3", "eth_account")
+
+
+def parse_importtime(stderr):
+    """Cumulative microseconds per module imported at boot, and the total of top-level imports."""
+    cumulative, total = {}, 0
+    for line in stderr.split(MARKER)[0].splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        cum = int(cum)
+        if not name[1:].startswith(" "):
+            total += cum
+        cumulative.setdefault(name.strip(), cum)
+    return cumulative, total
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold start with `python -X importtime`: import the views with blockchain enabled "
+        "in fresh interpreters, then time the first use of blockchain_service."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **options):
+        env = {
+            **os.environ,
+            "ENABLE_BLOCKCHAIN": "true",
+            # Throwaway key and addresses so the service has a wallet and contracts to build
+            "BLOCKCHAIN_PRIVATE_KEY": "0x" + "11" * 32,
+            "CONTRACT_USER_REGISTRY": "0x" + "22" * 20,
+            "CONTRACT_SIM_SWAP_MANAGER": "0x" + "33" * 20,
+            "CONTRACT_ACCESS_CONTROL": "0x" + "44" * 20,
+        }
+
+        runs = []
+        for _ in range(options["runs"]):
+            started = time.perf_counter()
+            child = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", CHILD],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            wall = time.perf_counter() - started
+            cumulative, total = parse_importtime(child.stderr)
+            runs.append({
+                "processSeconds": wall,
+                "importSeconds": total / 1e6,
+                "firstUseSeconds": float(child.stdout.strip().splitlines()[-1]),
+                **{name: cumulative.get(name, 0) / 1e6 for name in MODULES},
+            })
+
+        self.stdout.write(json.dumps({
+            "runs": len(runs),
+            "medianSeconds": {
+                key: round(statistics.median(run[key] for run in runs), 4)
+                for key in runs[0]
+            },
+        }, indent=2))
@@ -0,0 +1,46 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from blockchain.pipeline import blockchain_config
+from blockchain.receipts import ReceiptPoller, pipeline_metrics
+from blockchain.services import blockchain_service
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Move PENDING BlockchainTransaction rows to CONFIRMED/FAILED from their receipts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--workers", type=int, default=None, help="Concurrent receipt lookups")
+        parser.add_argument("--once", action="store_true", help="Make a single pass and exit")
+
+    def handle(self, *args, **options):
+        if not blockchain_service.enabled or not blockchain_service.w3:
+            self.stderr.write("Blockchain is disabled; nothing to poll.")
+            return
+
+        poller = ReceiptPoller(
+            blockchain_service.w3,
+            batch_size=options["batch_size"],
+            max_workers=options["workers"],
+        )
+        block_time = blockchain_config("BLOCK_TIME", 2.0)
+        max_backoff = blockchain_config("RECEIPT_MAX_BACKOFF", 30.0)
+        delay = block_time
+
+        while True:
+            resolved = poller.run_once()
+            metrics = pipeline_metrics()
+            logger.info(f"Receipts resolved: {resolved}; {metrics}")
+
+            if options["once"]:
+                self.stdout.write(f"Resolved {resolved} transactions; {metrics}")
+                return
+
+            # Nothing lands faster than one block; back off further while idle
+            delay = block_time if resolved else min(delay * 2, max_backoff)
+            time.sleep(delay)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blockchain.pipeline import TransactionSubmitter
+from blockchain.services import blockchain_service
+
+
+class Command(BaseCommand):
+    help = "Sign and broadcast queued TransactionIntent rows. Run one instance per signing key."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Process a single batch and exit")
+
+    def handle(self, *args, **options):
+        if not blockchain_service.enabled or not blockchain_service.account:
+            self.stderr.write("Blockchain is disabled or has no signing key; nothing to submit.")
+            return
+
+        submitter = TransactionSubmitter(blockchain_service, batch_size=options["batch_size"])
+
+        while True:
+            processed = submitter.run_once()
+            if options["once"]:
+                self.stdout.write(f"Processed {processed} intents")
+                return
+            if not processed:
+                time.sleep(options["interval"])
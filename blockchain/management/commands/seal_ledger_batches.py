@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from blockchain.ledger import seal_batches
+from blockchain.pipeline import blockchain_config
+
+
+class Command(BaseCommand):
+    help = "Seal unbatched ledger blocks into Merkle batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--flush", action="store_true", help="Also seal a trailing partial batch")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"] or blockchain_config("LEDGER_BATCH_SIZE", 1024)
+        batches = seal_batches(batch_size, flush=options["flush"])
+        for batch in batches:
+            self.stdout.write(f"Sealed blocks {batch.start_index}-{batch.end_index}: {batch.merkle_root}")
+        self.stdout.write(f"Sealed {len(batches)} batches")
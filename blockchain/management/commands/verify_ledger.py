@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blockchain.ledger import verify_chain
+
+
+class Command(BaseCommand):
+    help = "Re-hash ledger blocks appended since the last verification checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        checkpoint = verify_chain(chunk_size=options["chunk_size"])
+        if checkpoint.broken_index:
+            raise CommandError(f"Ledger broken at block #{checkpoint.broken_index}")
+        self.stdout.write(f"Ledger verified up to block #{checkpoint.verified_index}")
@@ -0,0 +1,58 @@
+"""
+Binary Merkle tree over ledger block hashes.
+
+Leaves and inner nodes are hashed with distinct prefixes so a leaf can never
+be passed off as an inner node. An odd node is carried up to the next level
+unchanged rather than paired with itself.
+"""
+import hashlib
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(block_hash):
+    return hashlib.sha256(LEAF_PREFIX + block_hash.encode()).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _next_level(level):
+    paired = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        paired.append(level[-1])
+    return paired
+
+
+def merkle_root(block_hashes):
+    level = [leaf_hash(h) for h in block_hashes]
+    if not level:
+        return None
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proof(block_hashes, position):
+    """Sibling path from leaf ``position`` to the root: ``[{"hash", "side"}, ...]``."""
+    level = [leaf_hash(h) for h in block_hashes]
+    proof = []
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append({"hash": level[sibling], "side": "left" if sibling < position else "right"})
+        level = _next_level(level)
+        position //= 2
+    return proof
+
+
+def verify_proof(block_hash, proof, root):
+    current = leaf_hash(block_hash)
+    for step in proof:
+        if step["side"] == "left":
+            current = node_hash(step["hash"], current)
+        else:
+            current = node_hash(current, step["hash"])
+    return current == root
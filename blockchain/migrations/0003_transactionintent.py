@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0002_blockchaintransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionIntent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=128, unique=True)),
+                ('contract_name', models.CharField(max_length=50)),
+                ('function_name', models.CharField(max_length=50)),
+                ('args', models.JSONField(default=list)),
+                ('user_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('request_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('SUBMITTED', 'Submitted'), ('FAILED', 'Failed')], default='QUEUED', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('nonce', models.IntegerField(blank=True, null=True)),
+                ('tx_hash', models.CharField(blank=True, max_length=100, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='blockchain_intent_queue_idx')],
+            },
+        ),
+    ]
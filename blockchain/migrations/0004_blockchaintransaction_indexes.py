@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0003_transactionintent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blockchaintransaction',
+            index=models.Index(fields=['status', 'id'], name='blockchain_tx_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blockchaintransaction',
+            index=models.Index(fields=['user_id', 'created_at'], name='blockchain_tx_user_idx'),
+        ),
+    ]
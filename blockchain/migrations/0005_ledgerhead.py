@@ -0,0 +1,78 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:19
+
+import hashlib
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def repair_forks(apps, schema_editor):
+    """
+    Parallel appends before LedgerHead existed could give several blocks
+    the same index, which the unique index below would reject. Renumber
+    every block from the first duplicate on, in (index, id) order, and
+    re-link their hashes (Block.calculate_hash) into one chain.
+    """
+    Block = apps.get_model('blockchain', 'Block')
+    first = (
+        Block.objects.values('index').annotate(n=Count('id')).filter(n__gt=1)
+        .order_by('index').values_list('index', flat=True).first()
+    )
+    if first is None:
+        return
+
+    before = Block.objects.filter(index__lt=first).order_by('-index').first()
+    index = first - 1
+    previous_hash = before.hash if before else '0'
+    blocks = []
+    for block in Block.objects.filter(index__gte=first).order_by('index', 'id').iterator(chunk_size=2000):
+        index += 1
+        block.index = index
+        block.previous_hash = previous_hash
+        data = f"{block.index}{block.timestamp}{block.event}{block.msisdn}{block.previous_hash}"
+        block.hash = previous_hash = hashlib.sha256(data.encode()).hexdigest()
+        blocks.append(block)
+    Block.objects.bulk_update(blocks, ['index', 'previous_hash', 'hash'], batch_size=2000)
+    print(f"\n  Repaired a forked ledger: renumbered and re-hashed {len(blocks)} blocks from index {first}")
+
+
+def seed_ledger_head(apps, schema_editor):
+    Block = apps.get_model('blockchain', 'Block')
+    LedgerHead = apps.get_model('blockchain', 'LedgerHead')
+    tip = Block.objects.order_by('-index').first()
+    LedgerHead.objects.create(
+        pk=1,
+        index=tip.index if tip else 0,
+        hash=tip.hash if tip else '0',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0004_blockchaintransaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField(default=0)),
+                ('hash', models.CharField(default='0', max_length=256)),
+            ],
+        ),
+        migrations.RunPython(repair_forks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='block',
+            name='index',
+            field=models.IntegerField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='block',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(seed_ledger_head, migrations.RunPython.noop),
+    ]
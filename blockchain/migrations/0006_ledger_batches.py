@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0005_ledgerhead'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_index', models.IntegerField(unique=True)),
+                ('end_index', models.IntegerField(unique=True)),
+                ('merkle_root', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verified_index', models.IntegerField(default=0)),
+                ('verified_hash', models.CharField(default='0', max_length=256)),
+                ('broken_index', models.IntegerField(blank=True, null=True)),
+                ('verified_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='block',
+            index=models.Index(fields=['msisdn', 'index'], name='blockchain_block_msisdn_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0006_ledger_batches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionintent',
+            name='raw_tx',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='transactionintent',
+            name='status',
+            field=models.CharField(choices=[('QUEUED', 'Queued'), ('SIGNED', 'Signed'), ('SUBMITTED', 'Submitted'), ('FAILED', 'Failed')], default='QUEUED', max_length=20),
+        ),
+    ]
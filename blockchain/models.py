@@ -1,20 +1,58 @@
 import hashlib
 import json
 from django.db import models
+from django.utils import timezone
 
 # tamper proof append only table
 class Block(models.Model):
-    index = models.IntegerField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    index = models.IntegerField(unique=True)
+    # Set in Python (not auto_now_add) so the hash can be computed before INSERT
+    timestamp = models.DateTimeField(default=timezone.now)
     event = models.CharField(max_length=255)
     msisdn = models.CharField(max_length=15)
     previous_hash = models.CharField(max_length=256)
     hash = models.CharField(max_length=256)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["msisdn", "index"], name="blockchain_block_msisdn_idx"),
+        ]
+
     def calculate_hash(self):
         data = f"{self.index}{self.timestamp}{self.event}{self.msisdn}{self.previous_hash}"
         return hashlib.sha256(data.encode()).hexdigest()
 
+class LedgerHead(models.Model):
+    """
+    Single-row pointer to the tip of the Block chain. Appends lock this row,
+    so concurrent writers queue up instead of forking the chain.
+    """
+    index = models.IntegerField(default=0)
+    hash = models.CharField(max_length=256, default="0")
+
+    def __str__(self):
+        return f"#{self.index} {self.hash[:12]}"
+
+class LedgerBatch(models.Model):
+    """Merkle root over the hashes of blocks start_index..end_index (inclusive)."""
+    start_index = models.IntegerField(unique=True)
+    end_index = models.IntegerField(unique=True)
+    merkle_root = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.start_index}-{self.end_index} {self.merkle_root[:12]}"
+
+class LedgerCheckpoint(models.Model):
+    """Single-row record of how far the chain has been re-hashed and found intact."""
+    verified_index = models.IntegerField(default=0)
+    verified_hash = models.CharField(max_length=256, default="0")
+    broken_index = models.IntegerField(null=True, blank=True)
+    verified_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"verified to #{self.verified_index}"
+
 class BlockchainTransaction(models.Model):
     tx_hash = models.CharField(max_length=100, unique=True)
     contract_address = models.CharField(max_length=42)
@@ -26,5 +64,47 @@ class BlockchainTransaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     confirmed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="blockchain_tx_status_idx"),
+            models.Index(fields=["user_id", "created_at"], name="blockchain_tx_user_idx"),
+        ]
+
     def __str__(self):
         return f"{self.function_name} ({self.tx_hash[:10]}...)"
+
+class TransactionIntent(models.Model):
+    """
+    A contract call waiting to be signed and broadcast by the submitter
+    worker (see blockchain/pipeline.py). Request handlers only write this row.
+    """
+    STATUS_CHOICES = [
+        ("QUEUED", "Queued"),
+        ("SIGNED", "Signed"),
+        ("SUBMITTED", "Submitted"),
+        ("FAILED", "Failed"),
+    ]
+
+    idempotency_key = models.CharField(max_length=128, unique=True)
+    contract_name = models.CharField(max_length=50)
+    function_name = models.CharField(max_length=50)
+    args = models.JSONField(default=list)
+    user_id = models.CharField(max_length=100, null=True, blank=True)
+    request_id = models.CharField(max_length=100, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="QUEUED")
+    attempts = models.IntegerField(default=0)
+    nonce = models.IntegerField(null=True, blank=True)
+    tx_hash = models.CharField(max_length=100, null=True, blank=True)
+    # Signed before it is broadcast, so a retry re-sends the same transaction
+    raw_tx = models.TextField(blank=True, default="")
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="blockchain_intent_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.function_name} [{self.status}]"
@@ -0,0 +1,285 @@
+"""
+Background submission pipeline for contract calls.
+
+Request handlers write a ``TransactionIntent`` row and return. A single
+submitter worker (``python manage.py run_tx_submitter``) drains the queue,
+signs with a locally managed nonce and a cached gas price, and broadcasts.
+That is one RPC round-trip per transaction instead of three.
+
+Each transaction is signed, and its nonce, hash and raw bytes committed,
+before it is broadcast. A row left SIGNED, because the send failed or the
+worker died before recording it, is sent again as the same raw transaction,
+never re-signed: it can be mined once at most. One that still cannot be
+sent after SUBMIT_MAX_ATTEMPTS is FAILED and its nonce is given to a NOOP
+row, a zero-value transfer to the signer, so later nonces do not stall.
+
+The submitter only needs an object exposing ``w3``, ``contracts``,
+``contract_addresses``, ``nonces``, ``sign()`` and ``send_raw()``, so it can
+be pointed at a ``Web3(EthereumTesterProvider())`` or an anvil node in tests.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from blockchain.models import BlockchainTransaction, TransactionIntent
+
+logger = logging.getLogger(__name__)
+
+# function_name of the self-transfers that use up an abandoned nonce
+NOOP = "noop"
+
+
+def blockchain_config(key, default=None):
+    return getattr(settings, "BLOCKCHAIN_CONFIG", {}).get(key, default)
+
+
+class NonceManager:
+    """
+    Hands out sequential nonces for one signing account.
+
+    The counter is seeded from the chain's pending transaction count and
+    re-seeded after any failed send, so a rejected transaction never leaves
+    a gap. Nonces are only coordinated within a process: run exactly one
+    submitter per signing key.
+    """
+
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = None
+
+    def next(self):
+        with self._lock:
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def resync(self):
+        with self._lock:
+            self._next = None
+
+    def release(self, nonce):
+        """Give back a nonce that was never signed into a transaction."""
+        with self._lock:
+            if self._next == nonce + 1:
+                self._next = nonce
+            else:
+                self._next = None
+
+    def skip_past(self, nonce):
+        """Never hand out ``nonce`` or below, e.g. while a transaction signed with it is unsent."""
+        with self._lock:
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+            self._next = max(self._next, nonce + 1)
+
+
+class GasPriceCache:
+    """Caches ``eth_gasPrice`` for ``ttl`` seconds."""
+
+    def __init__(self, w3, ttl):
+        self.w3 = w3
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._fetched_at = 0.0
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._value is None or now - self._fetched_at >= self.ttl:
+                self._value = self.w3.eth.gas_price
+                self._fetched_at = now
+            return self._value
+
+
+def intent_key(function_name, args, key):
+    if not key:
+        raise ValueError(f"A {function_name} intent needs an idempotency key")
+    digest = hashlib.sha256(json.dumps(args, sort_keys=True).encode()).hexdigest()[:32]
+    return f"{function_name}:{key}:{digest}"
+
+
+def enqueue_intent(contract_name, function_name, args, key, request_id=None, user_id=None):
+    """
+    Queue a contract call. ``key`` identifies the caller's operation, e.g. a
+    request or user id; re-queuing the same call under the same key returns
+    the existing row.
+    """
+    intent, _ = TransactionIntent.objects.get_or_create(
+        idempotency_key=intent_key(function_name, args, key),
+        defaults={
+            "contract_name": contract_name,
+            "function_name": function_name,
+            "args": args,
+            "request_id": request_id,
+            "user_id": user_id,
+        },
+    )
+    return intent
+
+
+class TransactionSubmitter:
+    def __init__(self, service, batch_size=None, max_attempts=None):
+        self.service = service
+        self.batch_size = batch_size or blockchain_config("SUBMIT_BATCH_SIZE", 50)
+        self.max_attempts = max_attempts or blockchain_config("SUBMIT_MAX_ATTEMPTS", 5)
+
+    def run_once(self):
+        """Sign one batch of queued intents, then send every signed one. Returns the number processed."""
+        signed = self.sign_queued()
+        sent = self.send_signed()
+        return len(signed | sent)
+
+    def _fail(self, intent, error):
+        intent.attempts += 1
+        intent.last_error = str(error)
+        if intent.attempts >= self.max_attempts:
+            intent.status = "FAILED"
+        logger.error(f"Intent {intent.id} ({intent.function_name}) failed: {error}")
+
+    def sign_queued(self):
+        """Sign queued intents and commit them as SIGNED. Returns their ids."""
+        nonces = self.service.nonces
+        # An RPC call, so made before any row is locked
+        gas_price = self.service.gas_prices.get()
+        try:
+            with transaction.atomic():
+                intents = list(
+                    TransactionIntent.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(status="QUEUED")
+                    .order_by("id")[: self.batch_size]
+                )
+                if not intents:
+                    return set()
+
+                # Nonces of unsent transactions are not in the chain's pending count
+                outstanding = TransactionIntent.objects.filter(status="SIGNED").aggregate(n=Max("nonce"))["n"]
+                if outstanding is not None:
+                    nonces.skip_past(outstanding)
+
+                for intent in intents:
+                    try:
+                        func = self.service.contracts[intent.contract_name].functions[intent.function_name]
+                        intent.tx_hash, intent.nonce, intent.raw_tx = self.service.sign(
+                            func, *intent.args, gas_price=gas_price
+                        )
+                    except Exception as e:
+                        self._fail(intent, e)
+                        continue
+                    intent.status = "SIGNED"
+
+                TransactionIntent.objects.bulk_update(
+                    intents, ["status", "attempts", "nonce", "tx_hash", "raw_tx", "last_error"]
+                )
+        except Exception:
+            # Nothing was sent: hand the nonces signed in this batch out again
+            nonces.resync()
+            raise
+        return {intent.id for intent in intents}
+
+    def _is_known(self, tx_hash):
+        from web3.exceptions import TransactionNotFound
+
+        try:
+            self.service.w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            return False
+        except Exception as e:
+            logger.warning(f"Transaction lookup failed for {tx_hash}: {e}")
+            return False
+        return True
+
+    def _fill_nonce(self, intent):
+        """
+        Sign a NOOP at the nonce of ``intent``, which will never be sent.
+        Returns the new rows; a NOOP is re-signed in place instead. If that
+        fails the intent stays SIGNED and is tried again on the next run.
+        """
+        try:
+            if self.service.w3.eth.get_transaction_count(self.service.account.address) > intent.nonce:
+                # Something else was mined at this nonce
+                return []
+            tx_hash, raw_tx = self.service.sign_noop(intent.nonce)
+        except Exception as e:
+            logger.error(f"Could not replace intent {intent.id} at nonce {intent.nonce}: {e}")
+            intent.status = "SIGNED"
+            return []
+
+        logger.warning(f"Intent {intent.id} abandoned; nonce {intent.nonce} goes to a no-op transfer")
+        if intent.function_name == NOOP:
+            # Keep trying until the nonce is used, at the current gas price
+            intent.status, intent.attempts, intent.tx_hash, intent.raw_tx = "SIGNED", 0, tx_hash, raw_tx
+            return []
+        return [TransactionIntent(
+            idempotency_key=f"{NOOP}:{intent.nonce}:{intent.id}",
+            contract_name="",
+            function_name=NOOP,
+            status="SIGNED",
+            nonce=intent.nonce,
+            tx_hash=tx_hash,
+            raw_tx=raw_tx,
+        )]
+
+    def send_signed(self):
+        """
+        Broadcast SIGNED intents in nonce order. One the node rejects is
+        looked up by hash: a node that already has it was sent it before.
+        Returns the ids processed.
+        """
+        intents = list(
+            TransactionIntent.objects
+            .filter(status="SIGNED")
+            .order_by("nonce", "id")[: self.batch_size]
+        )
+        if not intents:
+            return set()
+
+        now = timezone.now()
+        records = []
+        fillers = []
+        for intent in intents:
+            try:
+                self.service.send_raw(intent.raw_tx)
+            except Exception as e:
+                if not self._is_known(intent.tx_hash):
+                    self._fail(intent, e)
+                    if intent.status == "FAILED":
+                        fillers += self._fill_nonce(intent)
+                    continue
+
+            intent.status = "SUBMITTED"
+            intent.submitted_at = now
+            intent.last_error = ""
+            if intent.function_name == NOOP:
+                continue
+            records.append(BlockchainTransaction(
+                tx_hash=intent.tx_hash,
+                contract_address=self.service.contract_addresses[intent.contract_name],
+                function_name=intent.function_name,
+                user_id=intent.user_id,
+                request_id=intent.request_id,
+                status="PENDING",
+            ))
+
+        # A row still SIGNED if this fails is found by hash on the next run
+        with transaction.atomic():
+            TransactionIntent.objects.bulk_update(
+                intents, ["status", "attempts", "tx_hash", "raw_tx", "last_error", "submitted_at"]
+            )
+            TransactionIntent.objects.bulk_create(fillers, ignore_conflicts=True)
+            BlockchainTransaction.objects.bulk_create(records, ignore_conflicts=True)
+
+        logger.info(f"Submitter processed {len(intents)} signed intents ({len(records)} broadcast)")
+        return {intent.id for intent in intents}
@@ -0,0 +1,93 @@
+"""
+Confirms PENDING ``BlockchainTransaction`` rows by polling for receipts.
+
+Runs out of band (``python manage.py poll_tx_receipts``) so the API views
+only ever read the table and never touch the RPC node during a request.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db.models import Avg, F, Min
+from django.utils import timezone
+
+from blockchain.models import BlockchainTransaction, TransactionIntent
+from blockchain.pipeline import blockchain_config
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptPoller:
+    def __init__(self, w3, batch_size=None, max_workers=None):
+        self.w3 = w3
+        self.batch_size = batch_size or blockchain_config("RECEIPT_BATCH_SIZE", 200)
+        self.max_workers = max_workers or blockchain_config("RECEIPT_WORKERS", 8)
+
+    def _fetch_receipt(self, tx_hash):
+        from web3.exceptions import TransactionNotFound
+
+        try:
+            return self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+        except Exception as e:
+            logger.warning(f"Receipt lookup failed for {tx_hash}: {e}")
+            return None
+
+    def run_once(self):
+        """
+        Walk every pending row once, in id-ordered batches.
+        Returns the number of rows that reached CONFIRMED or FAILED.
+        """
+        resolved = 0
+        last_id = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                batch = list(
+                    BlockchainTransaction.objects
+                    .filter(status="PENDING", id__gt=last_id)
+                    .order_by("id")
+                    .only("id", "tx_hash", "status", "block_number", "confirmed_at")[: self.batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                receipts = pool.map(self._fetch_receipt, [tx.tx_hash for tx in batch])
+                now = timezone.now()
+                updated = []
+                for tx, receipt in zip(batch, receipts):
+                    if receipt is None:
+                        continue
+                    tx.status = "CONFIRMED" if receipt["status"] == 1 else "FAILED"
+                    tx.block_number = receipt["blockNumber"]
+                    tx.confirmed_at = now
+                    updated.append(tx)
+
+                if updated:
+                    BlockchainTransaction.objects.bulk_update(
+                        updated, ["status", "block_number", "confirmed_at"]
+                    )
+                    resolved += len(updated)
+
+        return resolved
+
+
+def pipeline_metrics():
+    """Queue depth and confirmation lag, computed from the database only."""
+    now = timezone.now()
+    pending = BlockchainTransaction.objects.filter(status="PENDING")
+    oldest_pending = pending.aggregate(oldest=Min("created_at"))["oldest"]
+    recent_lag = (
+        BlockchainTransaction.objects
+        .filter(confirmed_at__gte=now - timedelta(hours=1))
+        .aggregate(lag=Avg(F("confirmed_at") - F("created_at")))["lag"]
+    )
+
+    return {
+        "queuedIntents": TransactionIntent.objects.filter(status__in=["QUEUED", "SIGNED"]).count(),
+        "pendingTransactions": pending.count(),
+        "oldestPendingSeconds": (now - oldest_pending).total_seconds() if oldest_pending else 0,
+        "avgConfirmationLagSeconds": recent_lag.total_seconds() if recent_lag else None,
+    }
@@ -1,84 +1,209 @@
+import hashlib
 import json
 import logging
-import hashlib
+import os
+import threading
+import time
+
 from django.conf import settings
-from web3 import Web3
-from eth_account import Account
-from blockchain.models import Block, BlockchainTransaction
+
+from blockchain.ledger import append_block
+from blockchain.models import BlockchainTransaction
+from blockchain.pipeline import GasPriceCache, NonceManager, blockchain_config, enqueue_intent
+from config.metrics import observe_external
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_ABI_DIR = os.path.join(os.path.dirname(__file__), "abis")
+
+# Contract key (BLOCKCHAIN_CONFIG["CONTRACTS"]) -> compiled contract name
+CONTRACT_NAMES = {
+    'userRegistry': 'UserRegistry',
+    'simSwapManager': 'SIMSwapManager',
+    'accessControl': 'AccessControl',
+}
+
+
+def load_abi(contract_name):
+    """
+    ABI of a compiled contract. Read from blockchain/abi_cache.py, which
+    compile_contracts.py writes with the ABIs as Python literals, so Python
+    loads them from bytecode and skips JSON parsing. Falls back to the JSON
+    file when the cache is missing, or when BLOCKCHAIN_ABI_DIR points at
+    other ABIs.
+    """
+    abi_dir = getattr(settings, 'BLOCKCHAIN_ABI_DIR', DEFAULT_ABI_DIR)
+    if os.path.abspath(abi_dir) == DEFAULT_ABI_DIR:
+        try:
+            from blockchain.abi_cache import ABIS
+        except ImportError:
+            ABIS = {}
+        if contract_name in ABIS:
+            return ABIS[contract_name]
+
+    with open(os.path.join(abi_dir, f"{contract_name}.json")) as f:
+        return json.load(f)
+
+
+def _timed_provider(provider):
+    """Report every RPC call's latency to config.metrics, per JSON-RPC method."""
+    make_request = provider.make_request
+
+    def timed_make_request(method, params):
+        started = time.perf_counter()
+        try:
+            return make_request(method, params)
+        finally:
+            observe_external("web3", method, time.perf_counter() - started)
+
+    provider.make_request = timed_make_request
+    return provider
+
+
 class BlockchainService:
-    def __init__(self):
-        self.enabled = getattr(settings, 'ENABLE_BLOCKCHAIN', False)
+    """
+    Web3, the signing account and the contract objects are created on first
+    access (see __getattr__), not when the module is imported. Importing
+    the views, running manage.py or collecting tests does not import web3
+    or touch the RPC settings. The mocked paths, used while blockchain is
+    disabled, never create them at all.
+    """
 
-        # Contract addresses from settings
-        self.contract_addresses = {
-            'userRegistry': getattr(settings, 'CONTRACT_USER_REGISTRY', None),
-            'simSwapManager': getattr(settings, 'CONTRACT_SIM_SWAP_MANAGER', None),
-            'accessControl': getattr(settings, 'CONTRACT_ACCESS_CONTROL', None)
-        }
+    # Attributes set by _connect()
+    _CONNECTED_ATTRS = frozenset({'w3', 'account', 'contracts', 'nonces', 'gas_prices'})
 
-        if not self.enabled:
-            logger.info("Blockchain integration is disabled.")
-            self.w3 = None
-            self.account = None
-            self.contracts = {}
-            return
+    def __init__(self):
+        self.enabled = blockchain_config("ENABLED", False)
+        self.async_submit = blockchain_config("ASYNC_SUBMIT", False)
 
-        # Initialize Web3
-        self.rpc_url = getattr(settings, 'BLOCKCHAIN_RPC_URL', 'https://sepolia.base.org')
-        self.private_key = getattr(settings, 'BLOCKCHAIN_PRIVATE_KEY', None)
-        self.chain_id = getattr(settings, 'BLOCKCHAIN_CHAIN_ID', 84532)
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
+        # Contract addresses from settings
+        contracts = blockchain_config("CONTRACTS", {})
+        self.contract_addresses = {name: contracts.get(name) for name in CONTRACT_NAMES}
+
+        self.rpc_url = blockchain_config("RPC_URL", 'https://sepolia.base.org')
+        self.private_key = blockchain_config("PRIVATE_KEY")
+        self.chain_id = blockchain_config("CHAIN_ID", 84532)
+
+        self._connect_lock = threading.Lock()
+        self._connected = False
+
+    def __getattr__(self, name):
+        # Only called for attributes not set yet
+        if name not in self._CONNECTED_ATTRS:
+            raise AttributeError(name)
+        self._connect()
+        return self.__dict__[name]
+
+    def _connect(self):
+        with self._connect_lock:
+            if self._connected:
+                return
+
+            attrs = {'w3': None, 'account': None, 'contracts': {}, 'nonces': None, 'gas_prices': None}
+            if not self.enabled:
+                logger.info("Blockchain integration is disabled.")
+            else:
+                attrs.update(self._init_web3())
+            for name, value in attrs.items():
+                # Keeps anything assigned before first use
+                self.__dict__.setdefault(name, value)
+            self._connected = True
+
+    def _init_web3(self):
+        from eth_account import Account
+        from web3 import Web3
+
+        # A w3 assigned before first use (e.g. blockchain.local_chain) is kept
+        w3 = self.__dict__.get('w3') or Web3(_timed_provider(Web3.HTTPProvider(self.rpc_url)))
+        attrs = {'w3': w3}
 
         if self.private_key:
-            self.account = Account.from_key(self.private_key)
-            logger.info(f"Blockchain wallet initialized: {self.account.address}")
+            account = Account.from_key(self.private_key)
+            attrs.update(
+                account=account,
+                nonces=NonceManager(w3, account.address),
+                gas_prices=GasPriceCache(w3, blockchain_config("GAS_PRICE_TTL", 15)),
+            )
+            logger.info(f"Blockchain wallet initialized: {account.address}")
         else:
-            self.account = None
             logger.warning("No private key provided; blockchain writes unavailable")
 
         # Load contracts
-        self.contracts = {}
-        abi_dir = getattr(settings, 'BLOCKCHAIN_ABI_DIR', 'blockchain/abis')
+        contracts = {}
         for name, address in self.contract_addresses.items():
             if address:
                 try:
-                    abi_file = f"{abi_dir}/{self._to_camel_case(name)}.json"
-                    with open(abi_file, 'r') as f:
-                        abi = json.load(f)
-                    self.contracts[name] = self.w3.eth.contract(address=address, abi=abi)
+                    contracts[name] = w3.eth.contract(address=address, abi=load_abi(CONTRACT_NAMES[name]))
                 except Exception as e:
                     logger.warning(f"Failed to load ABI for {name}: {e}")
-        logger.info(f"Contracts loaded: {list(self.contracts.keys())}")
-
-    def _to_camel_case(self, snake_str):
-        return ''.join(word.title() for word in snake_str.split('_'))
+        logger.info(f"Contracts loaded: {list(contracts.keys())}")
+        attrs['contracts'] = contracts
+        return attrs
 
     def _get_nonce(self):
-        return self.w3.eth.get_transaction_count(self.account.address)
+        return self.nonces.next()
 
-    def _send_transaction(self, contract_func, *args):
-        """Send transaction safely, returns tx_hash or None"""
-        if not self.enabled or not self.account:
-            return None
+    def sign(self, contract_func, *args, gas_price=None):
+        """Sign a contract call with the next nonce. Returns (tx_hash, nonce, raw_tx), all hex."""
+        nonce = self._get_nonce()
         try:
             tx = contract_func(*args).build_transaction({
                 'chainId': self.chain_id,
                 'gas': 500_000,
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': self._get_nonce(),
+                'gasPrice': gas_price or self.gas_prices.get(),
+                'nonce': nonce,
             })
             signed = self.w3.eth.account.sign_transaction(tx, private_key=self.private_key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed.rawTransaction)
-            tx_hex = self.w3.to_hex(tx_hash)
-            logger.info(f"Blockchain tx sent: {tx_hex}")
+        except Exception:
+            self.nonces.release(nonce)
+            raise
+        return self.w3.to_hex(signed.hash), nonce, self.w3.to_hex(signed.raw_transaction)
+
+    def sign_noop(self, nonce, gas_price=None):
+        """Sign a zero-value transfer to ourselves at ``nonce``, to use it up. Returns (tx_hash, raw_tx)."""
+        signed = self.w3.eth.account.sign_transaction({
+            'chainId': self.chain_id,
+            'to': self.account.address,
+            'value': 0,
+            'gas': 21_000,
+            'gasPrice': gas_price or self.gas_prices.get(),
+            'nonce': nonce,
+        }, private_key=self.private_key)
+        return self.w3.to_hex(signed.hash), self.w3.to_hex(signed.raw_transaction)
+
+    def send_raw(self, raw_tx):
+        """Broadcast a transaction signed by sign(). Sending it again cannot spend another nonce."""
+        try:
+            tx_hash = self.w3.eth.send_raw_transaction(raw_tx)
+        except Exception:
+            # The nonce may or may not have been consumed; re-read it from the chain
+            self.nonces.resync()
+            raise
+        return self.w3.to_hex(tx_hash)
+
+    def broadcast(self, contract_func, *args):
+        """Sign and send a contract call. Returns (tx_hash, nonce); raises on failure."""
+        _, nonce, raw_tx = self.sign(contract_func, *args)
+        tx_hex = self.send_raw(raw_tx)
+        logger.info(f"Blockchain tx sent: {tx_hex} (nonce {nonce})")
+        return tx_hex, nonce
+
+    def _send_transaction(self, contract_func, *args):
+        """Send transaction safely, returns tx_hash or None"""
+        if not self.enabled or not self.account:
+            return None
+        try:
+            tx_hex, _ = self.broadcast(contract_func, *args)
             return tx_hex
         except Exception as e:
             logger.error(f"Blockchain transaction failed: {e}")
             return None
 
+    def _enqueue(self, contract_name, function_name, args, key, request_id=None, user_id=None):
+        """Queue a call for the submitter worker instead of sending it inline."""
+        intent = enqueue_intent(contract_name, function_name, args, key, request_id=request_id, user_id=user_id)
+        return {"status": "queued", "txHash": intent.tx_hash, "intentId": intent.id}
+
     # ---------------- Demo-safe blockchain operations ----------------
 
     def register_user(self, user_id, phone_number, biometric_hash, id_number):
@@ -104,6 +229,13 @@ class BlockchainService:
         # Real blockchain tx (if enabled)
         phone_hash = self.w3.keccak(text=phone_number)
         identity_hash = self.w3.keccak(text=f"{biometric_hash}{id_number}")
+        if self.async_submit:
+            result = self._enqueue(
+                'userRegistry', 'registerUser',
+                [self.w3.to_hex(phone_hash), self.w3.to_hex(identity_hash)],
+                key=user_id, user_id=user_id
+            )
+            return {**result, "identityHash": self.w3.to_hex(identity_hash), "phoneHash": self.w3.to_hex(phone_hash)}
         tx_hash = self._send_transaction(
             self.contracts['userRegistry'].functions.registerUser,
             phone_hash,
@@ -164,6 +296,11 @@ class BlockchainService:
             'BIOMETRIC_AND_ID': 2
         }
         type_enum = type_map.get(verification_type, 0)
+        if self.async_submit:
+            return self._enqueue(
+                'simSwapManager', 'completeVerification', [swap_id, type_enum],
+                key=request_id, request_id=request_id
+            )
         tx_hash = self._send_transaction(
             self.contracts['simSwapManager'].functions.completeVerification,
             swap_id,
@@ -207,6 +344,11 @@ class BlockchainService:
 
             return {"status": "mocked", "txHash": tx_hash}
 
+        if self.async_submit:
+            return self._enqueue(
+                'simSwapManager', 'approveSIMSwap', [swap_id], key=request_id, request_id=request_id
+            )
+
         tx_hash = self._send_transaction(
             self.contracts['simSwapManager'].functions.approveSIMSwap,
             swap_id
@@ -228,26 +370,8 @@ class BlockchainService:
     # ---------------- Legacy block logging ----------------
 
     def log_event(self, event, msisdn):
-        last_block = Block.objects.order_by("-index").first()
-        index = 1 if not last_block else last_block.index + 1
-        previous_hash = "0" if not last_block else last_block.hash
-        block = Block.objects.create(
-            index=index,
-            event=event,
-            msisdn=msisdn,
-            previous_hash=previous_hash,
-            hash=""
-        )
-        block.hash = block.calculate_hash()
-        block.save()
-
-        # Auto-approve swap if SWAP_COMPLETED
-        if event == "SWAP_COMPLETED":
-            from swap.models import SwapSession
-            session = SwapSession.objects.filter(line__msisdn=msisdn).order_by('-created_at').first()
-            if session:
-                swap_id = getattr(session, "swap_id", str(session.id))  # fallback
-                self.approve_sim_swap(str(session.id), swap_id)
+        # Swap approval is a separate outbox effect (swap/services/outbox.py)
+        return append_block(event, msisdn)
 
 
 # Singleton
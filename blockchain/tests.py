@@ -1,3 +1,382 @@
-from django.test import TestCase
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from blockchain.ledger import append_block, append_blocks, seal_batches
+from blockchain.local_chain import local_chain
+from blockchain.merkle import merkle_proof, merkle_root, verify_proof
+from blockchain.models import Block, BlockchainTransaction, LedgerHead, TransactionIntent
+from blockchain.pipeline import NOOP, TransactionSubmitter, enqueue_intent
+from blockchain.receipts import ReceiptPoller, pipeline_metrics
+from blockchain.services import CONTRACT_NAMES, DEFAULT_ABI_DIR, BlockchainService, load_abi
+
+
+class BlockchainServiceStartupTests(SimpleTestCase):
+    def test_abi_cache_matches_json(self):
+        for name in CONTRACT_NAMES.values():
+            with open(os.path.join(DEFAULT_ABI_DIR, f"{name}.json")) as f:
+                self.assertEqual(load_abi(name), json.load(f), name)
+
+    @override_settings(BLOCKCHAIN_CONFIG={"ENABLED": False})
+    def test_disabled_service_never_connects(self):
+        service = BlockchainService()
+        self.assertNotIn("w3", vars(service))
+        self.assertEqual(service.contracts, {})
+        self.assertIsNone(service.w3)
+
+    @override_settings(BLOCKCHAIN_CONFIG={
+        "ENABLED": True,
+        "RPC_URL": "http://127.0.0.1:1",
+        "PRIVATE_KEY": "0x" + "11" * 32,
+        "CONTRACTS": {"simSwapManager": "0x" + "33" * 20},
+    })
+    def test_connects_on_first_use(self):
+        service = BlockchainService()
+        self.assertNotIn("w3", vars(service))
+
+        self.assertEqual(list(service.contracts), ["simSwapManager"])
+        self.assertIsNotNone(service.account)
+        self.assertTrue(hasattr(service.contracts["simSwapManager"].functions, "approveSIMSwap"))
+
+
+@unittest.skipUnless(importlib.util.find_spec("eth_tester"), "needs web3[tester]")
+class LocalChainTests(TestCase):
+    def test_transactions_are_mined(self):
+        service = BlockchainService()
+        with local_chain(service) as w3:
+            self.assertEqual(set(service.contracts), {"userRegistry", "simSwapManager", "accessControl"})
+            block = w3.eth.block_number
+
+            result = service.register_user("user-1", "254700000001", "bio", "1")
+            self.assertEqual(w3.eth.get_transaction_receipt(result["txHash"]).status, 1)
+            self.assertEqual(w3.eth.block_number, block + 1)
+
+        self.assertFalse(service.enabled)
+
+
+class IntentQueueTests(TestCase):
+    def test_same_call_under_one_key_is_queued_once(self):
+        first = enqueue_intent("simSwapManager", "approveSIMSwap", ["0x01"], "req-1", request_id="req-1")
+        again = enqueue_intent("simSwapManager", "approveSIMSwap", ["0x01"], "req-1", request_id="req-1")
+        other = enqueue_intent("simSwapManager", "approveSIMSwap", ["0x01"], "req-2", request_id="req-2")
+        self.assertEqual(first.id, again.id)
+        self.assertNotEqual(first.id, other.id)
+
+    def test_key_is_required(self):
+        with self.assertRaises(ValueError):
+            enqueue_intent("simSwapManager", "approveSIMSwap", ["0x01"], None)
+        self.assertFalse(TransactionIntent.objects.exists())
+
+
+@unittest.skipUnless(importlib.util.find_spec("eth_tester"), "needs web3[tester]")
+class TransactionSubmitterTests(TestCase):
+    def setUp(self):
+        self.service = BlockchainService()
+        chain = local_chain(self.service)
+        self.w3 = chain.__enter__()
+        self.addCleanup(chain.__exit__, None, None, None)
+        self.address = self.service.account.address
+
+    def enqueue(self, user_id, args=None):
+        if args is None:
+            args = [self.w3.to_hex(self.w3.keccak(text=f"{user_id}-{n}")) for n in (1, 2)]
+        return enqueue_intent("userRegistry", "registerUser", args, user_id, user_id=user_id)
+
+    def test_intents_get_sequential_nonces(self):
+        start = self.w3.eth.get_transaction_count(self.address)
+        for n in range(3):
+            self.enqueue(f"user-{n}")
+
+        self.assertEqual(TransactionSubmitter(self.service).run_once(), 3)
+
+        submitted = list(TransactionIntent.objects.order_by("id"))
+        self.assertEqual([i.status for i in submitted], ["SUBMITTED"] * 3)
+        self.assertEqual([i.nonce for i in submitted], [start, start + 1, start + 2])
+        for intent in submitted:
+            self.assertEqual(self.w3.eth.get_transaction_receipt(intent.tx_hash).status, 1)
+        self.assertEqual(
+            set(BlockchainTransaction.objects.values_list("tx_hash", flat=True)),
+            {i.tx_hash for i in submitted},
+        )
+        self.assertEqual(TransactionSubmitter(self.service).run_once(), 0)
+
+    def test_broadcast_without_its_commit_is_not_sent_twice(self):
+        start = self.w3.eth.get_transaction_count(self.address)
+        self.enqueue("user-1")
+
+        with mock.patch.object(BlockchainTransaction.objects, "bulk_create", side_effect=DatabaseError("lost")):
+            with self.assertRaises(DatabaseError):
+                TransactionSubmitter(self.service).run_once()
+        intent = TransactionIntent.objects.get()
+        self.assertEqual(intent.status, "SIGNED")
+        self.assertEqual(self.w3.eth.get_transaction_count(self.address), start + 1)
+
+        # The node already has it: the same transaction is recorded, not re-signed
+        TransactionSubmitter(self.service).run_once()
+        resent = TransactionIntent.objects.get()
+        self.assertEqual((resent.status, resent.tx_hash, resent.nonce), ("SUBMITTED", intent.tx_hash, start))
+        self.assertEqual(self.w3.eth.get_transaction_count(self.address), start + 1)
+        self.assertTrue(BlockchainTransaction.objects.filter(tx_hash=intent.tx_hash).exists())
+
+        # The next call takes the next nonce
+        self.enqueue("user-2")
+        TransactionSubmitter(self.service).run_once()
+        self.assertEqual(TransactionIntent.objects.get(user_id="user-2").nonce, start + 1)
+
+    def test_failed_signing_does_not_leave_a_nonce_gap(self):
+        start = self.w3.eth.get_transaction_count(self.address)
+        self.enqueue("user-0")
+        # Takes a nonce, then fails to build
+        self.enqueue("user-1", args=["not a bytes32"])
+        self.enqueue("user-2")
+
+        TransactionSubmitter(self.service, max_attempts=1).run_once()
+
+        intents = TransactionIntent.objects.order_by("id")
+        self.assertEqual(
+            [(i.status, i.nonce) for i in intents],
+            [("SUBMITTED", start), ("FAILED", None), ("SUBMITTED", start + 1)],
+        )
+        for intent in (intents[0], intents[2]):
+            self.assertEqual(self.w3.eth.get_transaction_receipt(intent.tx_hash).status, 1)
+
+    def test_unsent_transactions_keep_their_nonces(self):
+        start = self.w3.eth.get_transaction_count(self.address)
+        self.enqueue("user-1")
+        submitter = TransactionSubmitter(self.service)
+
+        with mock.patch.object(self.w3.eth, "send_raw_transaction", side_effect=ConnectionError("node down")):
+            submitter.run_once()
+        self.assertEqual(TransactionIntent.objects.get().status, "SIGNED")
+
+        # send_raw re-seeded the counter from the chain, which has not seen nonce `start`
+        self.enqueue("user-2")
+        submitter.sign_queued()
+        self.assertEqual(TransactionIntent.objects.get(user_id="user-2").nonce, start + 1)
+
+        submitter.send_signed()
+        self.assertEqual(
+            list(TransactionIntent.objects.order_by("nonce").values_list("status", "nonce")),
+            [("SUBMITTED", start), ("SUBMITTED", start + 1)],
+        )
+
+    def test_abandoned_nonces_are_used_up_by_a_noop(self):
+        start = self.w3.eth.get_transaction_count(self.address)
+        self.enqueue("user-1")
+        self.enqueue("user-2")
+
+        with mock.patch.object(self.w3.eth, "send_raw_transaction", side_effect=ValueError("rejected")):
+            TransactionSubmitter(self.service, max_attempts=1).run_once()
+        self.assertEqual(
+            list(TransactionIntent.objects.order_by("id").values_list("function_name", "status", "nonce")),
+            [("registerUser", "FAILED", start), ("registerUser", "FAILED", start + 1),
+             (NOOP, "SIGNED", start), (NOOP, "SIGNED", start + 1)],
+        )
+
+        TransactionSubmitter(self.service).run_once()
+        self.assertEqual(self.w3.eth.get_transaction_count(self.address), start + 2)
+        for noop in TransactionIntent.objects.filter(function_name=NOOP):
+            self.assertEqual(noop.status, "SUBMITTED")
+            self.assertEqual(self.w3.eth.get_transaction_receipt(noop.tx_hash).status, 1)
+        self.assertFalse(BlockchainTransaction.objects.exists())
+
+        self.enqueue("user-3")
+        TransactionSubmitter(self.service).run_once()
+        intent = TransactionIntent.objects.get(user_id="user-3")
+        self.assertEqual((intent.status, intent.nonce), ("SUBMITTED", start + 2))
+
+    def test_gas_price_is_read_before_rows_are_locked(self):
+        self.enqueue("user-1")
+        depth = len(connection.atomic_blocks)
+        seen = []
+        get = self.service.gas_prices.get
+
+        def gas_price():
+            seen.append(len(connection.atomic_blocks))
+            return get()
+
+        with mock.patch.object(self.service.gas_prices, "get", side_effect=gas_price):
+            TransactionSubmitter(self.service).run_once()
+        self.assertEqual(seen, [depth])
+        self.assertEqual(TransactionIntent.objects.get().status, "SUBMITTED")
+
+
+class ReceiptPollerTests(TestCase):
+    def setUp(self):
+        for name in ("mined", "reverted", "missing", "lookup-error", "done"):
+            BlockchainTransaction.objects.create(
+                tx_hash=f"0x{name}", contract_address="0x0", function_name="approveSIMSwap",
+                status="CONFIRMED" if name == "done" else "PENDING",
+            )
+        self.receipts = {"0xmined": {"status": 1, "blockNumber": 10}, "0xreverted": {"status": 0, "blockNumber": 11}}
+        self.w3 = mock.Mock()
+        self.w3.eth.get_transaction_receipt.side_effect = self.receipt
+
+    def receipt(self, tx_hash):
+        from web3.exceptions import TransactionNotFound
+
+        if tx_hash == "0xlookup-error":
+            raise ConnectionError("node down")
+        if tx_hash not in self.receipts:
+            raise TransactionNotFound(tx_hash)
+        return self.receipts[tx_hash]
+
+    def statuses(self):
+        return dict(BlockchainTransaction.objects.values_list("tx_hash", "status"))
+
+    def test_receipts_are_applied_in_one_update_per_batch(self):
+        # The pending batch, its bulk update, then an empty batch
+        with self.assertNumQueries(3):
+            self.assertEqual(ReceiptPoller(self.w3).run_once(), 2)
+
+        self.assertEqual(self.statuses(), {
+            "0xmined": "CONFIRMED", "0xreverted": "FAILED",
+            "0xmissing": "PENDING", "0xlookup-error": "PENDING", "0xdone": "CONFIRMED",
+        })
+        mined = BlockchainTransaction.objects.get(tx_hash="0xmined")
+        self.assertEqual(mined.block_number, 10)
+        self.assertIsNotNone(mined.confirmed_at)
+        self.assertIsNone(BlockchainTransaction.objects.get(tx_hash="0xmissing").confirmed_at)
+        looked_up = [c.args[0] for c in self.w3.eth.get_transaction_receipt.call_args_list]
+        self.assertNotIn("0xdone", looked_up)
+
+    def test_missing_receipts_are_polled_again(self):
+        poller = ReceiptPoller(self.w3, batch_size=1, max_workers=2)
+        self.assertEqual(poller.run_once(), 2)
+        self.assertEqual(pipeline_metrics()["pendingTransactions"], 2)
+
+        self.receipts["0xmissing"] = {"status": 1, "blockNumber": 12}
+        self.assertEqual(poller.run_once(), 1)
+        self.assertEqual(self.statuses()["0xmissing"], "CONFIRMED")
+        self.assertEqual(poller.run_once(), 0)
+        self.assertEqual(pipeline_metrics()["pendingTransactions"], 1)
+
+
+class MerkleTests(SimpleTestCase):
+    def hashes(self, n):
+        return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+    def test_every_leaf_verifies_at_odd_sizes(self):
+        for size in (1, 2, 3, 5, 7, 8, 13, 1023):
+            hashes = self.hashes(size)
+            root = merkle_root(hashes)
+            for position in {0, size // 2, size - 1}:
+                proof = merkle_proof(hashes, position)
+                self.assertTrue(verify_proof(hashes[position], proof, root), (size, position))
+
+    def test_wrong_leaf_or_root_fails(self):
+        hashes = self.hashes(5)
+        root = merkle_root(hashes)
+        proof = merkle_proof(hashes, 4)
+        self.assertFalse(verify_proof(hashes[3], proof, root))
+        self.assertFalse(verify_proof(hashes[4], proof, merkle_root(hashes[:4])))
+        self.assertIsNone(merkle_root([]))
+
+
+class LedgerProofViewTests(TestCase):
+    def setUp(self):
+        blocks = append_blocks([("SWAP_COMPLETED", f"25470000007{i % 2}") for i in range(5)])
+        self.block = blocks[2]
+        seal_batches(3, flush=True)
+
+    def url(self, msisdn="254700000070"):
+        return f"/api/v1/blockchain/ledger/proof/{msisdn}/"
+
+    def test_proof_verifies_against_the_batch_root(self):
+        body = self.client.get(self.url(), {"index": self.block.index}).json()
+        self.assertEqual((body["index"], body["blockHash"]), (self.block.index, self.block.hash))
+        self.assertTrue(verify_proof(body["blockHash"], body["proof"], body["batch"]["merkleRoot"]))
+
+        # Without ?index= the latest block of the MSISDN, in the trailing batch of 2
+        body = self.client.get(self.url()).json()
+        self.assertEqual((body["index"], body["batch"]["startIndex"]), (5, 4))
+        self.assertTrue(verify_proof(body["blockHash"], body["proof"], body["batch"]["merkleRoot"]))
+
+    def test_bad_index(self):
+        self.assertEqual(self.client.get(self.url(), {"index": "abc"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url(), {"index": ""}).status_code, 400)
+        self.assertEqual(self.client.get(self.url(), {"index": 99}).status_code, 404)
+        # Block 2 belongs to the other MSISDN
+        self.assertEqual(self.client.get(self.url(), {"index": 2}).status_code, 404)
+        # Block 0 is the genesis block, not the latest block of the MSISDN
+        self.assertEqual(self.client.get(self.url(), {"index": 0}).status_code, 404)
+        self.assertEqual(self.client.get(self.url("254799999999")).status_code, 404)
+
+
+@unittest.skipIf(connection.vendor == "sqlite", "SQLite serializes writers without row locks")
+class ConcurrentAppendTests(TransactionTestCase):
+    def test_parallel_appends_form_one_chain(self):
+        threads, per_thread = 8, 25
+        errors = []
+
+        def append(worker):
+            try:
+                for i in range(per_thread):
+                    append_block("SWAP_COMPLETED", f"2547{worker:02d}{i:06d}")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=append, args=(n,)) for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+
+        blocks = list(Block.objects.order_by("index"))
+        self.assertEqual([b.index for b in blocks], list(range(1, threads * per_thread + 1)))
+        previous_hash = "0"
+        for block in blocks:
+            self.assertEqual(block.previous_hash, previous_hash, block.index)
+            self.assertEqual(block.hash, block.calculate_hash())
+            previous_hash = block.hash
+        head = LedgerHead.objects.get()
+        self.assertEqual((head.index, head.hash), (blocks[-1].index, blocks[-1].hash))
+
+
+
+class LedgerHeadMigrationTests(TransactionTestCase):
+    before, after = [("blockchain", "0004_blockchaintransaction_indexes")], [("blockchain", "0005_ledgerhead")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_forked_chain_is_repaired_before_the_unique_index(self):
+        self.addCleanup(self.migrate, MigrationExecutor(connection).loader.graph.leaf_nodes())
+        apps = self.migrate(self.before)
+        OldBlock = apps.get_model("blockchain", "Block")
+        previous_hash = "0"
+        # Two writers both appended index 2
+        for index, msisdn in [(1, "254700000001"), (2, "254700000002"), (2, "254700000003"), (3, "254700000004")]:
+            block = OldBlock(index=index, event="SWAP_COMPLETED", msisdn=msisdn, previous_hash=previous_hash)
+            block.save()
+            block.hash = previous_hash = hashlib.sha256(
+                f"{block.index}{block.timestamp}{block.event}{block.msisdn}{block.previous_hash}".encode()
+            ).hexdigest()
+            block.save()
+
+        apps = self.migrate(self.after)
+        blocks = list(apps.get_model("blockchain", "Block").objects.order_by("index"))
+        self.assertEqual(
+            [(b.index, b.msisdn) for b in blocks],
+            [(1, "254700000001"), (2, "254700000002"), (3, "254700000003"), (4, "254700000004")],
+        )
+        previous_hash = "0"
+        for block in blocks:
+            self.assertEqual(block.previous_hash, previous_hash)
+            previous_hash = block.hash
+        head = apps.get_model("blockchain", "LedgerHead").objects.get()
+        self.assertEqual((head.index, head.hash), (4, blocks[-1].hash))
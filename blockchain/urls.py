@@ -7,7 +7,9 @@ from blockchain.views import (
     BlockchainDemoTransactionView,
     BlockchainLedgerStateView,
     BlockchainTransactionsView,
-    BlockchainAuditTrailView
+    BlockchainAuditTrailView,
+    BlockchainPipelineMetricsView,
+    LedgerProofView
 )
 
 urlpatterns = [
@@ -19,4 +21,6 @@ urlpatterns = [
     path('ledger-state/<str:request_id>/', BlockchainLedgerStateView.as_view(), name='blockchain-ledger-state'),
     path('transactions/', BlockchainTransactionsView.as_view(), name='blockchain-transactions'),
     path('audit-trail/<str:user_id>/', BlockchainAuditTrailView.as_view(), name='blockchain-audit-trail'),
+    path('ledger/proof/<str:msisdn>/', LedgerProofView.as_view(), name='blockchain-ledger-proof'),
+    path('pipeline-metrics/', BlockchainPipelineMetricsView.as_view(), name='blockchain-pipeline-metrics'),
 ]
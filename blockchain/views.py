@@ -2,7 +2,9 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
+from blockchain.ledger import chain_integrity, inclusion_proof
 from blockchain.models import BlockchainTransaction, Block
+from blockchain.receipts import pipeline_metrics
 import hashlib
 
 class BlockchainActorsView(APIView):
@@ -209,7 +211,9 @@ class BlockchainTransactionsView(APIView):
                 "recordHash": record_hash,
                 "previousHash": prev_hash,
                 "timestamp": tx.created_at.isoformat(),
-                "blockNumber": tx.block_number or (12345 + i),
+                "blockNumber": tx.block_number,
+                "status": tx.status,
+                "confirmedAt": tx.confirmed_at.isoformat() if tx.confirmed_at else None,
                 "actor": tx.user_id or "system",
                 "action": tx.function_name,
                 "immutable": True
@@ -218,10 +222,15 @@ class BlockchainTransactionsView(APIView):
 
         return Response({
             "transactions": data,
-            "chainIntegrity": "VERIFIED",
+            "chainIntegrity": chain_integrity(),
             "totalRecords": len(data)
         })
 
+AUDIT_STATUS = {
+    "CONFIRMED": "immutable_record",
+    "FAILED": "failed",
+}
+
 class BlockchainAuditTrailView(APIView):
     def get(self, request, user_id):
         transactions = BlockchainTransaction.objects.filter(user_id=user_id).order_by('created_at')
@@ -237,7 +246,8 @@ class BlockchainAuditTrailView(APIView):
                     "requestId": tx.request_id
                 },
                 "blockchainProof": tx.tx_hash,
-                "status": "immutable_record" if tx.status == 'CONFIRMED' else "pending"
+                "blockNumber": tx.block_number,
+                "status": AUDIT_STATUS.get(tx.status, "pending")
             })
 
         return Response({
@@ -246,3 +256,49 @@ class BlockchainAuditTrailView(APIView):
             "totalActions": len(audit_trail),
             "blockchainVerified": True
         })
+
+class BlockchainPipelineMetricsView(APIView):
+    def get(self, request):
+        return Response(pipeline_metrics())
+
+class LedgerProofView(APIView):
+    """
+    Merkle inclusion proof for the latest ledger block of an MSISDN
+    (or a specific block via ``?index=``).
+    """
+    def get(self, request, msisdn):
+        blocks = Block.objects.filter(msisdn=msisdn)
+        index = request.query_params.get("index")
+        if index is not None:
+            try:
+                index = int(index)
+            except ValueError:
+                return Response({"error": "index must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            blocks = blocks.filter(index=index)
+        block = blocks.order_by("-index").first()
+
+        if not block:
+            error = f"No ledger block {index} for msisdn" if index is not None else "No ledger entry for msisdn"
+            return Response({"error": error}, status=status.HTTP_404_NOT_FOUND)
+
+        result = inclusion_proof(block)
+        if not result:
+            return Response({
+                "msisdn": msisdn,
+                "index": block.index,
+                "error": "Block not yet sealed into a batch"
+            }, status=status.HTTP_202_ACCEPTED)
+
+        batch, proof = result
+        return Response({
+            "msisdn": msisdn,
+            "index": block.index,
+            "event": block.event,
+            "blockHash": block.hash,
+            "batch": {
+                "startIndex": batch.start_index,
+                "endIndex": batch.end_index,
+                "merkleRoot": batch.merkle_root,
+            },
+            "proof": proof,
+        })
@@ -0,0 +1,313 @@
+"""
+Process-local metrics, exported in the Prometheus text format at /metrics/.
+
+RequestMetricsMiddleware (REQUEST_METRICS["ENABLED"]) records, for every
+request and per URL route:
+- total latency
+- number of SQL queries and the time spent in them
+- time spent waiting on external services: Didit over HTTP, and the chain
+  over Web3 RPC
+
+Queries are counted by an execute wrapper installed on every DB connection.
+External calls report through observe_external(). Both add to the stats of
+the current request, which live in a context variable, so they also follow
+ORM and client calls made through sync_to_async from async views. With no
+request in flight, the wrapper does a single context variable lookup.
+
+Each worker process keeps its own registry; scrape every worker, or run
+one worker per metrics port.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def metrics_config(key, default=None):
+    return getattr(settings, "REQUEST_METRICS", {}).get(key, default)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, **extra):
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, total = {}, 0
+            for bound, n in zip(self.buckets + ("+Inf",), self.counts):
+                total += n
+                cumulative[str(bound)] = total
+            return {"count": self.count, "sum": round(self.sum, 6), "buckets": cumulative}
+
+
+class _Family:
+    """A named metric with one child per combination of label values."""
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **values):
+        key = tuple(str(values[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def children(self):
+        with self._lock:
+            return dict(self._children)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        for key, child in sorted(self.children().items()):
+            yield from self._render_child(key, child)
+
+
+class HistogramFamily(_Family):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def _new_child(self):
+        return Histogram(self.buckets)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def snapshot(self):
+        return {key: child.snapshot() for key, child in self.children().items()}
+
+    def _render_child(self, key, child):
+        snapshot = child.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, le=bound)} {count}"
+        yield f"{self.name}_sum{_labels(self.labelnames, key)} {snapshot['sum']}"
+        yield f"{self.name}_count{_labels(self.labelnames, key)} {snapshot['count']}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class CounterFamily(_Family):
+    type = "counter"
+
+    def _new_child(self):
+        return Counter()
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def _render_child(self, key, child):
+        yield f"{self.name}{_labels(self.labelnames, key)} {child.value}"
+
+
+class Registry:
+    def __init__(self):
+        self._families = {}
+
+    def _register(self, family):
+        self._families[family.name] = family
+        return family
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(HistogramFamily(name, documentation, labelnames, buckets))
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(CounterFamily(name, documentation, labelnames))
+
+    def render(self):
+        lines = []
+        for family in self._families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to produce the response, by URL route.", ("view", "method", "status")
+)
+REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "SQL queries per request.", ("view",), QUERY_BUCKETS
+)
+REQUEST_DB_SECONDS = REGISTRY.histogram(
+    "http_request_db_seconds", "Time per request spent in SQL queries.", ("view",)
+)
+REQUEST_EXTERNAL_SECONDS = REGISTRY.histogram(
+    "http_request_external_seconds", "Time per request spent waiting on an external service.", ("view", "service")
+)
+REQUEST_BUDGET_EXCEEDED = REGISTRY.counter(
+    "http_request_budget_exceeded_total", "Requests over a REQUEST_METRICS budget.", ("view", "budget")
+)
+EXTERNAL_SECONDS = REGISTRY.histogram(
+    "external_call_duration_seconds", "Latency of calls to external services.", ("service", "endpoint")
+)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "external")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.external = {}
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def observe_external(service, endpoint, seconds):
+    """Record one call to an external service (e.g. "didit", "POST /v3/session/")."""
+    EXTERNAL_SECONDS.observe(seconds, service=service, endpoint=endpoint)
+    stats = _current.get()
+    if stats is not None:
+        stats.external[service] = stats.external.get(service, 0.0) + seconds
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _install_query_counter(sender=None, connection=None, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class RequestMetricsMiddleware:
+    """Outermost middleware; see the module docstring. Unused unless REQUEST_METRICS["ENABLED"]."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics_config("ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budgets = metrics_config("BUDGETS", {})
+        self.view_budgets = metrics_config("VIEW_BUDGETS", {})
+
+        connection_created.connect(_install_query_counter, dispatch_uid="config.metrics")
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(connection=connection)
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, started = RequestStats(), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats, started = RequestStats(), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, stats, seconds):
+        # Routes, not paths, keep the label set small
+        view = request.resolver_match.route if request.resolver_match else "unmatched"
+
+        REQUEST_SECONDS.observe(seconds, view=view, method=request.method, status=response.status_code)
+        REQUEST_DB_QUERIES.observe(stats.queries, view=view)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds, view=view)
+        for service, service_seconds in stats.external.items():
+            REQUEST_EXTERNAL_SECONDS.observe(service_seconds, view=view, service=service)
+
+        measured = {
+            "queries": stats.queries,
+            "db_seconds": stats.db_seconds,
+            "external_seconds": sum(stats.external.values()),
+            "seconds": seconds,
+        }
+        budgets = {**self.budgets, **self.view_budgets.get(view, {})}
+        exceeded = [
+            name for name, limit in budgets.items()
+            if limit is not None and measured.get(name, 0) > limit
+        ]
+        if exceeded:
+            for name in exceeded:
+                REQUEST_BUDGET_EXCEEDED.inc(view=view, budget=name)
+            logger.warning(
+                f"{request.method} {view} over budget ({', '.join(exceeded)}): "
+                f"{stats.queries} queries, {stats.db_seconds * 1000:.1f} ms SQL, "
+                f"{measured['external_seconds'] * 1000:.1f} ms external, {seconds * 1000:.1f} ms total"
+            )
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; only answers clients in REQUEST_METRICS["ALLOWED_IPS"]."""
+    if request.META.get("REMOTE_ADDR") not in metrics_config("ALLOWED_IPS", ("127.0.0.1", "::1")):
+        raise Http404
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,4 +1,5 @@
 from pathlib import Path
+import json
 import os
 import tempfile
 from dotenv import load_dotenv
@@ -18,11 +19,134 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 
 # DIDIT
 DIDIT_API_KEY = os.getenv("DIDIT_API_KEY")
-DIDIT_BASE_URL = "https://api.didit.me"
+DIDIT_BASE_URL = os.getenv("DIDIT_BASE_URL", "https://verification.didit.me")
 DIDIT_WEBHOOK_SECRET = os.getenv("DIDIT_WEBHOOK_SECRET")
 DIDIT_WORKFLOW_ID = os.getenv("DIDIT_WORKFLOW_ID")
 DIDIT_CALLBACK_URL = os.getenv("DIDIT_CALLBACK_URL")
 
+# Create Didit sessions from `manage.py run_didit_jobs` instead of inside
+# PrimaryVettingView; clients then read the URL from /swap/session/<id>/
+DIDIT_JOBS = {
+    "ASYNC": os.getenv("DIDIT_ASYNC", "false").lower() == "true",
+    "BATCH_SIZE": int(os.getenv("DIDIT_JOB_BATCH_SIZE", "20")),
+    "MAX_ATTEMPTS": int(os.getenv("DIDIT_JOB_MAX_ATTEMPTS", "5")),
+    # Seconds before a job claimed by a worker that died is claimed again
+    "CLAIM_TIMEOUT": float(os.getenv("DIDIT_JOB_CLAIM_TIMEOUT", "120")),
+}
+
+# Webhook deliveries applied per batch by `manage.py process_didit_inbox`
+DIDIT_INBOX_BATCH_SIZE = int(os.getenv("DIDIT_INBOX_BATCH_SIZE", "500"))
+# A delivery can arrive before run_didit_jobs stored its session id: it is
+# retried every RETRY_DELAY seconds, and given up UNKNOWN_GRACE seconds after it arrived
+DIDIT_INBOX_RETRY_DELAY = float(os.getenv("DIDIT_INBOX_RETRY_DELAY", "5"))
+DIDIT_INBOX_UNKNOWN_GRACE = float(os.getenv("DIDIT_INBOX_UNKNOWN_GRACE", "600"))
+
+# Side effects of swap stage transitions, delivered by `manage.py run_session_outbox`
+SESSION_OUTBOX = {
+    "BATCH_SIZE": int(os.getenv("SESSION_OUTBOX_BATCH_SIZE", "200")),
+    "MAX_ATTEMPTS": int(os.getenv("SESSION_OUTBOX_MAX_ATTEMPTS", "10")),
+    # Seconds before the first retry of a failed chain call, doubled per attempt up to BACKOFF_MAX
+    "BACKOFF_BASE": float(os.getenv("SESSION_OUTBOX_BACKOFF_BASE", "2")),
+    "BACKOFF_MAX": float(os.getenv("SESSION_OUTBOX_BACKOFF_MAX", "600")),
+    # Seconds a relay has to record a chain call before another relay retries it
+    "CLAIM_TIMEOUT": float(os.getenv("SESSION_OUTBOX_CLAIM_TIMEOUT", "60")),
+}
+
+# Pooled Didit client (swap/services/didit_client.py)
+DIDIT_CLIENT = {
+    "CONNECT_TIMEOUT": float(os.getenv("DIDIT_CONNECT_TIMEOUT", "3")),
+    "READ_TIMEOUT": float(os.getenv("DIDIT_READ_TIMEOUT", "10")),
+    "POOL_SIZE": int(os.getenv("DIDIT_POOL_SIZE", "20")),
+    "BREAKER_FAILURES": int(os.getenv("DIDIT_BREAKER_FAILURES", "5")),
+    "BREAKER_RESET": float(os.getenv("DIDIT_BREAKER_RESET", "30")),
+}
+
+# Audit log buffering (see audit/sink.py)
+AUDIT_BUFFER = {
+    "ENABLED": os.getenv("AUDIT_BUFFER_ENABLED", "false").lower() == "true",
+    "MAX_EVENTS": int(os.getenv("AUDIT_BUFFER_MAX_EVENTS", "500")),
+    "FLUSH_INTERVAL": float(os.getenv("AUDIT_BUFFER_FLUSH_INTERVAL", "2")),
+    "SPOOL_PATH": os.getenv("AUDIT_SPOOL_PATH", os.path.join(BASE_DIR, "var", "audit_spool.jsonl")),
+}
+
+# Audit partition retention (`manage.py audit_retention`)
+AUDIT_RETENTION = {
+    "KEEP_MONTHS": int(os.getenv("AUDIT_KEEP_MONTHS", "12")),
+    "MONTHS_AHEAD": int(os.getenv("AUDIT_PARTITION_MONTHS_AHEAD", "3")),
+    "ARCHIVE_DIR": os.getenv("AUDIT_ARCHIVE_DIR", os.path.join(BASE_DIR, "var", "audit_archive")),
+}
+
+# Seconds between checks for a newly activated EligibilityRuleSet
+ELIGIBILITY_RULES_RELOAD_INTERVAL = float(os.getenv("ELIGIBILITY_RULES_RELOAD_INTERVAL", "5"))
+
+# No second swap of a line within this many days of its last completed swap
+# (the "Swapped recently" eligibility rule; 0 turns it off)
+SWAP_COOLDOWN_DAYS = int(os.getenv("SWAP_COOLDOWN_DAYS", "30"))
+
+# /swap/start/ resumes a line's open session unless it has been idle this
+# long, in which case the session is expired and a new one opened
+SWAP_SESSION_TTL_MINUTES = int(os.getenv("SWAP_SESSION_TTL_MINUTES", "30"))
+
+# Route /swap/start/, /swap/primary/, /swap/complete/ and /didit/webhook/ to
+# their async variants; only useful under ASGI (config.asgi, see README)
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "false").lower() == "true"
+
+# Per-route latency, SQL and external I/O metrics (config/metrics.py), scraped from /metrics/
+REQUEST_METRICS = {
+    "ENABLED": os.getenv("REQUEST_METRICS_ENABLED", "false").lower() == "true",
+    "ALLOWED_IPS": os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(","),
+    # Requests over a budget are counted and logged as warnings; None turns one off
+    "BUDGETS": {
+        "queries": int(os.getenv("REQUEST_BUDGET_QUERIES", "20")),
+        "db_seconds": float(os.getenv("REQUEST_BUDGET_DB_SECONDS", "0.5")),
+        "external_seconds": float(os.getenv("REQUEST_BUDGET_EXTERNAL_SECONDS", "2")),
+        "seconds": float(os.getenv("REQUEST_BUDGET_SECONDS", "3")),
+    },
+    # Overrides by URL route
+    "VIEW_BUDGETS": {
+        # Long-polls wait up to SESSION_EVENTS["MAX_WAIT"] on purpose
+        "swap/session/<int:session_id>/events/": {"seconds": None},
+    },
+}
+
+# Session status push (/swap/session/<id>/events/, swap/services/events.py)
+SESSION_EVENTS = {
+    "MAX_WAIT": float(os.getenv("SESSION_EVENTS_MAX_WAIT", "30")),
+    "SSE_MAX_DURATION": float(os.getenv("SESSION_EVENTS_SSE_MAX_DURATION", "300")),
+    "HEARTBEAT": 15,
+    "PG_NOTIFY": os.getenv("SESSION_EVENTS_PG_NOTIFY", "true").lower() == "true",
+}
+
+# Cache: per-process memory by default; use a shared backend (e.g.
+# django.core.cache.backends.redis.RedisCache) when running several workers
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Cached per-MSISDN eligibility snapshot used by /swap/start/ (swap/services/snapshot.py)
+ELIGIBILITY_CACHE = {
+    "ENABLED": os.getenv("ELIGIBILITY_CACHE_ENABLED", "true").lower() == "true",
+    "TTL": int(os.getenv("ELIGIBILITY_CACHE_TTL", "30")),
+    "LOCK_TIMEOUT": 5,
+    "WAIT_TIMEOUT": 0.5,
+}
+
+# Fraud velocity limits checked by /swap/start/ (fraud/services/velocity.py).
+# THRESHOLDS is a JSON list of {"reason", "dimension", "event", "window", "limit"};
+# unset means fraud.services.velocity.DEFAULT_THRESHOLDS
+FRAUD_VELOCITY = {
+    "ENABLED": os.getenv("FRAUD_VELOCITY_ENABLED", "false").lower() == "true",
+    "THRESHOLDS": json.loads(os.getenv("FRAUD_VELOCITY_THRESHOLDS", "null")),
+    # Seconds before a worker re-reads a key's counts recorded by other workers
+    "REFRESH_INTERVAL": float(os.getenv("FRAUD_VELOCITY_REFRESH_INTERVAL", "5")),
+    "MAX_KEYS": int(os.getenv("FRAUD_VELOCITY_MAX_KEYS", "100000")),
+    # Requests without the header are not limited per device
+    "DEVICE_HEADER": os.getenv("FRAUD_VELOCITY_DEVICE_HEADER", "X-Device-ID"),
+}
+
 # Blockchain & smartcontract
 BLOCKCHAIN_CONFIG = {
     "ENABLED": os.getenv("ENABLE_BLOCKCHAIN", "false").lower() == "true",
@@ -30,6 +154,18 @@ BLOCKCHAIN_CONFIG = {
     "RPC_URL": os.getenv("BLOCKCHAIN_RPC_URL", "https://sepolia.base.org"),
     "PRIVATE_KEY": os.getenv("BLOCKCHAIN_PRIVATE_KEY"),
     "CHAIN_ID": int(os.getenv("BLOCKCHAIN_CHAIN_ID", "84532")),
+    # Queue contract calls for `manage.py run_tx_submitter` instead of sending inline
+    "ASYNC_SUBMIT": os.getenv("BLOCKCHAIN_ASYNC_SUBMIT", "false").lower() == "true",
+    "GAS_PRICE_TTL": float(os.getenv("BLOCKCHAIN_GAS_PRICE_TTL", "15")),
+    "SUBMIT_BATCH_SIZE": int(os.getenv("BLOCKCHAIN_SUBMIT_BATCH_SIZE", "50")),
+    "SUBMIT_MAX_ATTEMPTS": int(os.getenv("BLOCKCHAIN_SUBMIT_MAX_ATTEMPTS", "5")),
+    # Receipt polling (`manage.py poll_tx_receipts`); Base produces a block every ~2s
+    "BLOCK_TIME": float(os.getenv("BLOCKCHAIN_BLOCK_TIME", "2")),
+    "RECEIPT_BATCH_SIZE": int(os.getenv("BLOCKCHAIN_RECEIPT_BATCH_SIZE", "200")),
+    "RECEIPT_WORKERS": int(os.getenv("BLOCKCHAIN_RECEIPT_WORKERS", "8")),
+    "RECEIPT_MAX_BACKOFF": float(os.getenv("BLOCKCHAIN_RECEIPT_MAX_BACKOFF", "30")),
+    # Blocks per Merkle batch (`manage.py seal_ledger_batches`)
+    "LEDGER_BATCH_SIZE": int(os.getenv("BLOCKCHAIN_LEDGER_BATCH_SIZE", "1024")),
     "CONTRACTS": {
         "userRegistry": os.getenv("CONTRACT_USER_REGISTRY"),
         "simSwapManager": os.getenv("CONTRACT_SIM_SWAP_MANAGER"),
@@ -67,8 +203,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'config.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -123,7 +260,10 @@ REST_FRAMEWORK = {
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get('DATABASE_URL'),
-        conn_max_age=600
+        # Under ASGI every request runs its sync code in a fresh thread, so
+        # persistent connections are never reused and pile up until
+        # max_connections; close them at the end of each request instead
+        conn_max_age=int(os.getenv("DB_CONN_MAX_AGE", "0" if ASYNC_VIEWS else "600"))
     )
 }
 
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from swap.views import StartSwapView, health_check, CompleteSwapView, SwapSessionStatusView
+from config.metrics import metrics_view
+from swap.views import StartSwapView, health_check, CompleteSwapView, SwapSessionStatusView, session_events
 from vetting.views import (
     PrimaryVettingView,
     DiditWebhookView,
@@ -8,10 +10,18 @@ from vetting.views import (
     # FaceScanView,
     # IDScanView,
 )
-from customers.views import AllCustomersView
+from customers.views import AllCustomersView, CustomerExportView, CustomerImportView
+
+if settings.ASYNC_VIEWS:
+    # Async variants of the write endpoints; serve with an ASGI server (README)
+    from swap.async_views import CompleteSwapAsyncView as CompleteSwapView
+    from swap.async_views import StartSwapAsyncView as StartSwapView
+    from vetting.async_views import DiditWebhookAsyncView as DiditWebhookView
+    from vetting.async_views import PrimaryVettingAsyncView as PrimaryVettingView
 
 urlpatterns = [
     path("health/", health_check),
+    path("metrics/", metrics_view, name="metrics"),
     path('admin/', admin.site.urls),
     path("swap/start/", StartSwapView.as_view()),
     path("swap/primary/", PrimaryVettingView.as_view()),
@@ -20,7 +30,10 @@ urlpatterns = [
     # path("swap/id/", IDScanView.as_view()),
     path("swap/complete/", CompleteSwapView.as_view()),
     path("all/", AllCustomersView.as_view(), name="all-customers"),
+    path("all/export/", CustomerExportView.as_view(), name="export-customers"),
+    path("all/import/", CustomerImportView.as_view(), name="import-customers"),
     path("didit/webhook/", DiditWebhookView.as_view(), name="didit-webhook"),
     path("swap/session/<int:session_id>/", SwapSessionStatusView.as_view(), name="session-status"),
+    path("swap/session/<int:session_id>/events/", session_events, name="session-events"),
     path("api/v1/blockchain/", include('blockchain.urls')),
 ]
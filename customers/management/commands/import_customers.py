@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.services.bulk_import import CustomerImporter, read_csv, read_parquet
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-import customers from a CSV or Parquet file (columns: msisdn, full_name, id_number, yob, "
+        "optionally iprs_verified, iprs_approved, fraud_location), creating their lines and wallets."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=("csv", "parquet"), help="Defaults to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per transaction")
+        parser.add_argument("--insert-only", action="store_true", help="Leave existing customers unchanged")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or ("parquet" if path.endswith((".parquet", ".pq")) else "csv")
+
+        try:
+            rows = read_parquet(path) if file_format == "parquet" else read_csv(path)
+            report = CustomerImporter(
+                chunk_size=options["chunk_size"],
+                update_existing=not options["insert_only"],
+            ).run(rows)
+        except (OSError, ImportError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from customers.models import Customer
 from lines.models import Line
@@ -24,14 +25,22 @@ class CustomerFullSerializer(serializers.ModelSerializer):
         model = Customer
         fields = "__all__"
 
+    @staticmethod
+    def with_related(queryset):
+        # Line is a reverse FK and WalletProfile a reverse one-to-one, so one
+        # prefetch query per batch replaces the two lookups per customer.
+        return queryset.select_related("walletprofile").prefetch_related(
+            Prefetch("line_set", queryset=Line.objects.order_by("id"))
+        )
+
     def get_line(self, obj):
-        line = Line.objects.filter(customer=obj).first()
+        line = next(iter(obj.line_set.all()), None)
         if line:
             return LineSerializer(line).data
         return None
 
     def get_wallet(self, obj):
-        wallet = WalletProfile.objects.filter(customer=obj).first()
+        wallet = getattr(obj, "walletprofile", None)
         if wallet:
             return WalletSerializer(wallet).data
         return None
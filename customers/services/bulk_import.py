@@ -0,0 +1,212 @@
+"""
+Bulk customer provisioning from the operator's CRM export.
+
+Creating customers one by one costs three INSERTs per row: Customer.save
+runs normalize_msisdn, then customers.signals adds the Line and the
+WalletProfile. CustomerImporter streams rows in chunks instead. Each chunk
+is normalized and validated up front (numbers in one pass with
+normalize_msisdn_batch) and written in one transaction with three bulk
+INSERTs:
+- customers, upserted on msisdn
+- lines and wallets for the customers the chunk created, with the same
+  defaults as create_related_objects
+
+The end state is what Customer.objects.create would produce for new
+numbers, and what Customer.save would produce for existing ones. Existing
+customers get their fields updated, and their line and wallet are left
+alone. Re-running a file is safe.
+
+Rows come from read_csv() or read_parquet(), as dicts with msisdn,
+full_name, id_number, yob and, optionally, iprs_verified, iprs_approved
+and fraud_location. An optional column missing from the file is left
+unchanged on existing customers (new ones get the model default), so a
+plain CRM export never un-verifies a customer or clears a fraud flag.
+"""
+import csv
+import io
+import itertools
+import logging
+import time
+
+from django.db import transaction
+
+from customers.models import Customer
+from lines.models import Line
+from swap.services.snapshot import invalidate_snapshot
+from swap.utils.msisdn import MSISDN_ERRORS, normalize_msisdn_batch
+from wallet.models import WalletProfile
+
+logger = logging.getLogger(__name__)
+
+UPDATE_FIELDS = ["full_name", "id_number", "yob"]
+OPTIONAL_FIELDS = ["iprs_verified", "iprs_approved", "fraud_location"]
+FRAUD_LOCATIONS = {value for value, _ in Customer.FRAUD_LOCATION_CHOICES}
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+
+# Errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+class InvalidRow(Exception):
+    pass
+
+
+def read_csv(file):
+    """Rows of a CSV file (path or binary/text file object) with a header line."""
+    if isinstance(file, str):
+        with open(file, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+        return
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    yield from csv.DictReader(file)
+
+
+def read_parquet(file, batch_size=10_000):
+    """Rows of a Parquet file, read one record batch at a time. Needs pyarrow."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet import needs pyarrow (pip install pyarrow)") from None
+    return _parquet_rows(pq.ParquetFile(file), batch_size)
+
+
+def _parquet_rows(parquet_file, batch_size):
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield from batch.to_pylist()
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in TRUE_VALUES
+
+
+def _text(row, field):
+    value = str(row.get(field) or "").strip()
+    if not value:
+        raise InvalidRow(f"{field} is required")
+    return value
+
+
+def clean_row(row, msisdn):
+    """Customer field values for one input row whose number normalized to msisdn. Raises InvalidRow."""
+    try:
+        yob = int(str(row.get("yob") or "").strip())
+    except ValueError:
+        raise InvalidRow("yob must be a year") from None
+
+    values = {
+        "msisdn": msisdn,
+        "full_name": _text(row, "full_name"),
+        "id_number": _text(row, "id_number"),
+        "yob": yob,
+    }
+    # Optional columns only count when the file has them
+    for field in ("iprs_verified", "iprs_approved"):
+        if field in row:
+            values[field] = _flag(row[field])
+    if "fraud_location" in row:
+        fraud_location = str(row["fraud_location"] or "NORMAL").strip().upper()
+        if fraud_location not in FRAUD_LOCATIONS:
+            raise InvalidRow(f"Unknown fraud_location {fraud_location}")
+        values["fraud_location"] = fraud_location
+    return values
+
+
+class CustomerImporter:
+    def __init__(self, chunk_size=5000, update_existing=True):
+        self.chunk_size = chunk_size
+        self.update_existing = update_existing
+
+    def run(self, rows):
+        """Import an iterable of row dicts. Returns a report with counts and rows/s."""
+        report = {"rows": 0, "created": 0, "updated": 0, "skipped": 0, "invalid": 0, "errors": []}
+        started = time.perf_counter()
+
+        rows = iter(rows)
+        row_number = 0
+        while chunk := list(itertools.islice(rows, self.chunk_size)):
+            cleaned = {}
+            msisdns, msisdn_errors = normalize_msisdn_batch([str(row.get("msisdn") or "") for row in chunk])
+            for row, msisdn, msisdn_error in zip(chunk, msisdns, msisdn_errors):
+                row_number += 1
+                try:
+                    if msisdn_error:
+                        raise InvalidRow(MSISDN_ERRORS[msisdn_error])
+                    values = clean_row(row, msisdn)
+                except InvalidRow as e:
+                    report["invalid"] += 1
+                    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                        report["errors"].append({"row": row_number, "error": str(e)})
+                    continue
+                # A number repeated in the file: the last row wins, as with
+                # saving the rows one after another
+                cleaned[values["msisdn"]] = values
+
+            report["rows"] += len(chunk)
+            # Every row of a file has the header's columns
+            update_fields = UPDATE_FIELDS + [field for field in OPTIONAL_FIELDS if field in chunk[0]]
+            created, updated = self.write_chunk(list(cleaned.values()), update_fields)
+            report["created"] += created
+            report["updated"] += updated
+            report["skipped"] += len(cleaned) - created - updated
+
+        elapsed = time.perf_counter() - started
+        report["seconds"] = round(elapsed, 3)
+        report["rowsPerSecond"] = round(report["rows"] / elapsed, 1) if elapsed else None
+        logger.info(
+            f"Imported {report['rows']} rows: {report['created']} created, {report['updated']} updated, "
+            f"{report['invalid']} invalid ({report['rowsPerSecond']} rows/s)"
+        )
+        return report
+
+    def write_chunk(self, values, update_fields=UPDATE_FIELDS):
+        """Upsert one chunk of cleaned rows, updating ``update_fields`` of existing customers. Returns (created, updated)."""
+        if not values:
+            return 0, 0
+
+        msisdns = [v["msisdn"] for v in values]
+        with transaction.atomic():
+            existing = set(Customer.objects.filter(msisdn__in=msisdns).values_list("msisdn", flat=True))
+
+            customers = [Customer(**v) for v in values if self.update_existing or v["msisdn"] not in existing]
+            if self.update_existing:
+                Customer.objects.bulk_create(
+                    customers, update_conflicts=True, unique_fields=["msisdn"], update_fields=update_fields
+                )
+            else:
+                Customer.objects.bulk_create(customers, ignore_conflicts=True)
+
+            # What create_related_objects does for each new customer
+            new_ids = dict(
+                Customer.objects.filter(msisdn__in=set(msisdns) - existing).values_list("msisdn", "id")
+            )
+            Line.objects.bulk_create(
+                [
+                    Line(
+                        msisdn=msisdn,
+                        customer_id=customer_id,
+                        status="ACTIVE",
+                        is_prepaid=True,
+                        is_roaming=False,
+                        on_in_data=True,
+                    )
+                    for msisdn, customer_id in new_ids.items()
+                ],
+                ignore_conflicts=True,
+            )
+            WalletProfile.objects.bulk_create(
+                [
+                    WalletProfile(customer_id=customer_id, mpesa_balance=0.00, airtime_balance=0.00)
+                    for customer_id in new_ids.values()
+                ],
+                ignore_conflicts=True,
+            )
+
+            updated = sorted(existing) if self.update_existing else []
+            if updated:
+                # bulk_create sends no post_save, so drop cached eligibility here
+                transaction.on_commit(lambda: invalidate_snapshot(*updated))
+
+        return len(new_ids), len(updated)
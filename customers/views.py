@@ -1,11 +1,133 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.pagination import CursorPagination
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from customers.models import Customer
-from .serializers import CustomerFullSerializer
+from customers.services.bulk_import import CustomerImporter, read_csv, read_parquet
+from .serializers import CustomerFullSerializer, LineSerializer, WalletSerializer
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class CustomerCursorPagination(CursorPagination):
+    ordering = "id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
 
 class AllCustomersView(APIView):
+    """
+    Without query params this keeps the legacy full list. Passing ``cursor``
+    or ``page_size`` switches to keyset pagination on ``id``.
+    """
+
     def get(self, request):
-        customers = Customer.objects.all()
+        customers = CustomerFullSerializer.with_related(Customer.objects.all())
+
+        if "cursor" in request.query_params or "page_size" in request.query_params:
+            paginator = CustomerCursorPagination()
+            page = paginator.paginate_queryset(customers, request, view=self)
+            serializer = CustomerFullSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
         serializer = CustomerFullSerializer(customers, many=True)
         return Response(serializer.data)
 
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+class CustomerExportView(APIView):
+    """
+    Streams every customer as NDJSON (default) or CSV (``?type=csv``).
+
+    Rows are read with ``.iterator(chunk_size=...)`` so memory stays flat
+    regardless of table size; line and wallet are fetched once per chunk.
+    Staff only.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        export_type = request.query_params.get("type", "ndjson")
+        if export_type not in ("ndjson", "csv"):
+            return Response({"error": "type must be ndjson or csv"}, status=400)
+
+        customers = CustomerFullSerializer.with_related(
+            Customer.objects.order_by("id")
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        if export_type == "csv":
+            response = StreamingHttpResponse(self._csv_rows(customers), content_type="text/csv")
+            response["Content-Disposition"] = 'attachment; filename="customers.csv"'
+            return response
+
+        return StreamingHttpResponse(
+            self._ndjson_rows(customers),
+            content_type="application/x-ndjson",
+        )
+
+    def _ndjson_rows(self, customers):
+        for customer in customers:
+            data = CustomerFullSerializer(customer).data
+            yield json.dumps(data, cls=JSONEncoder) + "\n"
+
+    def _csv_rows(self, customers):
+        customer_fields = [
+            name for name in CustomerFullSerializer().fields if name not in ("line", "wallet")
+        ]
+        line_fields = list(LineSerializer().fields)
+        wallet_fields = list(WalletSerializer().fields)
+
+        writer = csv.writer(_Echo())
+        yield writer.writerow(
+            customer_fields
+            + [f"line_{name}" for name in line_fields]
+            + [f"wallet_{name}" for name in wallet_fields]
+        )
+
+        for customer in customers:
+            data = CustomerFullSerializer(customer).data
+            line = data["line"] or {}
+            wallet = data["wallet"] or {}
+            yield writer.writerow(
+                [data.get(name) for name in customer_fields]
+                + [line.get(name) for name in line_fields]
+                + [wallet.get(name) for name in wallet_fields]
+            )
+
+
+class CustomerImportView(APIView):
+    """
+    Bulk import from an uploaded CSV or Parquet file (multipart field
+    ``file``); see customers.services.bulk_import. ``?insert_only=true``
+    leaves existing customers unchanged. Staff only.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Missing file"}, status=400)
+
+        if upload.name.endswith((".parquet", ".pq")):
+            try:
+                rows = read_parquet(upload)
+            except ImportError as e:
+                return Response({"error": str(e)}, status=400)
+        else:
+            rows = read_csv(upload)
+
+        importer = CustomerImporter(update_existing=request.query_params.get("insert_only") != "true")
+        return Response(importer.run(rows))
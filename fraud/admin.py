@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import VelocityCounter
 
-# Register your models here.
+
+@admin.register(VelocityCounter)
+class VelocityCounterAdmin(admin.ModelAdmin):
+    list_display = ("dimension", "key", "event", "hour", "count")
+    list_filter = ("dimension", "event")
+    search_fields = ("key",)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from fraud.services.velocity import prune_velocity_counters
+
+
+class Command(BaseCommand):
+    help = "Delete hourly fraud velocity counters older than the longest window (7 days)."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {prune_velocity_counters()} rows")
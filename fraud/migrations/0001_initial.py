@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VelocityCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('msisdn', 'MSISDN'), ('id_number', 'ID number'), ('device', 'Device')], max_length=16)),
+                ('key', models.CharField(max_length=128)),
+                ('event', models.CharField(choices=[('SWAP_STARTED', 'Swap started'), ('PRIMARY_FAILED', 'Primary failed'), ('DIDIT_FAILED', 'Didit failed'), ('LOCKED', 'Locked')], max_length=32)),
+                ('hour', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='fraud_velocity_hour')],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key', 'event', 'hour'), name='fraud_velocity_bucket')],
+            },
+        ),
+    ]
@@ -1,3 +1,39 @@
 from django.db import models
 
-# Create your models here.
+
+class VelocityCounter(models.Model):
+    """
+    Hourly event counts per MSISDN, ID number or device, read back into the
+    in-memory windows of fraud/services/velocity.py. One row per
+    (dimension, key, event, hour); written with an upsert, never scanned
+    beyond the last seven days of one key.
+    """
+    DIMENSIONS = [
+        ("msisdn", "MSISDN"),
+        ("id_number", "ID number"),
+        ("device", "Device"),
+    ]
+    EVENTS = [
+        ("SWAP_STARTED", "Swap started"),
+        ("PRIMARY_FAILED", "Primary failed"),
+        ("DIDIT_FAILED", "Didit failed"),
+        ("LOCKED", "Locked"),
+    ]
+
+    dimension = models.CharField(max_length=16, choices=DIMENSIONS)
+    key = models.CharField(max_length=128)
+    event = models.CharField(max_length=32, choices=EVENTS)
+    # Hours since the Unix epoch (UTC)
+    hour = models.IntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "key", "event", "hour"], name="fraud_velocity_bucket"),
+        ]
+        # Reads go through the unique index's (dimension, key) prefix; this
+        # one is for pruning old hours
+        indexes = [models.Index(fields=["hour"], name="fraud_velocity_hour")]
+
+    def __str__(self):
+        return f"{self.dimension}:{self.key} {self.event} @{self.hour} = {self.count}"
@@ -0,0 +1,256 @@
+"""
+Sliding-window fraud velocity limits, checked by /swap/start/ alongside
+eligibility.
+
+Swaps started, primary failures, Didit failures and locks are counted per
+MSISDN, per ID number and per device (the FRAUD_VELOCITY["DEVICE_HEADER"]
+request header), in hourly buckets over 1h, 24h and 7d windows. Requests
+without the header are not counted per device: behind the hosting proxy
+every client shares one REMOTE_ADDR.
+
+Each process keeps one ring buffer per (key, event): two fixed arrays of
+WINDOW_HOURS slots indexed by hour. A window total is a bounded loop over
+at most 168 slots and needs no query; SwapSession and AuditLog are never
+read. A key's rings are loaded from VelocityCounter (one query for all its
+events) on first use, and reloaded after REFRESH_INTERVAL seconds, which
+is how counts recorded by other workers become visible. record_velocity()
+adds to the local rings and upserts the hourly rows in one
+INSERT ... ON CONFLICT, once the surrounding transaction commits.
+
+THRESHOLDS are rejection rules evaluated in order, like eligibility rules:
+the first one whose count has reached its limit gives the reason.
+"""
+import logging
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+
+from fraud.models import VelocityCounter
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {"1h": 1, "24h": 24, "7d": 168}
+WINDOW_HOURS = max(WINDOWS.values())
+
+DIMENSIONS = {value for value, _ in VelocityCounter.DIMENSIONS}
+EVENTS = {value for value, _ in VelocityCounter.EVENTS}
+
+DEFAULT_THRESHOLDS = [
+    {"reason": "Too many swap attempts", "dimension": "msisdn", "event": "SWAP_STARTED", "window": "1h", "limit": 3},
+    {"reason": "Too many swap attempts", "dimension": "msisdn", "event": "SWAP_STARTED", "window": "24h", "limit": 5},
+    {"reason": "Repeated failed verification", "dimension": "msisdn", "event": "LOCKED", "window": "7d", "limit": 2},
+    {"reason": "Too many swaps for this ID", "dimension": "id_number", "event": "SWAP_STARTED", "window": "24h", "limit": 5},
+    {"reason": "Repeated failed verification", "dimension": "id_number", "event": "PRIMARY_FAILED", "window": "7d", "limit": 3},
+    {"reason": "Repeated failed verification", "dimension": "id_number", "event": "DIDIT_FAILED", "window": "7d", "limit": 2},
+    {"reason": "Too many swaps from this device", "dimension": "device", "event": "SWAP_STARTED", "window": "1h", "limit": 20},
+    {"reason": "Too many failures from this device", "dimension": "device", "event": "PRIMARY_FAILED", "window": "24h", "limit": 5},
+]
+
+
+def velocity_config(key, default=None):
+    return getattr(settings, "FRAUD_VELOCITY", {}).get(key, default)
+
+
+def current_hour():
+    return int(time.time() // 3600)
+
+
+class Ring:
+    """Event counts for the last WINDOW_HOURS hours of one key."""
+    __slots__ = ("hours", "counts")
+
+    def __init__(self):
+        self.hours = array("q", [-1]) * WINDOW_HOURS
+        self.counts = array("L", [0]) * WINDOW_HOURS
+
+    def add(self, hour, amount=1):
+        slot = hour % WINDOW_HOURS
+        if self.hours[slot] != hour:
+            # The slot still holds an hour that has left every window
+            self.hours[slot] = hour
+            self.counts[slot] = 0
+        self.counts[slot] += amount
+
+    def total(self, hour, window):
+        hours, counts, total = self.hours, self.counts, 0
+        for h in range(hour - window + 1, hour + 1):
+            slot = h % WINDOW_HOURS
+            if hours[slot] == h:
+                total += counts[slot]
+        return total
+
+
+class _Entry:
+    __slots__ = ("rings", "loaded_at")
+
+    def __init__(self, loaded_at):
+        self.rings = {}
+        self.loaded_at = loaded_at
+
+    def ring(self, event):
+        ring = self.rings.get(event)
+        if ring is None:
+            ring = self.rings[event] = Ring()
+        return ring
+
+
+def validate_thresholds(thresholds):
+    for threshold in thresholds:
+        if threshold.get("dimension") not in DIMENSIONS:
+            raise ImproperlyConfigured(f"Velocity threshold {threshold}: dimension must be one of {sorted(DIMENSIONS)}")
+        if threshold.get("event") not in EVENTS:
+            raise ImproperlyConfigured(f"Velocity threshold {threshold}: event must be one of {sorted(EVENTS)}")
+        if threshold.get("window") not in WINDOWS:
+            raise ImproperlyConfigured(f"Velocity threshold {threshold}: window must be one of {list(WINDOWS)}")
+        if not isinstance(threshold.get("limit"), int) or threshold["limit"] < 1:
+            raise ImproperlyConfigured(f"Velocity threshold {threshold}: limit must be a positive integer")
+        if not threshold.get("reason"):
+            raise ImproperlyConfigured(f"Velocity threshold {threshold}: reason is required")
+    return list(thresholds)
+
+
+class VelocityEngine:
+    def __init__(self, thresholds=None, refresh_interval=5.0, max_keys=100_000):
+        self.thresholds = validate_thresholds(DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+        self.refresh_interval = refresh_interval
+        self.max_keys = max_keys
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, dimension, key):
+        cache_key = (dimension, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and now - entry.loaded_at < self.refresh_interval:
+                self._entries.move_to_end(cache_key)
+                return entry
+
+        entry = self._load(dimension, key, now)
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _load(self, dimension, key, now):
+        entry = _Entry(now)
+        rows = VelocityCounter.objects.filter(
+            dimension=dimension, key=key, hour__gt=current_hour() - WINDOW_HOURS
+        ).values_list("event", "hour", "count")
+        for event, hour, count in rows:
+            entry.ring(event).add(hour, count)
+        return entry
+
+    def counts(self, dimension, key):
+        """``{event: {window: count}}`` for one key."""
+        hour = current_hour()
+        entry = self._entry(dimension, key)
+        return {
+            event: {name: ring.total(hour, hours) for name, hours in WINDOWS.items()}
+            for event, ring in entry.rings.items()
+        }
+
+    def check(self, **keys):
+        """The reason of the first threshold reached by ``keys`` (msisdn, id_number, device), or None."""
+        hour = current_hour()
+        entries = {}
+        for threshold in self.thresholds:
+            dimension = threshold["dimension"]
+            key = keys.get(dimension)
+            if not key:
+                continue
+            entry = entries.get(dimension)
+            if entry is None:
+                entry = entries[dimension] = self._entry(dimension, key)
+            ring = entry.rings.get(threshold["event"])
+            if ring is not None and ring.total(hour, WINDOWS[threshold["window"]]) >= threshold["limit"]:
+                return threshold["reason"]
+        return None
+
+    def record(self, *events, **keys):
+        """Count ``events`` now for each of ``keys``, locally and in VelocityCounter."""
+        keys = {dimension: str(key) for dimension, key in keys.items() if key}
+        if not events or not keys:
+            return
+        hour = current_hour()
+
+        with self._lock:
+            for dimension, key in keys.items():
+                entry = self._entries.get((dimension, key))
+                if entry is not None:
+                    for event in events:
+                        entry.ring(event).add(hour)
+
+        rows = [(dimension, key, event, hour, 1) for dimension, key in keys.items() for event in events]
+        _upsert(rows)
+
+
+def _upsert(rows):
+    qn = connection.ops.quote_name
+    table = qn(VelocityCounter._meta.db_table)
+    columns = ", ".join(qn(c) for c in ("dimension", "key", "event", "hour", "count"))
+    conflict = ", ".join(qn(c) for c in ("dimension", "key", "event", "hour"))
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) VALUES {values} "
+            f"ON CONFLICT ({conflict}) DO UPDATE SET {qn('count')} = {table}.{qn('count')} + excluded.{qn('count')}",
+            [value for row in rows for value in row],
+        )
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_velocity_engine():
+    """The per-process VelocityEngine, or None when FRAUD_VELOCITY is disabled."""
+    global _engine
+    if not velocity_config("ENABLED", False):
+        return None
+    with _engine_lock:
+        if _engine is None:
+            _engine = VelocityEngine(
+                thresholds=velocity_config("THRESHOLDS"),
+                refresh_interval=velocity_config("REFRESH_INTERVAL", 5.0),
+                max_keys=velocity_config("MAX_KEYS", 100_000),
+            )
+    return _engine
+
+
+def reset_velocity_engine():
+    """Drop the per-process engine, e.g. after changing FRAUD_VELOCITY in tests."""
+    global _engine
+    with _engine_lock:
+        _engine = None
+
+
+def request_device(request):
+    """The client's device id, or None when it sent none."""
+    return request.headers.get(velocity_config("DEVICE_HEADER", "X-Device-ID")) or None
+
+
+def check_velocity(**keys):
+    engine = get_velocity_engine()
+    return engine.check(**keys) if engine else None
+
+
+def record_velocity(*events, **keys):
+    """Record ``events`` for ``keys`` once the current transaction commits. Failures are logged, not raised."""
+    engine = get_velocity_engine()
+    if engine:
+        transaction.on_commit(lambda: engine.record(*events, **keys), robust=True)
+
+
+def prune_velocity_counters():
+    """Delete hourly rows that have left every window. Returns the number deleted."""
+    deleted, _ = VelocityCounter.objects.filter(hour__lte=current_hour() - WINDOW_HOURS).delete()
+    logger.info(f"Pruned {deleted} velocity counter rows")
+    return deleted
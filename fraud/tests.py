@@ -1,3 +1,101 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
 
-# Create your tests here.
+from customers.models import Customer
+from fraud.models import VelocityCounter
+from fraud.services import velocity
+from fraud.services.velocity import Ring, VelocityEngine, reset_velocity_engine
+from swap.models import SwapSession
+from swap.services.rules import reset_ruleset_cache
+
+THRESHOLDS = [
+    {"reason": "Too many swap attempts", "dimension": "msisdn", "event": "SWAP_STARTED", "window": "1h", "limit": 2},
+    {"reason": "Too many failures from this device", "dimension": "device", "event": "PRIMARY_FAILED", "window": "7d", "limit": 1},
+]
+
+
+class RingTests(SimpleTestCase):
+    def test_windows_slide(self):
+        ring = Ring()
+        ring.add(1000, 2)
+        ring.add(1000 - 23)
+        ring.add(1000 - 100, 5)
+        self.assertEqual([ring.total(1000, w) for w in (1, 24, 168)], [2, 3, 8])
+
+        # A week later the slot of hour 1000 is reused, not added to
+        ring.add(1000 + 168)
+        self.assertEqual([ring.total(1000 + 168, w) for w in (1, 24, 168)], [1, 1, 1])
+
+
+class VelocityEngineTests(TestCase):
+    def test_counts_are_shared_through_the_table(self):
+        engine = VelocityEngine(THRESHOLDS)
+        self.assertIsNone(engine.check(msisdn="254700000001", device="d1"))
+
+        engine.record("SWAP_STARTED", msisdn="254700000001", device="d1")
+        engine.record("SWAP_STARTED", msisdn="254700000001", device="d2")
+        self.assertEqual(engine.check(msisdn="254700000001"), "Too many swap attempts")
+        self.assertEqual(VelocityCounter.objects.get(dimension="msisdn", event="SWAP_STARTED").count, 2)
+
+        # Another worker loads the same counts; checks after the first load run no queries
+        other = VelocityEngine(THRESHOLDS)
+        self.assertEqual(other.counts("device", "d1"), {"SWAP_STARTED": {"1h": 1, "24h": 1, "7d": 1}})
+        self.assertEqual(other.check(msisdn="254700000001"), "Too many swap attempts")
+        with self.assertNumQueries(0):
+            other.check(msisdn="254700000001", device="d1")
+
+    def test_only_recent_hours_are_loaded(self):
+        VelocityCounter.objects.create(
+            dimension="device", key="d1", event="PRIMARY_FAILED", hour=velocity.current_hour() - 168, count=9
+        )
+        self.assertIsNone(VelocityEngine(THRESHOLDS).check(device="d1"))
+        self.assertEqual(velocity.prune_velocity_counters(), 1)
+
+
+@override_settings(FRAUD_VELOCITY={"ENABLED": True, "THRESHOLDS": THRESHOLDS, "REFRESH_INTERVAL": 60})
+class VelocityCheckTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_ruleset_cache()
+        reset_velocity_engine()
+        self.addCleanup(reset_velocity_engine)
+        self.customer = Customer.objects.create(
+            msisdn="254700000011", full_name="Test", id_number="11", yob=1990, iprs_verified=True, iprs_approved=True
+        )
+
+    def start(self, msisdn="254700000011", device="phone-1"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/swap/start/", {"msisdn": msisdn}, headers={"X-Device-ID": device}).json()
+
+    def test_start_is_rejected_over_the_limit(self):
+        for _ in range(2):
+            self.assertTrue(self.start()["allowed"])
+            # Abandon the session so the next start opens a new one
+            SwapSession.objects.update(stage="EXPIRED")
+        self.assertEqual(self.start(), {"allowed": False, "reason": "Too many swap attempts"})
+        self.assertEqual(SwapSession.objects.count(), 2)
+
+    def test_primary_failure_counts_against_the_device(self):
+        session_id = self.start()["session_id"]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/swap/primary/",
+                {"session_id": session_id, "full_name": "Wrong", "id_number": "11", "yob": 1990},
+                headers={"X-Device-ID": "phone-1"},
+            )
+        self.assertTrue(response.json()["locked"])
+
+        counts = velocity.get_velocity_engine().counts("id_number", "11")
+        self.assertEqual(counts["LOCKED"]["7d"], 1)
+
+        Customer.objects.create(
+            msisdn="254700000012", full_name="Other", id_number="12", yob=1990, iprs_verified=True, iprs_approved=True
+        )
+        self.assertEqual(self.start("254700000012")["reason"], "Too many failures from this device")
+        self.assertTrue(self.start("254700000012", device="phone-2")["allowed"])
+
+    def test_requests_without_a_device_id_are_not_limited_per_device(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/swap/start/", {"msisdn": "254700000011"}, REMOTE_ADDR="10.0.0.1")
+        self.assertTrue(VelocityCounter.objects.filter(dimension="msisdn").exists())
+        self.assertFalse(VelocityCounter.objects.filter(dimension="device").exists())
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_id_photo'),
+        ('lines', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='line',
+            index=models.Index(condition=models.Q(('last_swap_at__isnull', False)), fields=['last_swap_at'], name='line_last_swap_at'),
+        ),
+    ]
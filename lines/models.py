@@ -20,8 +20,19 @@ class Line(models.Model):
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
 
+    # Set when a swap completes; read by the "Swapped recently" eligibility rule
     last_swap_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        # Only lines that have ever been swapped, a small fraction of the table
+        indexes = [
+            models.Index(
+                fields=["last_swap_at"],
+                condition=models.Q(last_swap_at__isnull=False),
+                name="line_last_swap_at",
+            ),
+        ]
+
     def __str__(self):
         return self.msisdn
 
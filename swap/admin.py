@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SwapSession
+from .models import EligibilityRuleSet, SessionOutbox, SwapSession
 
 @admin.register(SwapSession)
 class SwapSessionAdmin(admin.ModelAdmin):
@@ -11,6 +11,7 @@ class SwapSessionAdmin(admin.ModelAdmin):
         "face_attempts",
         "id_attempts",
         "is_locked",
+        "swap_id",
         "didit_session_id",
         "didit_status",
         "didit_payload",
@@ -23,7 +24,29 @@ class SwapSessionAdmin(admin.ModelAdmin):
         "is_locked",
     )
 
-    search_fields = ("line__msisdn",)
+    search_fields = ("line__msisdn", "swap_id")
 
     readonly_fields = ("created_at", "updated_at")
 
+
+@admin.register(SessionOutbox)
+class SessionOutboxAdmin(admin.ModelAdmin):
+    list_display = ("session", "effect", "status", "attempts", "created_at", "delivered_at")
+    list_filter = ("status", "effect")
+    search_fields = ("session__id", "=idempotency_key")
+    raw_id_fields = ("session",)
+    readonly_fields = ("created_at", "delivered_at")
+
+
+@admin.register(EligibilityRuleSet)
+class EligibilityRuleSetAdmin(admin.ModelAdmin):
+    list_display = ("version", "is_active", "note", "created_at")
+    list_filter = ("is_active",)
+    readonly_fields = ("version", "created_at")
+
+    def save_model(self, request, obj, form, change):
+        # Changed rules become a new version so past decisions stay traceable
+        if change and "rules" in form.changed_data:
+            obj.pk = None
+            obj.version = None
+        super().save_model(request, obj, form, change)
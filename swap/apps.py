@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class SwapConfig(AppConfig):
     name = 'swap'
+
+    def ready(self):
+        import swap.signals
@@ -0,0 +1,146 @@
+"""
+Async variants of the swap endpoints, routed instead of the DRF views when
+ASYNC_VIEWS is on (config/urls.py). They only pay off under an ASGI server
+(see README "Running under ASGI"). Queries use the async ORM. Transactional
+and blocking helpers run through sync_to_async, which under ASGI uses a
+separate thread per request, so one slow upstream call never stalls other
+requests.
+
+Request and response bodies match the DRF views.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from audit.services import log_audit
+from blockchain.services import blockchain_service
+from fraud.services.velocity import check_velocity, record_velocity, request_device
+from swap.serializers import StartSwapSerializer
+from swap.services.sessions import NEXT_STEPS, open_session
+from swap.services.snapshot import get_snapshot
+from swap.views import complete_swap
+
+
+def request_data(request):
+    """JSON or form body, like DRF's request.data for the parsers this API uses."""
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+    return request.POST.dict()
+
+
+async def release_db_connection():
+    """
+    Close this request's DB connection before awaiting a slow upstream.
+    Otherwise every waiting request keeps a connection open, and
+    concurrency is capped by the database's max_connections, not by the
+    event loop.
+    """
+    await sync_to_async(_close_connection)()
+
+
+def _close_connection():
+    # Looked up here, in the request's sync thread, which owns the connection.
+    # Closing inside a transaction would abort it, so keep it then.
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def invalid_body():
+    return JsonResponse({"detail": "JSON parse error"}, status=400)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class StartSwapAsyncView(View):
+
+    async def post(self, request):
+        data = request_data(request)
+        if data is None:
+            return invalid_body()
+
+        serializer = StartSwapSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        msisdn = serializer.validated_data["msisdn"]
+
+        snapshot = await sync_to_async(get_snapshot)(msisdn)
+
+        if not snapshot["found"]:
+            return JsonResponse({"allowed": False, "reason": "Line not found"})
+
+        rules_version = snapshot["rules_version"]
+
+        if not snapshot["allowed"]:
+            await sync_to_async(log_audit)(msisdn, "SWAP_INELIGIBLE", {"reason": snapshot["reason"], "rules_version": rules_version})
+            return JsonResponse({"allowed": False, "reason": snapshot["reason"]})
+
+        if snapshot["locked"]:
+            return JsonResponse({
+                "allowed": False,
+                "redirect": "retail"
+            })
+
+        velocity_keys = {"msisdn": msisdn, "id_number": snapshot.get("id_number"), "device": request_device(request)}
+        velocity_reason = await sync_to_async(check_velocity)(**velocity_keys)
+        if velocity_reason:
+            await sync_to_async(log_audit)(msisdn, "SWAP_VELOCITY_BLOCKED", {"reason": velocity_reason})
+            return JsonResponse({"allowed": False, "reason": velocity_reason})
+
+        # The INSERT may need a savepoint, which the async ORM cannot hold
+        session, created = await sync_to_async(open_session)(snapshot["line_id"], rules_version)
+        if not created:
+            await sync_to_async(log_audit)(msisdn, "SWAP_RESUMED", {"session_id": session.id, "stage": session.stage})
+            return JsonResponse({
+                "allowed": True,
+                "session_id": session.id,
+                "next_step": NEXT_STEPS[session.stage],
+                "resumed": True
+            })
+
+        await sync_to_async(log_audit)(msisdn, "SWAP_STARTED", {"rules_version": rules_version})
+        await sync_to_async(record_velocity)("SWAP_STARTED", **velocity_keys)
+
+        # Blockchain Integration: Initiate SIM swap
+        swap_result = await sync_to_async(blockchain_service.initiate_sim_swap)(
+            request_id=str(session.id),
+            user_id=str(snapshot["customer_id"]),
+            phone_number=msisdn,
+            old_sim_serial="old_sim_serial_mock",
+            new_sim_serial="new_sim_serial_mock"
+        )
+
+        session.swap_id = swap_result["swapId"]
+        await session.asave(update_fields=["swap_id"])
+
+        return JsonResponse({
+            "allowed": True,
+            "session_id": session.id,
+            "next_step": "PRIMARY",
+            "swapId": session.swap_id,
+            "txHash": swap_result.get("txHash")
+        })
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class CompleteSwapAsyncView(View):
+
+    async def post(self, request):
+        data = request_data(request)
+        if data is None:
+            return invalid_body()
+
+        session_id = data.get("session_id")
+        if not session_id:
+            return JsonResponse({"error": "Missing session_id"}, status=400)
+
+        # The transition's UPDATE and its receivers share a transaction, which the async ORM cannot hold
+        body, code = await sync_to_async(complete_swap)(session_id)
+        return JsonResponse(body, status=code)
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min, OuterRef, Q, Subquery
+
+from lines.models import Line
+from swap.models import SwapSession
+from swap.services.snapshot import invalidate_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Set Line.last_swap_at from each line's latest COMPLETED swap session, walking lines in id "
+        "ranges. Values are only moved forward, so it is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Lines per UPDATE")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+
+        # A completed session is never saved again, so updated_at is its completion time
+        latest_completed = Subquery(
+            SwapSession.objects
+            .filter(line=OuterRef("pk"), stage="COMPLETED")
+            .order_by()
+            .values("line")
+            .annotate(completed_at=Max("updated_at"))
+            .values("completed_at")
+        )
+
+        bounds = Line.objects.aggregate(first=Min("id"), last=Max("id"))
+        first, last = bounds["first"], bounds["last"]
+        if first is None:
+            self.stdout.write("No lines")
+            return
+
+        updated = 0
+        for start in range(first, last + 1, chunk_size):
+            with transaction.atomic():
+                stale = (
+                    Line.objects
+                    .filter(id__gte=start, id__lt=start + chunk_size)
+                    .annotate(completed_at=latest_completed)
+                    .filter(completed_at__isnull=False)
+                    .filter(Q(last_swap_at__isnull=True) | Q(last_swap_at__lt=latest_completed))
+                )
+                changed = dict(stale.values_list("id", "msisdn"))
+                if changed and not options["dry_run"]:
+                    Line.objects.filter(id__in=changed).update(last_swap_at=latest_completed)
+                    msisdns = list(changed.values())
+                    transaction.on_commit(lambda: invalidate_snapshot(*msisdns))
+            updated += len(changed)
+            self.stdout.write(f"lines {start}-{start + chunk_size - 1}: {len(changed)} updated")
+
+        verb = "would be updated" if options["dry_run"] else "updated"
+        self.stdout.write(f"{updated} lines {verb}")
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import aiohttp
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.models import Customer
+from lines.models import Line
+from swap.models import CLOSED_STAGES, SwapSession
+from swap.services.didit_stub import DiditStubServer
+
+SERVERS = {
+    "wsgi": lambda workers, port: [
+        sys.executable, "-m", "gunicorn", "config.wsgi:application",
+        "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--log-level", "warning",
+    ],
+    "asgi": lambda workers, port: [
+        sys.executable, "-m", "uvicorn", "config.asgi:application",
+        "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load /swap/primary/ on gunicorn (sync views) and uvicorn (ASYNC_VIEWS) against a Didit stub "
+        "with a fixed latency, and report requests/s and latency percentiles. Use a PostgreSQL database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400, help="Requests per server")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--workers", type=int, default=2, help="Worker processes per server")
+        parser.add_argument("--upstream-latency", type=float, default=0.3, help="Didit stub latency in seconds")
+        parser.add_argument("--servers", default="wsgi,asgi")
+
+    def handle(self, *args, **options):
+        servers = options["servers"].split(",")
+        if unknown := set(servers) - set(SERVERS):
+            raise CommandError(f"Unknown servers: {', '.join(unknown)}")
+
+        # A line has at most one open session, so each request gets its own line
+        msisdns = set()
+        while len(msisdns) < options["requests"]:
+            msisdns.add(f"2547{random.randrange(10 ** 8):08d}")
+        msisdns -= set(Customer.objects.filter(msisdn__in=msisdns).values_list("msisdn", flat=True))
+        customers = [
+            Customer.objects.create(msisdn=msisdn, full_name="Bench Customer", id_number="12345678", yob=1990)
+            for msisdn in msisdns
+        ]
+        lines = list(Line.objects.filter(customer__in=customers))
+
+        results = {}
+        try:
+            with DiditStubServer(latency=options["upstream_latency"]) as stub:
+                for name in servers:
+                    SwapSession.objects.filter(line__in=lines).exclude(stage__in=CLOSED_STAGES).update(stage="EXPIRED")
+                    sessions = SwapSession.objects.bulk_create(
+                        [SwapSession(line=line, stage="STARTED") for line in lines]
+                    )
+                    results[name] = self.run_server(name, [s.id for s in sessions], stub, options)
+        finally:
+            Customer.objects.filter(pk__in=[c.pk for c in customers]).delete()
+
+        self.stdout.write(json.dumps({
+            "upstreamLatencySeconds": options["upstream_latency"],
+            "concurrency": options["concurrency"],
+            "workers": options["workers"],
+            **results,
+        }, indent=2))
+
+    def run_server(self, name, session_ids, stub, options):
+        port = free_port()
+        env = {
+            **os.environ,
+            "ASYNC_VIEWS": "true" if name == "asgi" else "false",
+            "DIDIT_ASYNC": "false",
+            "DIDIT_BASE_URL": stub.url,
+            "DIDIT_API_KEY": "bench",
+        }
+        server = subprocess.Popen(SERVERS[name](options["workers"], port), env=env)
+        try:
+            return asyncio.run(self.load(f"http://127.0.0.1:{port}", session_ids, options["concurrency"]))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    async def load(self, base_url, session_ids, concurrency):
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=120)) as http:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    async with http.get(f"{base_url}/health/") as response:
+                        if response.status == 200:
+                            break
+                except aiohttp.ClientError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise CommandError(f"Server at {base_url} did not start")
+                await asyncio.sleep(0.2)
+
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies, statuses = [], Counter()
+
+            async def one(session_id):
+                async with semaphore:
+                    started = time.perf_counter()
+                    async with http.post(f"{base_url}/swap/primary/", json={
+                        "session_id": session_id,
+                        "full_name": "Bench Customer",
+                        "id_number": "12345678",
+                        "yob": 1990,
+                    }) as response:
+                        await response.read()
+                        statuses[response.status] += 1
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(session_id) for session_id in session_ids))
+            elapsed = time.perf_counter() - started
+
+        return {
+            "requests": len(session_ids),
+            "statuses": dict(statuses),
+            "requestsPerSecond": round(len(session_ids) / elapsed, 1),
+            "p50Ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95Ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99Ms": round(percentile(latencies, 99) * 1000, 1),
+        }
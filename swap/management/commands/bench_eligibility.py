@@ -0,0 +1,64 @@
+import itertools
+import time
+
+from django.core.management.base import BaseCommand
+
+from customers.models import Customer
+from lines.models import Line
+from swap.services.rules import DEFAULT_RULES, CompiledRuleSet
+
+
+def hand_written(line):
+    # Verbatim copy of the pre-ruleset is_swap_allowed, used as the baseline
+    customer = line.customer
+    if line.is_golden_number:
+        return False, "Golden number"
+    if line.is_whitelisted:
+        return False, "Whitelisted"
+    if line.status != "ACTIVE":
+        return False, "Line not active"
+    if customer.fraud_location in ["PRISON_SITE", "DETACHED"]:
+        return False, "Fraud location flagged"
+    if not customer.iprs_verified:
+        return False, "IPRS not verified"
+    if not customer.iprs_approved:
+        return False, "IPRS not approved"
+    if line.is_roaming:
+        return False, "Line roaming"
+    if not line.on_in_data:
+        return False, "Not on IN data"
+    return True, None
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark the compiled eligibility evaluator against the hand-written rules (no DB access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=200)
+
+    def handle(self, *args, **options):
+        lines = []
+        for golden, status, fraud, verified, roaming in itertools.product(
+            [False, True], ["ACTIVE", "IDLE"], ["NORMAL", "DETACHED"], [False, True], [False, True]
+        ):
+            customer = Customer(fraud_location=fraud, iprs_verified=verified, iprs_approved=True)
+            lines.append(Line(customer=customer, is_golden_number=golden, status=status, is_roaming=roaming))
+
+        compiled = CompiledRuleSet(0, DEFAULT_RULES).evaluate
+        rounds = options["rounds"]
+
+        def run(fn):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for line in lines:
+                    fn(line)
+            return (time.perf_counter() - start) / (rounds * len(lines)) * 1e9
+
+        # Warm up both paths before timing
+        run(hand_written)
+        run(compiled)
+        baseline = min(run(hand_written) for _ in range(5))
+        candidate = min(run(compiled) for _ in range(5))
+
+        self.stdout.write(f"hand-written: {baseline:8.1f} ns/decision")
+        self.stdout.write(f"compiled:     {candidate:8.1f} ns/decision ({candidate / baseline:.2f}x)")
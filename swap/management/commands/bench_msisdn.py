@@ -0,0 +1,61 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from swap.utils.msisdn import MSISDN_ERRORS, InvalidMSISDN, normalize_msisdn, normalize_msisdn_batch
+
+
+def scalar_loop(values):
+    # What callers did before the batch API: one normalize_msisdn per row
+    normalized, errors = [], []
+    for value in values:
+        try:
+            normalized.append(normalize_msisdn(value))
+            errors.append(None)
+        except InvalidMSISDN as e:
+            normalized.append(None)
+            errors.append(next(code for code, message in MSISDN_ERRORS.items() if message == str(e)))
+    return normalized, errors
+
+
+def corpus(size, seed=0):
+    """Numbers in the shapes a CRM export contains, about 10% of them invalid."""
+    rng = random.Random(seed)
+    shapes = [
+        lambda n: f"07{n}",
+        lambda n: f"01{n}",
+        lambda n: f"+2547{n}",
+        lambda n: f"2541{n}",
+        lambda n: f" 07{n[:2]} {n[2:5]} {n[5:]} ",
+        lambda n: f"07{n[:2]}-{n[2:5]}-{n[5:]}",
+        lambda n: f"+254 7{n}",
+        lambda n: f"07{n}",
+        lambda n: f"2547{n}",
+        lambda n: rng.choice(["", f"12{n}", f"0{n}", f"2549{n}", f"+1 555 {n}"]),
+    ]
+    return [rng.choice(shapes)(f"{rng.randrange(10 ** 8):08d}") for _ in range(size)]
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark normalize_msisdn_batch against a normalize_msisdn loop (no DB access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        values = corpus(options["rows"])
+
+        if normalize_msisdn_batch(values) != scalar_loop(values):
+            raise CommandError("normalize_msisdn_batch disagrees with normalize_msisdn")
+
+        def run(fn):
+            start = time.perf_counter()
+            fn(values)
+            return len(values) / (time.perf_counter() - start)
+
+        baseline = max(run(scalar_loop) for _ in range(5))
+        candidate = max(run(normalize_msisdn_batch) for _ in range(5))
+
+        self.stdout.write(f"scalar loop: {baseline:12,.0f} rows/s")
+        self.stdout.write(f"batch:       {candidate:12,.0f} rows/s ({candidate / baseline:.2f}x)")
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import random
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from customers.models import Customer
+from lines.models import Line
+from swap.models import SwapSession
+from swap.services.events import publish_session_event
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DB queries of clients polling /swap/session/<id>/ with clients waiting on "
+        "/swap/session/<id>/events/ for the same stage change. Creates and deletes its own session."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=200)
+        parser.add_argument("--seconds", type=float, default=10.0, help="How long clients wait for the change")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Poll period of the polling clients")
+
+    def handle(self, *args, **options):
+        clients, seconds = options["clients"], options["seconds"]
+        msisdn = f"2547{random.randrange(10 ** 8):08d}"
+        customer = Customer.objects.create(msisdn=msisdn, full_name="Bench", id_number="0", yob=1990)
+        session = SwapSession.objects.create(line=Line.objects.get(msisdn=msisdn), stage="DIDIT_PENDING")
+
+        try:
+            # The test clients send Host: testserver
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                result = {
+                    "clients": clients,
+                    "seconds": seconds,
+                    "polling": self.bench_polling(session, clients, seconds, options["poll_interval"]),
+                    "events": self.bench_events(session, clients, seconds),
+                }
+        finally:
+            customer.delete()
+
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def bench_polling(self, session, clients, seconds, interval):
+        """Every client polls every ``interval`` seconds; polls are issued back to back."""
+        client = Client()
+        url = f"/swap/session/{session.id}/"
+        rounds = max(int(seconds / interval), 1)
+
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(rounds * clients):
+                client.get(url)
+        elapsed = time.perf_counter() - start
+
+        return {
+            "requests": rounds * clients,
+            "queries": len(queries),
+            "serverSeconds": round(elapsed, 3),
+        }
+
+    def bench_events(self, session, clients, seconds):
+        """Every client long-polls once; the stage changes halfway through."""
+        session.refresh_from_db()
+        since = session.updated_at.isoformat()
+
+        # async_to_sync from this thread runs the views' async ORM calls on this
+        # thread's connection, so they are captured here
+        with CaptureQueriesContext(connection) as queries:
+            responses, delivered = async_to_sync(self.wait_for_change)(session, clients, seconds, since)
+
+        # The stage change itself is not client traffic
+        client_queries = [q for q in queries if "pg_notify" not in q["sql"] and not q["sql"].startswith("UPDATE")]
+        return {
+            "requests": clients,
+            "queries": len(client_queries),
+            "woken": sum(1 for r in responses if r.json().get("changed")),
+            "allWokenWithinSeconds": round(delivered, 3),
+        }
+
+    async def wait_for_change(self, session, clients, seconds, since):
+        client = AsyncClient()
+        url = f"/swap/session/{session.id}/events/"
+        waiting = [
+            asyncio.ensure_future(client.get(url, {"since": since, "wait": seconds}))
+            for _ in range(clients)
+        ]
+        await asyncio.sleep(seconds / 2)
+
+        changed_at = time.perf_counter()
+        await sync_to_async(self.change_stage)(session)
+        responses = await asyncio.gather(*waiting)
+        return responses, time.perf_counter() - changed_at
+
+    def change_stage(self, session):
+        session.stage = "DIDIT_PASSED"
+        session.save()
+        publish_session_event(session)
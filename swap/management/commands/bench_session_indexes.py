@@ -0,0 +1,158 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+
+from customers.models import Customer
+from lines.models import Line
+from swap.models import CLOSED_STAGES, SwapSession
+
+# The index the line foreign key had before swap migration 0007
+OLD_LINE_INDEX = models.Index(fields=["line"], name="swap_session_line_fk_old")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed swap sessions, then EXPLAIN ANALYZE and time SwapSession's hot lookups with the schema "
+        "before and after the indexes of swap migration 0007. Runs in one transaction that is rolled back, "
+        "and holds table locks meanwhile, so use a PostgreSQL database that nothing else is using."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=1_000_000)
+        parser.add_argument("--sessions-per-line", type=int, default=5)
+        parser.add_argument("--samples", type=int, default=200, help="Timed runs per query")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("bench_session_indexes needs PostgreSQL")
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            keys = self.seed(options["sessions"], options["sessions_per_line"])
+            seed_seconds = time.perf_counter() - started
+
+            self.analyze()
+            after = self.measure(keys, options["samples"])
+            self.use_old_indexes()
+            self.analyze()
+            before = self.measure(keys, options["samples"])
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(json.dumps({
+            "sessions": options["sessions"],
+            "seedSeconds": round(seed_seconds, 1),
+            "queries": {name: {"before": before[name], "after": after[name]} for name in after},
+        }, indent=2))
+
+    def seed(self, total, per_line):
+        line_count = max(total // per_line, 1)
+        first = random.randrange(10 ** 7, 9 * 10 ** 7)
+        msisdns = [f"2547{first + i:08d}" for i in range(line_count)]
+
+        Customer.objects.bulk_create(
+            [Customer(msisdn=m, full_name="Bench", id_number=m[-8:], yob=1990) for m in msisdns],
+            batch_size=10_000,
+        )
+        customer_ids = dict(Customer.objects.filter(msisdn__in=msisdns).values_list("msisdn", "id"))
+        Line.objects.bulk_create(
+            [Line(msisdn=m, customer_id=customer_ids[m], status="ACTIVE") for m in msisdns],
+            batch_size=10_000,
+        )
+        line_ids = list(Line.objects.filter(msisdn__in=msisdns).values_list("id", flat=True))
+
+        rng = random.Random(0)
+        closed = ["COMPLETED", "EXPIRED", "LOCKED", "DIDIT_FAILED"]
+        batch, created, didit_ids = [], 0, []
+        for line_id in line_ids:
+            for n in range(per_line):
+                if created == total:
+                    break
+                # Only a line's newest session may still be open
+                if n == per_line - 1 and rng.random() < 0.2:
+                    stage = rng.choice(["STARTED", "PRIMARY_PASSED", "DIDIT_PENDING", "DIDIT_PASSED"])
+                else:
+                    stage = rng.choice(closed)
+                didit_session_id = f"bench-{line_id}-{n}" if stage not in ("STARTED", "PRIMARY_PASSED", "EXPIRED") else None
+                batch.append(SwapSession(
+                    line_id=line_id, stage=stage, is_locked=stage == "LOCKED", didit_session_id=didit_session_id
+                ))
+                if didit_session_id and len(didit_ids) < 10_000:
+                    didit_ids.append(didit_session_id)
+                created += 1
+            if len(batch) >= 10_000:
+                SwapSession.objects.bulk_create(batch)
+                batch = []
+        SwapSession.objects.bulk_create(batch)
+
+        return {"line_ids": line_ids, "msisdns": msisdns, "didit_ids": didit_ids}
+
+    def queries(self, keys, rng):
+        line_id = rng.choice(keys["line_ids"])
+        return {
+            # swap.services.snapshot
+            "locked_session": lambda: SwapSession.objects.filter(line_id=line_id, is_locked=True).exists(),
+            # swap.services.sessions
+            "open_session": lambda: SwapSession.objects.filter(line_id=line_id).exclude(stage__in=CLOSED_STAGES).first(),
+            # vetting.services.didit_inbox
+            "didit_batch": lambda: list(SwapSession.objects.filter(didit_session_id__in=rng.sample(keys["didit_ids"], 50))),
+            # A line's latest session
+            "latest_for_msisdn": lambda: SwapSession.objects.filter(
+                line__msisdn=rng.choice(keys["msisdns"])
+            ).order_by("-created_at").first(),
+            # Admin changelist filtered by stage
+            "admin_stage": lambda: list(SwapSession.objects.filter(stage="DIDIT_PENDING").order_by("-id")[:100]),
+        }
+
+    def explain(self, keys):
+        line_id, rng = keys["line_ids"][0], random.Random(1)
+        querysets = {
+            "locked_session": SwapSession.objects.filter(line_id=line_id, is_locked=True)[:1],
+            "open_session": SwapSession.objects.filter(line_id=line_id).exclude(stage__in=CLOSED_STAGES).order_by("pk")[:1],
+            "didit_batch": SwapSession.objects.filter(didit_session_id__in=rng.sample(keys["didit_ids"], 50)),
+            "latest_for_msisdn": SwapSession.objects.filter(line__msisdn=keys["msisdns"][0]).order_by("-created_at")[:1],
+            "admin_stage": SwapSession.objects.filter(stage="DIDIT_PENDING").order_by("-id")[:100],
+        }
+        return {name: qs.explain(analyze=True).splitlines() for name, qs in querysets.items()}
+
+    def measure(self, keys, samples):
+        plans = self.explain(keys)
+        timings = {name: [] for name in plans}
+        rng = random.Random(2)
+        for _ in range(samples):
+            for name, run in self.queries(keys, rng).items():
+                started = time.perf_counter()
+                run()
+                timings[name].append(time.perf_counter() - started)
+        return {
+            name: {
+                "p50Ms": round(percentile(timings[name], 50) * 1000, 3),
+                "p95Ms": round(percentile(timings[name], 95) * 1000, 3),
+                "plan": plans[name],
+            }
+            for name in plans
+        }
+
+    def use_old_indexes(self):
+        meta = SwapSession._meta
+        with connection.cursor() as cursor:
+            # Run the deferred FK checks of the seed now; DDL refuses pending trigger events
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        with connection.schema_editor() as editor:
+            for index in meta.indexes:
+                editor.remove_index(SwapSession, index)
+            for constraint in meta.constraints:
+                editor.remove_constraint(SwapSession, constraint)
+            editor.add_index(SwapSession, OLD_LINE_INDEX)
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(SwapSession._meta.db_table)}")
@@ -0,0 +1,274 @@
+import contextlib
+import functools
+import hashlib
+import hmac
+import json
+import os
+import queue
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from customers.models import Customer
+from swap.services.didit_client import reset_didit_clients
+from swap.services.didit_stub import DiditStubServer
+from vetting.services.didit_inbox import DiditInboxProcessor
+from vetting.services.didit_jobs import DiditJobRunner, didit_jobs_config
+
+ENDPOINTS = ("start", "primary", "webhook", "status", "complete")
+WEBHOOK_SECRET = "loadtest"
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class FunnelFailed(Exception):
+    def __init__(self, step):
+        super().__init__(step)
+        self.step = step
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed customers and run concurrent start -> primary -> Didit webhook -> complete funnels "
+        "in-process against a Didit stub and, with --chain eth-tester, a local chain. Reports "
+        "requests/s, latency percentiles and DB queries per endpoint, and writes them to JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=200, help="Funnels to run, one per seeded customer")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--didit-latency", type=float, default=0.05, help="Didit stub latency in seconds")
+        parser.add_argument("--chain", choices=("mock", "eth-tester"), default="mock",
+                            help="mock: blockchain disabled (demo paths); eth-tester: contracts on a local chain")
+        parser.add_argument("--output", help="Result file (default var/loadtest/<commit>-<time>.json)")
+        parser.add_argument("--compare", help="Earlier result file to diff p95 and queries against")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded customers")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+
+        customers = self.seed(options["customers"])
+        try:
+            with contextlib.ExitStack() as stack:
+                stub = stack.enter_context(DiditStubServer(latency=options["didit_latency"]))
+                stack.enter_context(override_settings(
+                    # The test client sends Host: testserver
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                    DIDIT_BASE_URL=stub.url,
+                    DIDIT_API_KEY="loadtest",
+                    DIDIT_WEBHOOK_SECRET=WEBHOOK_SECRET,
+                ))
+                reset_didit_clients()
+                stack.callback(reset_didit_clients)
+                w3 = None
+                if options["chain"] == "eth-tester":
+                    from blockchain.local_chain import local_chain
+                    w3 = stack.enter_context(local_chain())
+                    first_block = w3.eth.block_number
+
+                result = self.run_funnels(customers, options)
+                if w3 is not None:
+                    # eth-tester mines one block per transaction
+                    result["chain"] = {"transactionsMined": w3.eth.block_number - first_block}
+        finally:
+            if not options["keep"]:
+                Customer.objects.filter(id__in=[c.id for c in customers]).delete()
+
+        result = {
+            "commit": git_commit(),
+            "createdAt": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "options": {key: options[key] for key in ("customers", "concurrency", "didit_latency", "chain")},
+            **result,
+        }
+
+        path = options["output"] or os.path.join(
+            settings.BASE_DIR, "var", "loadtest",
+            f"{result['commit'] or 'nogit'}-{timezone.now():%Y%m%dT%H%M%S}.json",
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+
+        self.stdout.write(json.dumps(result, indent=2))
+        self.stdout.write(f"Wrote {path}")
+        if baseline:
+            self.stdout.write(self.compare(baseline, result))
+
+    def seed(self, count):
+        """Customers are created one by one so customers.signals adds each Line and wallet."""
+        msisdns = set()
+        while len(msisdns) < count:
+            msisdns.add(f"2547{random.randrange(10 ** 8):08d}")
+        msisdns -= set(Customer.objects.filter(msisdn__in=msisdns).values_list("msisdn", flat=True))
+        return [
+            Customer.objects.create(
+                msisdn=msisdn,
+                full_name="Load Test",
+                id_number=msisdn[-8:],
+                yob=1990,
+                iprs_verified=True,
+                iprs_approved=True,
+            )
+            for msisdn in msisdns
+        ]
+
+    def run_funnels(self, customers, options):
+        stats = defaultdict(lambda: {"latencies": [], "queries": [], "errors": 0})
+        failures = Counter()
+        pending = queue.Queue()
+        for customer in customers:
+            pending.put(customer)
+
+        stop = threading.Event()
+        # Stand-ins for `manage.py process_didit_inbox` and `run_didit_jobs`
+        background = [threading.Thread(target=self.drain, args=(DiditInboxProcessor().run_once, stop))]
+        if didit_jobs_config("ASYNC"):
+            background.append(threading.Thread(target=self.drain, args=(DiditJobRunner().run_once, stop)))
+
+        def worker():
+            client = Client()
+            queries = []
+            with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+                while True:
+                    try:
+                        customer = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        self.funnel(client, customer, stats, queries)
+                    except FunnelFailed as e:
+                        failures[e.step] += 1
+            connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(options["concurrency"])]
+        for thread in background:
+            thread.start()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for thread in background:
+            thread.join()
+
+        return {
+            "funnels": {
+                "total": len(customers),
+                "completed": len(customers) - sum(failures.values()),
+                "failedAt": dict(failures),
+                "seconds": round(elapsed, 3),
+                "perSecond": round(len(customers) / elapsed, 2),
+            },
+            "endpoints": {
+                name: {
+                    "requests": len(stats[name]["latencies"]),
+                    "errors": stats[name]["errors"],
+                    "requestsPerSecond": round(len(stats[name]["latencies"]) / elapsed, 1),
+                    "p50Ms": round(percentile(stats[name]["latencies"], 50) * 1000, 1),
+                    "p95Ms": round(percentile(stats[name]["latencies"], 95) * 1000, 1),
+                    "p99Ms": round(percentile(stats[name]["latencies"], 99) * 1000, 1),
+                    "queriesPerRequest": round(sum(stats[name]["queries"]) / len(stats[name]["queries"]), 2),
+                    "maxQueries": max(stats[name]["queries"]),
+                }
+                for name in ENDPOINTS if stats[name]["latencies"]
+            },
+        }
+
+    def drain(self, run_once, stop):
+        while not stop.is_set():
+            if not run_once():
+                time.sleep(0.02)
+        connection.close()
+
+    def request(self, client, stats, queries, name, method, path, data=None, headers=None):
+        before = len(queries)
+        started = time.perf_counter()
+        if method == "get":
+            response = client.get(path)
+        else:
+            body = data if isinstance(data, bytes) else json.dumps(data)
+            response = client.post(path, body, content_type="application/json", headers=headers)
+        stats[name]["latencies"].append(time.perf_counter() - started)
+        stats[name]["queries"].append(len(queries) - before)
+        if response.status_code >= 300:
+            stats[name]["errors"] += 1
+            raise FunnelFailed(name)
+        return response.json()
+
+    def funnel(self, client, customer, stats, queries):
+        call = functools.partial(self.request, client, stats, queries)
+
+        # One device per customer, so the fraud velocity limits see distinct handsets
+        device = {"X-Device-ID": f"loadtest-{customer.msisdn}"}
+        started = call("start", "post", "/swap/start/", {"msisdn": customer.msisdn}, headers=device)
+        session_id = started["session_id"]
+
+        primary = call("primary", "post", "/swap/primary/", {
+            "session_id": session_id,
+            "full_name": customer.full_name,
+            "id_number": customer.id_number,
+            "yob": customer.yob,
+        }, headers=device)
+        didit_session_id = (primary.get("didit_session") or {}).get("session_id")
+        if not didit_session_id:
+            # DIDIT_ASYNC: the job runner creates the Didit session
+            didit_session_id = self.wait_for(call, session_id, lambda state: state.get("didit_session_id"))
+            if not didit_session_id:
+                raise FunnelFailed("didit_job_timeout")
+
+        body = json.dumps({"session_id": didit_session_id, "status": "Approved"}).encode()
+        signature = hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        call("webhook", "post", "/didit/webhook/", body, headers={"X-Signature": signature})
+
+        # Deliveries are applied by the inbox processor; poll like the app does
+        if not self.wait_for(call, session_id, lambda state: state["stage"] == "DIDIT_PASSED"):
+            raise FunnelFailed("didit_inbox_timeout")
+
+        call("complete", "post", "/swap/complete/", {"session_id": session_id})
+
+    def wait_for(self, call, session_id, condition, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            state = call("status", "get", f"/swap/session/{session_id}/")
+            if value := condition(state):
+                return value
+            time.sleep(0.02)
+        return None
+
+    def compare(self, baseline, result):
+        lines = [f"Compared with {baseline.get('commit')} ({baseline.get('createdAt')}):"]
+        for name, current in result["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(name)
+            if not before:
+                continue
+            lines.append(
+                f"  {name:<9} p95 {before['p95Ms']:>8.1f} -> {current['p95Ms']:>8.1f} ms   "
+                f"queries {before['queriesPerRequest']:>6.2f} -> {current['queriesPerRequest']:>6.2f}"
+            )
+        return "\n".join(lines)
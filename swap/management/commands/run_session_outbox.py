@@ -0,0 +1,39 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from swap.services.outbox import OutboxRelay, outbox_metrics
+
+
+class Command(BaseCommand):
+    help = "Deliver the ledger, blockchain and audit side effects queued by swap stage transitions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--interval", type=float, default=0.5, help="Seconds to sleep when a batch delivered nothing"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Deliver due side effects until a batch delivers nothing, then exit"
+        )
+        parser.add_argument("--stats", action="store_true", help="Print queued and failed counts and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(outbox_metrics(), indent=2))
+            return
+
+        relay = OutboxRelay(batch_size=options["batch_size"])
+
+        if options["once"]:
+            total = 0
+            while processed := relay.run_once():
+                total += processed
+            self.stdout.write(f"Relayed {total} side effects")
+            self.stdout.write(json.dumps(outbox_metrics()))
+            return
+
+        while True:
+            if not relay.run_once():
+                time.sleep(options["interval"])
@@ -0,0 +1,43 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from lines.models import Line
+from swap.services.eligibility import bulk_eligibility
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-screen lines for self-service swap eligibility. Writes eligible "
+        "MSISDNs one per line and prints per-reason counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="File for eligible MSISDNs (default: stdout)")
+        parser.add_argument("--msisdn-prefix", help="Only screen lines whose MSISDN starts with this")
+        parser.add_argument("--counts-only", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        lines = Line.objects.all()
+        if options["msisdn_prefix"]:
+            lines = lines.filter(msisdn__startswith=options["msisdn_prefix"])
+
+        counts, eligible = bulk_eligibility(lines, chunk_size=options["chunk_size"])
+
+        if not options["counts_only"]:
+            out = open(options["output"], "w") if options["output"] else sys.stdout
+            try:
+                for msisdn in eligible:
+                    out.write(msisdn + "\n")
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+
+        summary = {
+            "total": sum(counts.values()),
+            "eligible": counts.pop(None, 0),
+            "reasons": counts,
+        }
+        self.stderr.write(json.dumps(summary, indent=2))
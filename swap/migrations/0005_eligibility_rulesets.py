@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('swap', '0004_alter_swapsession_stage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EligibilityRuleSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField(editable=False, unique=True)),
+                ('rules', models.JSONField()),
+                ('is_active', models.BooleanField(default=False)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='swapsession',
+            name='eligibility_version',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
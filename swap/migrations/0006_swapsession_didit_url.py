@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('swap', '0005_eligibility_rulesets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='swapsession',
+            name='didit_url',
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CLOSED_STAGES = ("PRIMARY_FAILED", "DIDIT_FAILED", "COMPLETED", "LOCKED", "EXPIRED")
+
+
+def expire_duplicate_open_sessions(apps, schema_editor):
+    """Keep only the newest open session of each line, so the unique constraint can be built."""
+    SwapSession = apps.get_model("swap", "SwapSession")
+    newest = models.Subquery(
+        SwapSession.objects
+        .filter(line=models.OuterRef("line"))
+        .exclude(stage__in=CLOSED_STAGES)
+        .order_by("-created_at", "-id")
+        .values("id")[:1]
+    )
+    (
+        SwapSession.objects
+        .exclude(stage__in=CLOSED_STAGES)
+        .exclude(id=newest)
+        .update(stage="EXPIRED")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lines', '0002_line_line_last_swap_at'),
+        ('swap', '0006_swapsession_didit_url'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='swapsession',
+            name='line',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='lines.line'),
+        ),
+        migrations.AlterField(
+            model_name='swapsession',
+            name='stage',
+            field=models.CharField(choices=[('STARTED', 'Started'), ('PRIMARY_FAILED', 'Primary Failed'), ('PRIMARY_PASSED', 'Primary Passed'), ('DIDIT_PENDING', 'Didit Pending'), ('DIDIT_FAILED', 'Didit Failed'), ('DIDIT_PASSED', 'Didit Passed'), ('COMPLETED', 'Completed'), ('LOCKED', 'Locked'), ('EXPIRED', 'Expired')], max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='swapsession',
+            index=models.Index(fields=['line', '-created_at'], name='swap_session_line_created'),
+        ),
+        migrations.AddIndex(
+            model_name='swapsession',
+            index=models.Index(condition=models.Q(('is_locked', True)), fields=['line'], name='swap_session_locked_line'),
+        ),
+        migrations.AddIndex(
+            model_name='swapsession',
+            index=models.Index(fields=['stage', '-id'], name='swap_session_stage'),
+        ),
+        migrations.RunPython(expire_duplicate_open_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='swapsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('stage__in', ('PRIMARY_FAILED', 'DIDIT_FAILED', 'COMPLETED', 'LOCKED', 'EXPIRED')), _negated=True), fields=('line',), name='swap_session_one_open_per_line'),
+        ),
+        migrations.AddConstraint(
+            model_name='swapsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('didit_session_id__isnull', False)), fields=('didit_session_id',), name='swap_session_didit_session_id'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lines', '0002_line_line_last_swap_at'),
+        ('swap', '0007_session_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='swapsession',
+            name='swap_id',
+            field=models.CharField(blank=True, max_length=66, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='swapsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('swap_id__isnull', False)), fields=('swap_id',), name='swap_session_swap_id'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('swap', '0008_session_swap_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effect', models.CharField(choices=[('LEDGER', 'Ledger block'), ('VERIFY', 'Record verification'), ('APPROVE', 'Approve swap'), ('AUDIT', 'Audit log')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('idempotency_key', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox', to='swap.swapsession')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'QUEUED')), fields=['id'], name='swap_outbox_queued')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('swap', '0009_session_outbox'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='sessionoutbox',
+            name='swap_outbox_queued',
+        ),
+        migrations.AddField(
+            model_name='sessionoutbox',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='sessionoutbox',
+            index=models.Index(condition=models.Q(('status', 'QUEUED')), fields=['next_attempt_at', 'id'], name='swap_outbox_due'),
+        ),
+    ]
@@ -1,6 +1,13 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Max
+from django.utils import timezone
 from customers.models import Customer
 
+# Stages a session never leaves. Any other stage is an open session, and a
+# line has at most one of those
+CLOSED_STAGES = ("PRIMARY_FAILED", "DIDIT_FAILED", "COMPLETED", "LOCKED", "EXPIRED")
+
+
 class SwapSession(models.Model):
     STAGES = [
         ("STARTED", "Started"),
@@ -17,13 +24,17 @@ class SwapSession(models.Model):
         # ("ID_PASSED", "ID Passed"),
         ("COMPLETED", "Completed"),
         ("LOCKED", "Locked"),
+        ("EXPIRED", "Expired"),
     ]
 
+    CLOSED_STAGES = CLOSED_STAGES
+
     # customer = models.ForeignKey(Customer, 
     #     null=True, 
     #     blank=True, on_delete=models.CASCADE)
 
-    line = models.ForeignKey("lines.Line", on_delete=models.CASCADE)
+    # Indexed by swap_session_line_created below, not by a separate FK index
+    line = models.ForeignKey("lines.Line", on_delete=models.CASCADE, db_index=False)
     stage = models.CharField(max_length=50, choices=STAGES)
 
     primary_attempts = models.IntegerField(default=0)
@@ -33,10 +44,133 @@ class SwapSession(models.Model):
 
     is_locked = models.BooleanField(default=False)
 
+    # EligibilityRuleSet version that allowed this swap to start
+    eligibility_version = models.IntegerField(null=True, blank=True)
+
+    # bytes32 id of the swap on SIMSwapManager, as returned by initiate_sim_swap
+    swap_id = models.CharField(max_length=66, null=True, blank=True)
+
     didit_session_id = models.CharField(max_length=255, null=True, blank=True)
+    didit_url = models.URLField(max_length=500, null=True, blank=True)
     didit_status = models.CharField(max_length=50, null=True, blank=True)
     didit_payload = models.JSONField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # A line's sessions newest first (the line's history)
+            models.Index(fields=["line", "-created_at"], name="swap_session_line_created"),
+            # The snapshot's "has a locked session" check
+            models.Index(fields=["line"], condition=models.Q(is_locked=True), name="swap_session_locked_line"),
+            # Admin filters by stage and lists newest first
+            models.Index(fields=["stage", "-id"], name="swap_session_stage"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["line"],
+                condition=~models.Q(stage__in=CLOSED_STAGES),
+                name="swap_session_one_open_per_line",
+            ),
+            # Webhook deliveries and jobs look sessions up by their Didit id
+            models.UniqueConstraint(
+                fields=["didit_session_id"],
+                condition=models.Q(didit_session_id__isnull=False),
+                name="swap_session_didit_session_id",
+            ),
+            # Chain events name the swap by its id
+            models.UniqueConstraint(
+                fields=["swap_id"],
+                condition=models.Q(swap_id__isnull=False),
+                name="swap_session_swap_id",
+            ),
+        ]
+
+
+class SessionOutbox(models.Model):
+    """
+    A side effect of a stage transition (ledger block, chain call or audit
+    entry), written in the transition's transaction and delivered by
+    ``manage.py run_session_outbox`` (see swap/services/outbox.py).
+    ``idempotency_key`` makes repeated transitions queue it only once.
+    """
+    EFFECT_CHOICES = [
+        ("LEDGER", "Ledger block"),
+        ("VERIFY", "Record verification"),
+        ("APPROVE", "Approve swap"),
+        ("AUDIT", "Audit log"),
+    ]
+    STATUS_CHOICES = [
+        ("QUEUED", "Queued"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    ]
+
+    session = models.ForeignKey(SwapSession, on_delete=models.CASCADE, related_name="outbox")
+    effect = models.CharField(max_length=20, choices=EFFECT_CHOICES)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="QUEUED")
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    # Pushed back exponentially after each failed delivery
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt_at", "id"], condition=models.Q(status="QUEUED"), name="swap_outbox_due"),
+        ]
+
+    def __str__(self):
+        return f"{self.effect} for session {self.session_id} ({self.status})"
+
+
+class EligibilityRuleSet(models.Model):
+    """
+    A versioned, declarative eligibility policy (format in
+    swap/services/rules.py). Rule sets are never edited in place: saving a
+    change creates a new version, and activating one deactivates the rest.
+    Workers pick up the active version within
+    ELIGIBILITY_RULES_RELOAD_INTERVAL seconds.
+    """
+    version = models.IntegerField(unique=True, editable=False)
+    rules = models.JSONField()
+    is_active = models.BooleanField(default=False)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from swap.services.rules import CompiledRuleSet, InvalidRuleSet
+
+        try:
+            CompiledRuleSet(self.version or 0, self.rules or [])
+        except (InvalidRuleSet, TypeError) as e:
+            raise ValidationError({"rules": str(e)})
+
+    def save(self, *args, **kwargs):
+        # Outside the admin too, so a broken rule set is never stored
+        self.clean()
+
+        assign_version = self.version is None
+        for attempt in range(3):
+            try:
+                with transaction.atomic():
+                    if assign_version:
+                        latest = EligibilityRuleSet.objects.aggregate(v=Max("version"))["v"]
+                        self.version = (latest or 0) + 1
+                    if self.is_active:
+                        EligibilityRuleSet.objects.exclude(pk=self.pk).filter(is_active=True).update(is_active=False)
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                # A concurrent save took the same version number
+                if not assign_version or attempt == 2:
+                    raise
+                self.version = None
+
+    def __str__(self):
+        return f"v{self.version}{' (active)' if self.is_active else ''}"
@@ -1,13 +1,18 @@
-import requests
 from django.conf import settings
 import hmac
 import hashlib
-from django.db import transaction
+import logging
 
-DIDIT_URL = "https://verification.didit.me/v3/session/"
+from asgiref.sync import sync_to_async
 
-def create_didit_session(session):
-    payload = {
+from swap.services.didit_client import get_async_didit_client, get_didit_client
+from swap.services.transitions import transition
+
+logger = logging.getLogger(__name__)
+
+
+def didit_session_payload(session):
+    return {
         "workflow_id": settings.DIDIT_WORKFLOW_ID,
         "callback": settings.DIDIT_CALLBACK_URL,
         "vendor_data": str(session.id),
@@ -15,26 +20,30 @@ def create_didit_session(session):
         "external_id": str(session.id),
     }
 
-    headers = {
-        "x-api-key": settings.DIDIT_API_KEY,
-        "Content-Type": "application/json"
-    }
-
-    response = requests.post(DIDIT_URL, json=payload, headers=headers, timeout=10)
 
-    if response.status_code != 201:
-        print("DIDIT ERROR:", response.status_code, response.text)
-        raise Exception("Didit session creation failed")
+def create_didit_session(session):
+    # Raises DiditError on failure, DiditUnavailable while the breaker is open
+    data = get_didit_client().create_session(didit_session_payload(session))
+    _store_didit_session(session, data)
+    return data
 
-    data = response.json()
-    
-    with transaction.atomic():
-        session.didit_session_id = data.get("session_id")
-        session.stage = "DIDIT_PENDING"
-        session.save()
 
+async def acreate_didit_session(session):
+    """create_didit_session for async views."""
+    data = await get_async_didit_client().create_session(didit_session_payload(session))
+    await sync_to_async(_store_didit_session)(session, data)
     return data
 
+
+def _store_didit_session(session, data):
+    stored = transition(
+        session, "DIDIT_PENDING", didit_session_id=data.get("session_id"), didit_url=data.get("url")
+    )
+    if not stored:
+        # Locked or expired while Didit was called; nothing will use its session
+        logger.warning(f"Session {session.id} left {session.stage}; Didit session {data.get('session_id')} unused")
+
+
 def verify_didit_signature(request):
     received_signature = request.headers.get("X-Signature")
     if not received_signature:
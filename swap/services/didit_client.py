@@ -0,0 +1,271 @@
+"""
+HTTP client for the Didit verification API.
+
+One pooled, keep-alive ``requests.Session`` is shared by the sync client;
+``AsyncDiditClient`` keeps one ``aiohttp.ClientSession`` per event loop for
+ASGI views. Both go through the same circuit breaker, so once Didit is
+degraded every caller fails fast with ``DiditUnavailable`` instead of
+holding a worker for the whole read timeout, and both record into the
+same per-endpoint latency histograms (config.metrics).
+
+Neither requests nor aiohttp speaks HTTP/2, so connections are HTTP/1.1
+with keep-alive. Session creation is a non-idempotent POST, so requests
+are never hedged or retried here.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from config.metrics import EXTERNAL_SECONDS, observe_external
+
+logger = logging.getLogger(__name__)
+
+SESSION_PATH = "/v3/session/"
+
+
+def didit_config(key, default=None):
+    return getattr(settings, "DIDIT_CLIENT", {}).get(key, default)
+
+
+class DiditError(Exception):
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class DiditUnavailable(DiditError):
+    """Raised without calling Didit while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures. While open every
+    call is rejected; after ``reset_timeout`` seconds one trial call is let
+    through and its outcome closes or re-opens the breaker. A trial that
+    never reports back, e.g. a cancelled request, is replaced by another
+    after ``reset_timeout``.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Didit circuit breaker opened after %s failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+def latency_snapshot():
+    """Per-endpoint latency histograms, keyed by "<METHOD> <path>"."""
+    return {
+        endpoint: snapshot
+        for (service, endpoint), snapshot in EXTERNAL_SECONDS.snapshot().items()
+        if service == "didit"
+    }
+
+
+class _BaseDiditClient:
+    def __init__(self, base_url=None, api_key=None, connect_timeout=None,
+                 read_timeout=None, pool_size=None, breaker=None):
+        self.base_url = (base_url or settings.DIDIT_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else settings.DIDIT_API_KEY
+        self.connect_timeout = connect_timeout or didit_config("CONNECT_TIMEOUT", 3.0)
+        self.read_timeout = read_timeout or didit_config("READ_TIMEOUT", 10.0)
+        self.pool_size = pool_size or didit_config("POOL_SIZE", 20)
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=didit_config("BREAKER_FAILURES", 5),
+            reset_timeout=didit_config("BREAKER_RESET", 30.0),
+        )
+
+    @property
+    def headers(self):
+        return {"x-api-key": self.api_key or "", "Content-Type": "application/json"}
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise DiditUnavailable("Didit circuit breaker is open")
+
+    def _finish(self, endpoint, started, status_code, body, expected_status):
+        """Record the call's outcome on the breaker and return the decoded body."""
+        observe_external("didit", endpoint, time.perf_counter() - started)
+        if status_code != expected_status:
+            # 4xx is our request being wrong, not Didit being degraded
+            if status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise DiditError(f"Didit returned {status_code}", status_code=status_code, body=body)
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            # e.g. an HTML page from a proxy in front of Didit
+            self.breaker.record_failure()
+            raise DiditError(f"Didit returned invalid JSON: {e}", status_code=status_code, body=body) from e
+        self.breaker.record_success()
+        return data
+
+    def _failed(self, endpoint, started, exc):
+        observe_external("didit", endpoint, time.perf_counter() - started)
+        self.breaker.record_failure()
+        raise DiditError(f"Didit request failed: {exc}") from exc
+
+
+class DiditClient(_BaseDiditClient):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def _request(self, method, path, expected_status, **kwargs):
+        endpoint = f"{method} {path}"
+        self._check_breaker()
+        started = time.perf_counter()
+        try:
+            response = self.session.request(
+                method,
+                self.base_url + path,
+                headers=self.headers,
+                timeout=(self.connect_timeout, self.read_timeout),
+                **kwargs,
+            )
+            status_code, body = response.status_code, response.text
+        except Exception as e:
+            # Anything, not only RequestException, must settle a half-open breaker
+            self._failed(endpoint, started, e)
+        return self._finish(endpoint, started, status_code, body, expected_status)
+
+    def create_session(self, payload):
+        return self._request("POST", SESSION_PATH, 201, json=payload)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class AsyncDiditClient(_BaseDiditClient):
+    """aiohttp sessions are bound to the loop that created them, so one is kept per loop."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions = {}
+
+    def _get_session(self):
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            # Forget sessions of loops that are gone (async_to_sync makes one per call)
+            for old in [l for l in self._sessions if l.is_closed()]:
+                del self._sessions[old]
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout),
+            )
+            self._sessions[loop] = session
+        return session
+
+    async def _request(self, method, path, expected_status, **kwargs):
+        endpoint = f"{method} {path}"
+        self._check_breaker()
+        started = time.perf_counter()
+        try:
+            async with self._get_session().request(
+                method, self.base_url + path, headers=self.headers, **kwargs
+            ) as response:
+                body = await response.text()
+                status_code = response.status
+        except Exception as e:
+            self._failed(endpoint, started, e)
+        return self._finish(endpoint, started, status_code, body, expected_status)
+
+    async def create_session(self, payload):
+        return await self._request("POST", SESSION_PATH, 201, json=payload)
+
+    async def close(self):
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_didit_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DiditClient()
+    return _client
+
+
+def get_async_didit_client():
+    """Shares the sync client's breaker so both see the same Didit health."""
+    global _async_client
+    if _async_client is None:
+        breaker = get_didit_client().breaker
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncDiditClient(breaker=breaker)
+    return _async_client
+
+
+def reset_didit_clients():
+    """Drop the shared clients so the next call builds them from current settings."""
+    global _client, _async_client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = _async_client = None
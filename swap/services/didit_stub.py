@@ -0,0 +1,83 @@
+"""
+Local stand-in for the Didit API, used by the tests and the load test.
+
+    with DiditStubServer(latency=0.05) as stub:
+        DiditClient(base_url=stub.url).create_session({...})
+
+Point DIDIT_BASE_URL at ``stub.url`` to exercise the real request path.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        with stub.lock:
+            stub.requests.append((self.path, payload))
+            stub.connections.add(self.client_address)
+
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        if stub.status == 201:
+            session_id = str(uuid.uuid4())
+            body = {
+                "session_id": session_id,
+                "url": f"{stub.url}/session/{session_id}",
+                "vendor_data": payload.get("vendor_data"),
+                "status": "Not Started",
+            }
+        else:
+            body = {"detail": "stubbed failure"}
+
+        data = json.dumps(body).encode()
+        self.send_response(stub.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class DiditStubServer:
+    def __init__(self, latency=0.0, status=201, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.status = status
+        self.requests = []
+        self.connections = set()
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
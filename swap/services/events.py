@@ -0,0 +1,189 @@
+"""
+Push notifications for SwapSession state changes.
+
+Code that changes a session's stage calls ``publish_session_event``. On
+PostgreSQL this is a ``pg_notify`` inside the caller's transaction, so it
+is delivered on commit to every process, including the management-command
+workers that apply Didit webhooks. Each web process runs one LISTEN thread
+that feeds an in-process hub, and the hub wakes the asyncio waiters of
+/swap/session/<id>/events/. On other databases, events are published to
+the hub of the current process after commit.
+
+A waiting client costs one query when it connects and nothing afterwards.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "swap_session_events"
+
+TERMINAL_STAGES = {"COMPLETED", "LOCKED", "DIDIT_FAILED", "EXPIRED"}
+
+
+def events_config(key, default=None):
+    return getattr(settings, "SESSION_EVENTS", {}).get(key, default)
+
+
+def session_state(session):
+    """What clients waiting on a session are told; also returned by SwapSessionStatusView."""
+    return {
+        "stage": session.stage,
+        "locked": session.is_locked,
+        "didit_session_id": session.didit_session_id,
+        "didit_url": session.didit_url,
+        "updated_at": session.updated_at.isoformat() if session.updated_at else None,
+    }
+
+
+class Subscription:
+    def __init__(self, hub, session_id):
+        self.hub = hub
+        self.session_id = session_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    async def get(self, timeout):
+        """The next published state, or None after ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+
+class SessionEventHub:
+    """Fan-out from any thread to asyncio subscribers keyed by session id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+        self._listener = None
+
+    def subscribe(self, session_id):
+        subscription = Subscription(self, session_id)
+        with self._lock:
+            self._subscriptions[session_id].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.session_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.session_id]
+
+    def publish(self, session_id, state):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(session_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, state)
+            except RuntimeError:
+                # Event loop already closed; the subscriber is gone
+                pass
+
+    def waiting(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscriptions.values())
+
+    @property
+    def listening(self):
+        """False until the LISTEN thread is connected (always True off PostgreSQL)."""
+        return not _use_pg_notify() or (self._listener is not None and self._listener.ready.is_set())
+
+    def ensure_listener(self, timeout=2.0):
+        """Start the LISTEN thread once per process when running on PostgreSQL."""
+        if not _use_pg_notify():
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = _PgListener(self)
+                self._listener.start()
+            listener = self._listener
+        listener.ready.wait(timeout)
+
+
+class _PgListener(threading.Thread):
+    def __init__(self, hub):
+        super().__init__(name="swap-session-events", daemon=True)
+        self.hub = hub
+        self.ready = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning(f"Session event listener lost its connection: {e}")
+                self.ready.clear()
+                time.sleep(1)
+
+    def _listen(self):
+        wrapper = connections["default"]
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {CHANNEL}")
+            self.ready.set()
+
+            if hasattr(conn, "poll"):
+                # psycopg2
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            else:
+                # psycopg 3
+                for notify in conn.notifies():
+                    self._dispatch(notify.payload)
+        finally:
+            conn.close()
+
+    def _dispatch(self, payload):
+        try:
+            event = json.loads(payload)
+            self.hub.publish(event.pop("id"), event)
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring malformed session event {payload!r}: {e}")
+
+
+hub = SessionEventHub()
+
+
+def _use_pg_notify():
+    return connection.vendor == "postgresql" and events_config("PG_NOTIFY", True)
+
+
+def publish_session_events(sessions):
+    """Notify waiters about each session's current state once the transaction commits."""
+    states = [(session.id, session_state(session)) for session in sessions]
+    if not states:
+        return
+
+    if _use_pg_notify():
+        payloads = [json.dumps({"id": session_id, **state}) for session_id, state in states]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, p) FROM unnest(%s::text[]) AS p", [CHANNEL, payloads])
+    else:
+        def publish():
+            for session_id, state in states:
+                hub.publish(session_id, state)
+        transaction.on_commit(publish)
+
+
+def publish_session_event(session):
+    publish_session_events([session])
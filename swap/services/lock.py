@@ -1,4 +1,12 @@
-def lock_session(session, reason):
-    session.is_locked = True
-    session.stage = "LOCKED"
-    session.save()
+from swap.models import SwapSession
+from swap.services.transitions import can_transition, transition
+
+
+def lock_session(session, reason, **fields):
+    """Lock the session from whatever open stage it is in. Returns False if it had already closed."""
+    while can_transition(session.stage, "LOCKED"):
+        if transition(session, "LOCKED", **fields):
+            return True
+        # Moved on concurrently; lock it from its new stage
+        session.stage = SwapSession.objects.values_list("stage", flat=True).get(pk=session.pk)
+    return session.stage == "LOCKED"
@@ -0,0 +1,187 @@
+"""
+Transactional outbox for the side effects of stage transitions.
+
+The session_transitioned receiver in swap/signals.py calls
+``enqueue_side_effects``, which writes one SessionOutbox row per effect in
+the transition's own transaction: the effect exists if and only if the
+transition committed, and the request only pays for the UPDATE and one
+INSERT. ``manage.py run_session_outbox`` delivers queued rows in batches,
+claimed with SKIP LOCKED so several relays can run:
+
+- LEDGER and AUDIT rows are written with one append_blocks() call and one
+  AuditLog bulk_create, in the short transaction that claims the batch and
+  marks them DONE, so each is delivered exactly once.
+- VERIFY and APPROVE rows are leased in that transaction (next_attempt_at
+  moves CLAIM_TIMEOUT seconds ahead, so other relays skip them) and call
+  BlockchainService after it commits, so no lock, in particular the
+  ledger head's, is held across a chain round-trip. Each row's outcome is
+  then written by one UPDATE that only applies while the lease is ours. A
+  failing call is retried on its own after BACKOFF_BASE seconds, doubled
+  per attempt up to BACKOFF_MAX, until MAX_ATTEMPTS. The mocked calls and
+  the BLOCKCHAIN_ASYNC_SUBMIT intents are keyed by request and swap id, so
+  repeating one is harmless. A call sent inline to the RPC node cannot be
+  taken back: if the relay dies before recording it, it is sent again once
+  the lease runs out.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from audit.models import AuditLog
+from blockchain.ledger import append_blocks
+from blockchain.services import blockchain_service
+from swap.models import SessionOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_config(key, default=None):
+    return getattr(settings, "SESSION_OUTBOX", {}).get(key, default)
+
+
+def side_effects(transition):
+    """``(effect, payload)`` pairs a transition queues."""
+    to_stage = transition.to_stage
+    if to_stage == "PRIMARY_PASSED":
+        return [("VERIFY", {"verification_type": "PERSONAL_DETAILS"})]
+    if to_stage == "DIDIT_PASSED":
+        return [("VERIFY", {"verification_type": "BIOMETRIC_AND_ID"})]
+    if to_stage == "COMPLETED":
+        return [
+            ("LEDGER", {"event": "SWAP_COMPLETED"}),
+            ("APPROVE", {}),
+            ("AUDIT", {"event": "SWAP_COMPLETED", "metadata": {"session_id": transition.session.id}}),
+        ]
+    if to_stage == "LOCKED":
+        return [("AUDIT", {
+            "event": "SWAP_LOCKED",
+            "metadata": {"session_id": transition.session.id, "from_stage": transition.from_stage},
+        })]
+    return []
+
+
+def enqueue_side_effects(transitions):
+    rows = [
+        SessionOutbox(
+            session=t.session,
+            effect=effect,
+            payload=payload,
+            # A stage is entered once, except the self-transitions of
+            # TRANSITIONS, which must not repeat its effects
+            idempotency_key=f"{t.session.id}:{t.to_stage}:{effect}",
+        )
+        for t in transitions
+        for effect, payload in side_effects(t)
+    ]
+    SessionOutbox.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def _call_blockchain(row):
+    session = row.session
+    if row.effect == "VERIFY":
+        blockchain_service.record_verification(
+            request_id=str(session.id),
+            swap_id=session.swap_id,
+            verification_type=row.payload["verification_type"]
+        )
+    else:
+        blockchain_service.approve_sim_swap(str(session.id), session.swap_id)
+
+
+class OutboxRelay:
+    def __init__(self, batch_size=None, max_attempts=None, backoff_base=None, backoff_max=None, claim_timeout=None):
+        self.batch_size = batch_size or outbox_config("BATCH_SIZE", 200)
+        self.max_attempts = max_attempts or outbox_config("MAX_ATTEMPTS", 10)
+        self.backoff_base = backoff_base or outbox_config("BACKOFF_BASE", 2.0)
+        self.backoff_max = backoff_max or outbox_config("BACKOFF_MAX", 600.0)
+        self.claim_timeout = claim_timeout or outbox_config("CLAIM_TIMEOUT", 60.0)
+
+    def backoff(self, attempts):
+        return timedelta(seconds=min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max))
+
+    def run_once(self):
+        """
+        Deliver one batch of due side effects. Returns the number delivered,
+        so 0 when nothing was due or every call in the batch failed.
+        """
+        with transaction.atomic():
+            now = timezone.now()
+            rows = list(
+                SessionOutbox.objects
+                .select_for_update(skip_locked=True, of=("self",))
+                .select_related("session__line")
+                .filter(status="QUEUED", next_attempt_at__lte=now)
+                .order_by("next_attempt_at", "id")[: self.batch_size]
+            )
+            if not rows:
+                return 0
+
+            ledger = [r for r in rows if r.effect == "LEDGER"]
+            audit = [r for r in rows if r.effect == "AUDIT"]
+            append_blocks([(r.payload["event"], r.session.line.msisdn) for r in ledger])
+            AuditLog.objects.bulk_create([
+                AuditLog(msisdn=r.session.line.msisdn, event=r.payload["event"], metadata=r.payload.get("metadata"))
+                for r in audit
+            ])
+            for row in ledger + audit:
+                row.attempts += 1
+                row.status, row.delivered_at = "DONE", now
+
+            calls = [r for r in rows if r.effect in ("VERIFY", "APPROVE")]
+            lease = now + timedelta(seconds=self.claim_timeout)
+            for row in calls:
+                row.next_attempt_at = lease
+
+            SessionOutbox.objects.bulk_update(rows, ["status", "attempts", "next_attempt_at", "delivered_at"])
+
+        failed = 0
+        for row in calls:
+            if not self._call(row, lease):
+                failed += 1
+
+        delivered = len(rows) - failed
+        logger.info(f"Session outbox relayed {delivered} of {len(rows)} side effects")
+        return delivered
+
+    def _call(self, row, lease):
+        """Make one leased chain call and record its outcome. Returns whether it succeeded."""
+        row.attempts += 1
+        try:
+            _call_blockchain(row)
+        except Exception as e:
+            now = timezone.now()
+            row.last_error = str(e)
+            if row.attempts >= self.max_attempts:
+                row.status = "FAILED"
+            else:
+                row.next_attempt_at = now + self.backoff(row.attempts)
+            logger.error(f"Outbox {row.effect} for session {row.session_id} failed: {e}")
+        else:
+            row.status, row.delivered_at = "DONE", timezone.now()
+
+        # Another relay owns the row once the lease has run out
+        recorded = SessionOutbox.objects.filter(pk=row.pk, status="QUEUED", next_attempt_at=lease).update(
+            status=row.status,
+            attempts=row.attempts,
+            last_error=row.last_error,
+            next_attempt_at=row.next_attempt_at,
+            delivered_at=row.delivered_at,
+        )
+        if not recorded:
+            logger.warning(f"Outbox {row.effect} for session {row.session_id} outlived its lease")
+        return row.status == "DONE"
+
+
+def outbox_metrics():
+    """Queued rows per effect and the age of the oldest one."""
+    queued = SessionOutbox.objects.filter(status="QUEUED")
+    oldest = queued.aggregate(oldest=Min("created_at"))["oldest"]
+    return {
+        "queued": dict(queued.order_by().values_list("effect").annotate(n=Count("id"))),
+        "oldestQueuedSeconds": round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0,
+        "failed": SessionOutbox.objects.filter(status="FAILED").count(),
+    }
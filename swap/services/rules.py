@@ -0,0 +1,187 @@
+"""
+Declarative eligibility rules.
+
+A rule set is a JSON list of rejection rules, stored in EligibilityRuleSet:
+
+    {"reason": "Line not active", "field": "line.status", "op": "ne", "value": "ACTIVE"}
+
+``field`` is ``line.<field>`` or ``customer.<field>``. ``op`` is one of
+is_true, is_false, eq, ne, in, not_in or within_days (a date within the
+last ``value`` days; a null ``value`` means SWAP_COOLDOWN_DAYS). ``cost`` (default 1) orders
+evaluation cheapest-first; rules of equal cost keep their listed order,
+which decides the reason reported when several rules fail.
+
+Each rule set is compiled once into a flat Python function (one ``if`` per
+rule, short-circuiting on the first match) and into SQL conditions for
+bulk screening. Only validated model field names are written into the
+generated source; values are passed in as bound constants.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import DateTimeField, ExpressionWrapper, Q
+from django.db.models.functions import Now
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES = [
+    {"reason": "Golden number", "field": "line.is_golden_number", "op": "is_true"},
+    {"reason": "Whitelisted", "field": "line.is_whitelisted", "op": "is_true"},
+    {"reason": "Line not active", "field": "line.status", "op": "ne", "value": "ACTIVE"},
+    {"reason": "Fraud location flagged", "field": "customer.fraud_location", "op": "in", "value": ["PRISON_SITE", "DETACHED"]},
+    {"reason": "IPRS not verified", "field": "customer.iprs_verified", "op": "is_false"},
+    {"reason": "IPRS not approved", "field": "customer.iprs_approved", "op": "is_false"},
+    {"reason": "Line roaming", "field": "line.is_roaming", "op": "is_true"},
+    {"reason": "Not on IN data", "field": "line.on_in_data", "op": "is_false"},
+    {"reason": "Swapped recently", "field": "line.last_swap_at", "op": "within_days", "value": None},
+]
+
+# op -> (Python condition template, SQL condition builder)
+OPERATORS = {
+    "is_true": ("{field}", lambda path, value: Q(**{path: True})),
+    "is_false": ("not {field}", lambda path, value: Q(**{path: False})),
+    "eq": ("{field} == {value}", lambda path, value: Q(**{path: value})),
+    "ne": ("{field} != {value}", lambda path, value: ~Q(**{path: value})),
+    "in": ("{field} in {value}", lambda path, value: Q(**{f"{path}__in": value})),
+    "not_in": ("{field} not in {value}", lambda path, value: ~Q(**{f"{path}__in": value})),
+    # Compared with the clock at evaluation time, never at compile time
+    "within_days": (
+        "{field} is not None and {field} > _now() - {value}",
+        lambda path, value: Q(**{f"{path}__gt": ExpressionWrapper(Now() - value, output_field=DateTimeField())}),
+    ),
+}
+
+
+class InvalidRuleSet(Exception):
+    pass
+
+
+def _model_fields():
+    from customers.models import Customer
+    from lines.models import Line
+
+    return {
+        "line": {f.name for f in Line._meta.concrete_fields},
+        "customer": {f.name for f in Customer._meta.concrete_fields},
+    }
+
+
+class CompiledRuleSet:
+    def __init__(self, version, rules):
+        self.version = version
+        self.rules = sorted(rules, key=lambda rule: rule.get("cost", 1))
+        self.evaluate = self._compile_python()
+        self.sql_rules = self._compile_sql()
+
+    def _validate(self, rule, fields):
+        try:
+            owner, name = rule["field"].split(".")
+        except (KeyError, ValueError):
+            raise InvalidRuleSet(f"Rule needs a field like 'line.status': {rule}")
+        if name not in fields.get(owner, ()):
+            raise InvalidRuleSet(f"Unknown field {rule['field']}")
+        if rule.get("op") not in OPERATORS:
+            raise InvalidRuleSet(f"Unknown op {rule.get('op')!r}")
+        if not rule.get("reason"):
+            raise InvalidRuleSet(f"Rule needs a reason: {rule}")
+        if rule["op"] == "within_days" and not isinstance(rule.get("value"), (int, type(None))):
+            raise InvalidRuleSet(f"within_days needs a whole number of days: {rule}")
+        return owner, name
+
+    def _value(self, rule):
+        value = rule.get("value")
+        if rule["op"] in ("in", "not_in"):
+            return frozenset(value)
+        if rule["op"] == "within_days":
+            days = getattr(settings, "SWAP_COOLDOWN_DAYS", 0) if value is None else value
+            return timedelta(days=days)
+        return value
+
+    def _compile_python(self):
+        fields = _model_fields()
+        namespace = {"_now": timezone.now}
+        body = ["def evaluate(line):", "    customer = line.customer"]
+
+        for i, rule in enumerate(self.rules):
+            owner, name = self._validate(rule, fields)
+            namespace[f"_value{i}"] = self._value(rule)
+            namespace[f"_reason{i}"] = rule["reason"]
+
+            condition = OPERATORS[rule["op"]][0].format(field=f"{owner}.{name}", value=f"_value{i}")
+            body.append(f"    if {condition}:")
+            body.append(f"        return _reason{i}")
+
+        body.append("    return None")
+        exec(compile("\n".join(body), f"<eligibility rules v{self.version}>", "exec"), namespace)
+        return namespace["evaluate"]
+
+    def _compile_sql(self):
+        sql_rules = []
+        for rule in self.rules:
+            owner, name = rule["field"].split(".")
+            path = name if owner == "line" else f"customer__{name}"
+            sql_rules.append((rule["reason"], OPERATORS[rule["op"]][1](path, self._value(rule))))
+        return sql_rules
+
+
+_lock = threading.Lock()
+_compiled = None
+_checked_at = 0.0
+
+
+def _active_stamp():
+    from swap.models import EligibilityRuleSet
+
+    return (
+        EligibilityRuleSet.objects
+        .filter(is_active=True)
+        .order_by("-version")
+        .values_list("version", "rules")
+        .first()
+    )
+
+
+def get_ruleset():
+    """
+    The compiled active rule set for this process.
+
+    The active version stamp is re-read at most every
+    ELIGIBILITY_RULES_RELOAD_INTERVAL seconds and the rules are recompiled
+    only when it changes. With no active row the built-in defaults apply
+    as version 0. An active row that does not compile (saved around
+    EligibilityRuleSet.clean(), e.g. by a raw UPDATE) is logged and the
+    last good rule set, or the defaults, stays in use.
+    """
+    global _compiled, _checked_at
+
+    interval = getattr(settings, "ELIGIBILITY_RULES_RELOAD_INTERVAL", 5)
+    now = time.monotonic()
+    if _compiled is not None and now - _checked_at < interval:
+        return _compiled
+
+    with _lock:
+        if _compiled is not None and now - _checked_at < interval:
+            return _compiled
+
+        stamp = _active_stamp()
+        version, rules = stamp if stamp else (0, DEFAULT_RULES)
+        if _compiled is None or _compiled.version != version:
+            try:
+                _compiled = CompiledRuleSet(version, rules)
+            except (InvalidRuleSet, TypeError) as e:
+                logger.error(f"Eligibility rule set v{version} is invalid, keeping the previous rules: {e}")
+                if _compiled is None:
+                    _compiled = CompiledRuleSet(0, DEFAULT_RULES)
+        _checked_at = now
+        return _compiled
+
+
+def reset_ruleset_cache():
+    global _compiled, _checked_at
+    with _lock:
+        _compiled = None
+        _checked_at = 0.0
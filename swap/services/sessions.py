@@ -0,0 +1,53 @@
+"""
+Opening swap sessions.
+
+A line has at most one open session, i.e. one whose stage is not in
+CLOSED_STAGES (the swap_session_one_open_per_line constraint). /swap/start/
+tries the INSERT first, so the usual case costs no extra query. If the line
+already has an open session, the start resumes it while it has been
+touched within SWAP_SESSION_TTL_MINUTES. Otherwise the old session is
+marked EXPIRED and a new one is opened.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from swap.models import CLOSED_STAGES, SwapSession
+from swap.services.transitions import transition
+
+# Where the client goes next when it resumes a session
+NEXT_STEPS = {
+    "STARTED": "PRIMARY",
+    "PRIMARY_PASSED": "DIDIT",
+    "DIDIT_PENDING": "DIDIT",
+    "DIDIT_PASSED": "COMPLETE",
+}
+
+
+def open_session(line_id, rules_version, attempts=3):
+    """Returns ``(session, created)``: a new STARTED session, or the line's fresh open one."""
+    ttl = timedelta(minutes=getattr(settings, "SWAP_SESSION_TTL_MINUTES", 30))
+
+    for _ in range(attempts):
+        try:
+            with transaction.atomic():
+                session = SwapSession.objects.create(
+                    line_id=line_id, stage="STARTED", eligibility_version=rules_version
+                )
+            return session, True
+        except IntegrityError:
+            pass
+
+        current = SwapSession.objects.filter(line_id=line_id).exclude(stage__in=CLOSED_STAGES).first()
+        if current is None:
+            # Closed between our INSERT and SELECT
+            continue
+        if current.updated_at >= timezone.now() - ttl:
+            return current, False
+
+        # Abandoned: expire it unless it moved on in the meantime
+        transition(current, "EXPIRED", where={"updated_at": current.updated_at})
+
+    raise IntegrityError(f"Could not open a swap session for line {line_id}")
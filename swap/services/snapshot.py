@@ -0,0 +1,106 @@
+"""
+Read-through cache of what StartSwapView needs to know about an MSISDN:
+whether the line exists, its eligibility decision and whether it has a
+locked session.
+
+Entries are dropped by post_save/post_delete signals on Line, Customer and
+SwapSession (swap/signals.py). On a miss only the worker that wins a
+short-lived cache lock recomputes; the others wait briefly for its result.
+
+Signals only reach the cache of the process that made the change, so run
+more than one worker with a shared backend (CACHE_BACKEND, e.g. Redis);
+with the per-process default, other workers see changes after TTL seconds.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from lines.models import Line
+from swap.models import SwapSession
+from swap.services.eligibility import evaluate_eligibility
+
+KEY_PREFIX = "swap:snapshot:"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _config():
+    return getattr(settings, "ELIGIBILITY_CACHE", {})
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def snapshot_stats():
+    """Per-process hit/miss/wait counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def snapshot_key(msisdn):
+    return f"{KEY_PREFIX}{msisdn}"
+
+
+def compute_snapshot(msisdn):
+    try:
+        line = Line.objects.select_related("customer").get(msisdn=msisdn)
+    except Line.DoesNotExist:
+        return {"found": False}
+
+    allowed, reason, rules_version = evaluate_eligibility(line)
+    return {
+        "found": True,
+        "line_id": line.id,
+        "customer_id": line.customer_id,
+        # Key for the fraud velocity limits checked after eligibility
+        "id_number": line.customer.id_number,
+        "allowed": allowed,
+        "reason": reason,
+        "rules_version": rules_version,
+        "locked": SwapSession.objects.filter(line=line, is_locked=True).exists(),
+    }
+
+
+def get_snapshot(msisdn):
+    config = _config()
+    if not config.get("ENABLED"):
+        return compute_snapshot(msisdn)
+
+    key = snapshot_key(msisdn)
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        _count("hits")
+        return snapshot
+
+    _count("misses")
+    lock_key = f"{key}:lock"
+    lock_timeout = config.get("LOCK_TIMEOUT", 5)
+
+    if not cache.add(lock_key, 1, timeout=lock_timeout):
+        # Another worker is recomputing; give it a moment before doing it ourselves
+        _count("waits")
+        deadline = time.monotonic() + config.get("WAIT_TIMEOUT", 0.5)
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            snapshot = cache.get(key)
+            if snapshot is not None:
+                return snapshot
+        return compute_snapshot(msisdn)
+
+    try:
+        snapshot = compute_snapshot(msisdn)
+        cache.set(key, snapshot, timeout=config.get("TTL", 30))
+    finally:
+        cache.delete(lock_key)
+    return snapshot
+
+
+def invalidate_snapshot(*msisdns):
+    if _config().get("ENABLED") and msisdns:
+        cache.delete_many([snapshot_key(m) for m in msisdns])
@@ -0,0 +1,83 @@
+"""
+SwapSession stage transitions.
+
+TRANSITIONS lists the stages each open stage may move to; closed stages
+(CLOSED_STAGES) have no way out. ``transition`` applies one as a single
+conditional ``UPDATE ... WHERE id = %s AND stage = <expected>``, so no row
+lock is taken. A concurrent request that moved the session first makes the
+UPDATE match nothing, and the caller gets False instead of overwriting it.
+
+Every applied transition is announced through ``session_transitioned``,
+sent in the UPDATE's transaction with ``transitions``, a list of
+Transition tuples (batch writers such as the Didit inbox send one signal
+for the whole batch). Receivers in swap/signals.py publish session events,
+drop cached snapshots of locked lines, start the cooldown of completed
+swaps and queue ledger, chain and audit side effects in the outbox
+(swap/services/outbox.py); other apps can connect their own.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from swap.models import SwapSession
+
+TRANSITIONS = {
+    # Re-running primary vetting, e.g. after Didit was unavailable, keeps PRIMARY_PASSED
+    "STARTED": {"PRIMARY_PASSED", "LOCKED", "EXPIRED"},
+    "PRIMARY_PASSED": {"PRIMARY_PASSED", "DIDIT_PENDING", "LOCKED", "EXPIRED"},
+    "DIDIT_PENDING": {"DIDIT_PENDING", "DIDIT_PASSED", "LOCKED", "EXPIRED"},
+    # on_review passes, and Didit may still approve or decline it afterwards
+    "DIDIT_PASSED": {"DIDIT_PASSED", "COMPLETED", "LOCKED", "EXPIRED"},
+}
+
+Transition = namedtuple("Transition", ["session", "from_stage", "to_stage"])
+
+session_transitioned = Signal()
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def can_transition(from_stage, to_stage):
+    return to_stage in TRANSITIONS.get(from_stage, ())
+
+
+def check_transition(from_stage, to_stage):
+    if not can_transition(from_stage, to_stage):
+        raise InvalidTransition(f"A session cannot move from {from_stage} to {to_stage}")
+
+
+def transition(session, to_stage, where=None, **fields):
+    """
+    Move ``session`` from its current (in-memory) stage to ``to_stage``,
+    also setting ``fields``. ``where`` adds conditions the row must still
+    meet. Returns False, leaving the instance untouched, when the row has
+    left that stage in the meantime. Raises InvalidTransition when
+    TRANSITIONS does not allow the move.
+    """
+    from_stage = session.stage
+    check_transition(from_stage, to_stage)
+
+    values = {"stage": to_stage, "updated_at": timezone.now(), **fields}
+    if to_stage == "LOCKED":
+        values["is_locked"] = True
+
+    # Receivers write in the same transaction, so their rows commit with the stage
+    with transaction.atomic():
+        updated = SwapSession.objects.filter(pk=session.pk, stage=from_stage, **(where or {})).update(**values)
+        if not updated:
+            return False
+
+        for name, value in values.items():
+            setattr(session, name, value)
+        send_transitions([Transition(session, from_stage, to_stage)])
+    return True
+
+
+def send_transitions(transitions):
+    """Announce transitions already written, e.g. by a bulk_update of locked rows."""
+    if transitions:
+        session_transitioned.send(sender=SwapSession, transitions=transitions)
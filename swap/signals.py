@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from customers.models import Customer
+from lines.models import Line
+from swap.models import SwapSession
+from swap.services.events import publish_session_events
+from swap.services.outbox import enqueue_side_effects
+from swap.services.snapshot import invalidate_snapshot
+from swap.services.transitions import session_transitioned
+
+
+def _invalidate_on_commit(*msisdns):
+    # After commit, so a concurrent recompute cannot re-cache the old row
+    transaction.on_commit(lambda: invalidate_snapshot(*msisdns))
+
+
+@receiver([post_save, post_delete], sender=Line)
+def invalidate_line_snapshot(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.msisdn)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_customer_snapshot(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    msisdns = list(Line.objects.filter(customer_id=instance.pk).values_list("msisdn", flat=True))
+    _invalidate_on_commit(*msisdns)
+
+
+@receiver([post_save, post_delete], sender=SwapSession)
+def invalidate_session_snapshot(sender, instance, created=False, update_fields=None, **kwargs):
+    # Only the lock flag of a session is part of the snapshot, and a
+    # brand-new session is never locked
+    if created or (update_fields is not None and "is_locked" not in update_fields):
+        return
+    _invalidate_on_commit(*_session_msisdns([instance]))
+
+
+def _session_msisdns(sessions):
+    msisdns = [s.line.msisdn for s in sessions if SwapSession.line.is_cached(s)]
+    uncached = [s.line_id for s in sessions if not SwapSession.line.is_cached(s)]
+    if uncached:
+        msisdns += Line.objects.filter(pk__in=uncached).values_list("msisdn", flat=True)
+    return msisdns
+
+
+@receiver(session_transitioned)
+def publish_transitions(sender, transitions, **kwargs):
+    publish_session_events([t.session for t in transitions])
+
+
+@receiver(session_transitioned)
+def invalidate_locked_snapshots(sender, transitions, **kwargs):
+    # Transitions are UPDATEs, which send no post_save
+    locked = [t.session for t in transitions if t.to_stage == "LOCKED"]
+    if locked:
+        _invalidate_on_commit(*_session_msisdns(locked))
+
+
+@receiver(session_transitioned)
+def start_swap_cooldown(sender, transitions, **kwargs):
+    # Same transaction as the completion, so the cooldown cannot be missed
+    completed = [t.session for t in transitions if t.to_stage == "COMPLETED"]
+    if completed:
+        Line.objects.filter(pk__in=[s.line_id for s in completed]).update(last_swap_at=timezone.now())
+        _invalidate_on_commit(*_session_msisdns(completed))
+
+
+@receiver(session_transitioned)
+def queue_side_effects(sender, transitions, **kwargs):
+    enqueue_side_effects(transitions)
+
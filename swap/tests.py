@@ -1,3 +1,654 @@
-from django.test import TestCase
+import asyncio
+import io
+import itertools
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+
+from audit.models import AuditLog
+from blockchain.models import Block, BlockchainTransaction
+from blockchain.services import blockchain_service
+from config.metrics import REQUEST_DB_QUERIES, observe_external
+from customers.models import Customer
+from swap.async_views import CompleteSwapAsyncView, StartSwapAsyncView
+from lines.models import Line
+from swap.models import EligibilityRuleSet, SessionOutbox, SwapSession
+from swap.services.didit_client import (
+    AsyncDiditClient, CircuitBreaker, DiditClient, DiditError, DiditUnavailable, latency_snapshot,
+)
+from swap.services.didit_stub import DiditStubServer
+from swap.services.events import publish_session_event
+from swap.services.outbox import OutboxRelay
+from swap.services.eligibility import bulk_eligibility, evaluate_eligibility, is_swap_allowed
+from swap.services.rules import DEFAULT_RULES, get_ruleset, reset_ruleset_cache
+from swap.services.snapshot import get_snapshot
+from swap.services.transitions import InvalidTransition, session_transitioned, transition
+from swap.utils.msisdn import MSISDN_ERRORS, InvalidMSISDN, normalize_msisdn, normalize_msisdn_batch
+
+
+def reference_is_swap_allowed(line):
+    """The original hand-written rules, kept as the oracle for the compiled ones."""
+    customer = line.customer
+    if line.is_golden_number:
+        return False, "Golden number"
+    if line.is_whitelisted:
+        return False, "Whitelisted"
+    if line.status != "ACTIVE":
+        return False, "Line not active"
+    if customer.fraud_location in ["PRISON_SITE", "DETACHED"]:
+        return False, "Fraud location flagged"
+    if not customer.iprs_verified:
+        return False, "IPRS not verified"
+    if not customer.iprs_approved:
+        return False, "IPRS not approved"
+    if line.is_roaming:
+        return False, "Line roaming"
+    if not line.on_in_data:
+        return False, "Not on IN data"
+    return True, None
+
+
+class BulkEligibilityTests(TestCase):
+    """Every evaluator must agree on every combination of rule inputs."""
+
+    def setUp(self):
+        reset_ruleset_cache()
+
+    @classmethod
+    def setUpTestData(cls):
+        combos = list(itertools.product(
+            [False, True],                          # is_golden_number
+            [False, True],                          # is_whitelisted
+            ["ACTIVE", "SUSPENDED", "IDLE"],         # status
+            ["NORMAL", "PRISON_SITE", "DETACHED"],  # fraud_location
+            [False, True],                          # iprs_verified
+            [False, True],                          # iprs_approved
+            [False, True],                          # is_roaming
+            [False, True],                          # on_in_data
+        ))
+
+        # bulk_create skips the post_save signal, so lines are created here
+        customers = Customer.objects.bulk_create([
+            Customer(
+                msisdn=f"2547{i:08d}",
+                full_name="Test Customer",
+                id_number=str(i),
+                yob=1990,
+                fraud_location=fraud,
+                iprs_verified=verified,
+                iprs_approved=approved,
+            )
+            for i, (_, _, _, fraud, verified, approved, _, _) in enumerate(combos)
+        ])
+        customers = {c.msisdn: c for c in Customer.objects.filter(msisdn__in=[c.msisdn for c in customers])}
+
+        Line.objects.bulk_create([
+            Line(
+                msisdn=f"2547{i:08d}",
+                customer=customers[f"2547{i:08d}"],
+                is_golden_number=golden,
+                is_whitelisted=whitelisted,
+                status=status,
+                is_roaming=roaming,
+                on_in_data=on_in,
+            )
+            for i, (golden, whitelisted, status, _, _, _, roaming, on_in) in enumerate(combos)
+        ])
+
+    def test_matches_scalar_rules(self):
+        lines = Line.objects.select_related("customer")
+        expected_counts = {}
+        expected_eligible = []
+        for line in lines.order_by("id"):
+            allowed, reason = is_swap_allowed(line)
+            expected_counts[reason] = expected_counts.get(reason, 0) + 1
+            if allowed:
+                expected_eligible.append(line.msisdn)
+
+        counts, eligible = bulk_eligibility(Line.objects.all(), chunk_size=50)
+
+        self.assertEqual(counts, expected_counts)
+        self.assertEqual(list(eligible), expected_eligible)
+        self.assertEqual(len(expected_counts), 9)
+
+    def test_compiled_rules_match_hand_written(self):
+        for line in Line.objects.select_related("customer"):
+            self.assertEqual(is_swap_allowed(line), reference_is_swap_allowed(line))
+
+    def test_activated_ruleset_is_picked_up(self):
+        line = Line.objects.select_related("customer").filter(
+            is_golden_number=False, is_whitelisted=False, status="ACTIVE",
+            customer__fraud_location="NORMAL", customer__iprs_verified=True,
+            customer__iprs_approved=True, is_roaming=False, on_in_data=True,
+        ).first()
+        self.assertEqual(evaluate_eligibility(line), (True, None, 0))
+
+        rules = DEFAULT_RULES + [{"reason": "Prepaid blocked", "field": "line.is_prepaid", "op": "is_true"}]
+        EligibilityRuleSet.objects.create(rules=rules, is_active=True)
+
+        with self.settings(ELIGIBILITY_RULES_RELOAD_INTERVAL=0):
+            self.assertEqual(evaluate_eligibility(line), (False, "Prepaid blocked", 1))
+            counts, _ = bulk_eligibility(Line.objects.all())
+        self.assertNotIn(None, counts)
+
+    def test_save_validates_and_retries_a_taken_version(self):
+        with self.assertRaises(ValidationError):
+            EligibilityRuleSet.objects.create(rules=[{"reason": "Bad", "field": "line.nope", "op": "is_true"}])
+
+        EligibilityRuleSet.objects.create(rules=DEFAULT_RULES)
+        # As if a concurrent save read the max version before ours committed
+        with mock.patch.object(EligibilityRuleSet.objects, "aggregate", side_effect=[{"v": 0}, {"v": 1}]):
+            ruleset = EligibilityRuleSet.objects.create(rules=DEFAULT_RULES)
+        self.assertEqual(ruleset.version, 2)
+
+    def test_invalid_active_row_keeps_the_previous_rules(self):
+        good = EligibilityRuleSet.objects.create(rules=DEFAULT_RULES, is_active=True)
+        with self.settings(ELIGIBILITY_RULES_RELOAD_INTERVAL=0):
+            self.assertEqual(get_ruleset().version, good.version)
+            bad = EligibilityRuleSet.objects.create(rules=DEFAULT_RULES)
+            # Bypasses save(), like a fixture or a raw UPDATE
+            EligibilityRuleSet.objects.filter(pk=bad.pk).update(rules=[{"op": "nope"}], is_active=True)
+            EligibilityRuleSet.objects.filter(pk=good.pk).update(is_active=False)
+            with self.assertLogs("swap.services.rules", "ERROR"):
+                self.assertEqual(get_ruleset().version, good.version)
+
+
+class SnapshotCacheTests(TestCase):
+    """Cached snapshots are served without queries and dropped on writes."""
+
+    def setUp(self):
+        cache.clear()
+        reset_ruleset_cache()
+        self.customer = Customer.objects.create(
+            msisdn="254700000001",
+            full_name="Test Customer",
+            id_number="1",
+            yob=1990,
+            iprs_verified=True,
+            iprs_approved=True,
+        )
+        self.line, _ = Line.objects.get_or_create(
+            msisdn="254700000001",
+            defaults={"customer": self.customer, "status": "ACTIVE"},
+        )
+
+    def test_hit_needs_no_queries(self):
+        snapshot = get_snapshot(self.line.msisdn)
+        self.assertTrue(snapshot["allowed"])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_snapshot(self.line.msisdn), snapshot)
+
+    def test_writes_invalidate(self):
+        self.assertTrue(get_snapshot(self.line.msisdn)["allowed"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.iprs_approved = False
+            self.customer.save()
+        self.assertEqual(get_snapshot(self.line.msisdn)["reason"], "IPRS not approved")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.iprs_approved = True
+            self.customer.save()
+            session = SwapSession.objects.create(line=self.line, stage="STARTED")
+        self.assertFalse(get_snapshot(self.line.msisdn)["locked"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session.is_locked = True
+            session.save()
+        self.assertTrue(get_snapshot(self.line.msisdn)["locked"])
+
+
+class DiditClientTests(SimpleTestCase):
+    """The pooled clients against a local Didit stub."""
+
+    def setUp(self):
+        self.stub = DiditStubServer().start()
+        self.addCleanup(self.stub.stop)
+
+    def test_sync_client_reuses_connection(self):
+        client = DiditClient(base_url=self.stub.url, api_key="key")
+        self.addCleanup(client.close)
+
+        for i in range(5):
+            data = client.create_session({"vendor_data": str(i)})
+            self.assertEqual(data["vendor_data"], str(i))
+
+        self.assertEqual(len(self.stub.requests), 5)
+        self.assertEqual(len(self.stub.connections), 1)
+        self.assertGreaterEqual(latency_snapshot()["POST /v3/session/"]["count"], 5)
+
+    def test_async_client(self):
+        client = AsyncDiditClient(base_url=self.stub.url, api_key="key")
+
+        async def run():
+            try:
+                return await asyncio.gather(*[
+                    client.create_session({"vendor_data": str(i)}) for i in range(5)
+                ])
+            finally:
+                await client.close()
+
+        results = asyncio.run(run())
+        self.assertEqual(sorted(r["vendor_data"] for r in results), ["0", "1", "2", "3", "4"])
+
+    def test_breaker_fails_fast(self):
+        self.stub.status = 503
+        client = DiditClient(
+            base_url=self.stub.url, api_key="key",
+            breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+        )
+        self.addCleanup(client.close)
+
+        for _ in range(2):
+            with self.assertRaises(DiditError):
+                client.create_session({})
+        with self.assertRaises(DiditUnavailable):
+            client.create_session({})
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_breaker_half_open_recovers(self):
+        self.stub.status = 503
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        client = DiditClient(base_url=self.stub.url, api_key="key", breaker=breaker)
+        self.addCleanup(client.close)
+
+        with self.assertRaises(DiditError):
+            client.create_session({})
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.stub.status = 201
+        client.create_session({})
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_non_json_body_is_a_didit_error(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        client = DiditClient(base_url=self.stub.url, api_key="key", breaker=breaker)
+        self.addCleanup(client.close)
+
+        html = mock.Mock(status_code=201, text="<html>Bad gateway</html>")
+        with mock.patch.object(client.session, "request", return_value=html):
+            with self.assertRaises(DiditError) as raised:
+                client.create_session({})
+        self.assertEqual(raised.exception.status_code, 201)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_any_error_in_the_trial_reopens_the_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        client = DiditClient(base_url=self.stub.url, api_key="key", breaker=breaker)
+        self.addCleanup(client.close)
+        breaker.record_failure()
+
+        with mock.patch.object(client.session, "request", side_effect=RuntimeError("boom")):
+            with self.assertRaises(DiditError):
+                client.create_session({})
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        # A trial that never reports back does not hold the breaker half-open
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        client.create_session({})
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+# pg_notify is only delivered on commit, which never happens inside TestCase
+@override_settings(SESSION_EVENTS={"MAX_WAIT": 5, "HEARTBEAT": 1, "PG_NOTIFY": False})
+class SessionEventsTests(TestCase):
+    """Waiting clients are woken by published changes, not by polling."""
+
+    def setUp(self):
+        customer = Customer.objects.create(msisdn="254700000004", full_name="Test", id_number="4", yob=1990)
+        self.session = SwapSession.objects.create(
+            line=Line.objects.get(msisdn=customer.msisdn), stage="DIDIT_PASSED"
+        )
+        self.url = f"/swap/session/{self.session.id}/events/"
+
+    def _complete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.stage = "COMPLETED"
+            self.session.save()
+            publish_session_event(self.session)
+
+    async def test_long_poll(self):
+        state = (await self.async_client.get(self.url)).json()
+        self.assertEqual(state["stage"], "DIDIT_PASSED")
+
+        response = await self.async_client.get(self.url, {"since": state["updated_at"], "wait": 0.1})
+        self.assertFalse(response.json()["changed"])
+
+        waiting = asyncio.ensure_future(
+            self.async_client.get(self.url, {"since": state["updated_at"], "wait": 5})
+        )
+        await asyncio.sleep(0.1)
+        self.assertFalse(waiting.done())
+
+        await sync_to_async(self._complete)()
+        response = await asyncio.wait_for(waiting, 2)
+        self.assertEqual((response.json()["stage"], response.json()["changed"]), ("COMPLETED", True))
+
+    async def test_server_sent_events(self):
+        response = await self.async_client.get(self.url, headers={"Accept": "text/event-stream"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+
+        self.assertIn(b'"DIDIT_PASSED"', await anext(stream))
+        await sync_to_async(self._complete)()
+        self.assertIn(b'"COMPLETED"', await asyncio.wait_for(anext(stream), 2))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+
+@override_settings(SESSION_EVENTS={"PG_NOTIFY": False})
+class AsyncSwapViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_ruleset_cache()
+        Customer.objects.create(
+            msisdn="254700000006", full_name="Test", id_number="6", yob=1990, iprs_verified=True, iprs_approved=True
+        )
+        self.factory = AsyncRequestFactory()
+
+    def post(self, view, path, data):
+        return view.as_view()(self.factory.post(path, data, content_type="application/json"))
+
+    async def test_start_then_complete(self):
+        response = await self.post(StartSwapAsyncView, "/swap/start/", {"msisdn": "254700000006"})
+        body = json.loads(response.content)
+        self.assertEqual((body["allowed"], body["next_step"]), (True, "PRIMARY"))
+
+        session = await SwapSession.objects.aget(id=body["session_id"])
+        response = await self.post(CompleteSwapAsyncView, "/swap/complete/", {"session_id": session.id})
+        self.assertEqual(response.status_code, 400)
+
+        session.stage = "DIDIT_PASSED"
+        await session.asave()
+        response = await self.post(CompleteSwapAsyncView, "/swap/complete/", {"session_id": session.id})
+        self.assertEqual(json.loads(response.content), {"success": True})
+
+    async def test_rejects_bad_body(self):
+        response = await self.post(StartSwapAsyncView, "/swap/start/", "{")
+        self.assertEqual(response.status_code, 400)
+        response = await self.post(CompleteSwapAsyncView, "/swap/complete/", {})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(REQUEST_METRICS={"ENABLED": True, "BUDGETS": {"queries": 0}, "VIEW_BUDGETS": {}})
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(msisdn="254700000007", full_name="Test", id_number="7", yob=1990)
+        self.session = SwapSession.objects.create(line=Line.objects.get(msisdn=customer.msisdn), stage="STARTED")
+
+    def test_records_queries_per_route_and_warns_over_budget(self):
+        route = ("swap/session/<int:session_id>/",)
+        before = REQUEST_DB_QUERIES.snapshot().get(route, {"count": 0, "sum": 0})
+
+        with self.assertLogs("config.metrics", "WARNING") as logs:
+            self.client.get(f"/swap/session/{self.session.id}/")
+
+        after = REQUEST_DB_QUERIES.snapshot()[route]
+        self.assertEqual((after["count"] - before["count"], after["sum"] - before["sum"]), (1, 1))
+        self.assertIn("over budget (queries)", logs.output[0])
+
+    def test_scrape_endpoint(self):
+        observe_external("didit", "POST /v3/session/", 0.2)
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'external_call_duration_seconds_bucket{service="didit",endpoint="POST /v3/session/",le="0.25"}',
+            response.content.decode(),
+        )
+        self.assertEqual(self.client.get("/metrics/", REMOTE_ADDR="10.0.0.1").status_code, 404)
+
+
+class MSISDNBatchTests(SimpleTestCase):
+    def test_agrees_with_scalar(self):
+        pieces = ["0", "1", "7", "254", "+", " ", "-", "\t", "\u0667", "\uff17", "x", "712345678"]
+        values = [None, "", " "] + ["".join(p) for p in itertools.product(pieces, repeat=3)]
+        values += [f"0{n}" for n in range(700000000, 700000100)] + ["+254 712 345 678", "0112345678", "0912345678"]
+
+        normalized, errors = normalize_msisdn_batch(values)
+        for value, got, error in zip(values, normalized, errors):
+            try:
+                expected = normalize_msisdn(value)
+            except InvalidMSISDN as e:
+                self.assertEqual((got, MSISDN_ERRORS.get(error)), (None, str(e)), repr(value))
+            else:
+                self.assertEqual((got, error), (expected, None), repr(value))
+
+        self.assertEqual(errors[-3:], [None, None, "PREFIX"])
+        self.assertEqual(normalized[-3:], ["254712345678", "254112345678", None])
+
+
+@override_settings(SWAP_COOLDOWN_DAYS=30, SESSION_EVENTS={"PG_NOTIFY": False})
+class SwapCooldownTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_ruleset_cache()
+        for i in range(4):
+            Customer.objects.create(
+                msisdn=f"25470000002{i}", full_name="Test", id_number=f"2{i}", yob=1990,
+                iprs_verified=True, iprs_approved=True,
+            )
+        self.line = Line.objects.get(msisdn="254700000020")
+
+    def test_completion_starts_the_cooldown(self):
+        session = SwapSession.objects.create(line=self.line, stage="DIDIT_PASSED")
+        self.assertTrue(self.client.post("/swap/start/", {"msisdn": self.line.msisdn}).json()["allowed"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/swap/complete/", {"session_id": session.id})
+
+        self.line.refresh_from_db()
+        self.assertAlmostEqual(self.line.last_swap_at, timezone.now(), delta=timedelta(seconds=5))
+        response = self.client.post("/swap/start/", {"msisdn": self.line.msisdn}).json()
+        self.assertEqual(response, {"allowed": False, "reason": "Swapped recently"})
+
+    def test_sql_and_scalar_agree_on_the_window(self):
+        now = timezone.now()
+        for msisdn, last_swap_at in [
+            ("254700000021", now - timedelta(days=29)),
+            ("254700000022", now - timedelta(days=31)),
+        ]:
+            Line.objects.filter(msisdn=msisdn).update(last_swap_at=last_swap_at)
+
+        lines = Line.objects.select_related("customer").filter(msisdn__startswith="25470000002").order_by("id")
+        expected = {}
+        for line in lines:
+            reason = is_swap_allowed(line)[1]
+            expected[reason] = expected.get(reason, 0) + 1
+        self.assertEqual(expected, {None: 3, "Swapped recently": 1})
+        self.assertEqual(bulk_eligibility(lines)[0], expected)
+
+    def test_backfill_from_completed_sessions(self):
+        old = SwapSession.objects.create(line=self.line, stage="COMPLETED")
+        latest = SwapSession.objects.create(line=self.line, stage="COMPLETED")
+        SwapSession.objects.create(line=self.line, stage="LOCKED")
+        SwapSession.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=90))
+
+        out = io.StringIO()
+        call_command("backfill_last_swap", chunk_size=2, stdout=out)
+        self.assertIn("1 lines updated", out.getvalue())
+        self.line.refresh_from_db()
+        self.assertEqual(self.line.last_swap_at, SwapSession.objects.get(pk=latest.pk).updated_at)
+
+        call_command("backfill_last_swap", stdout=out)
+        self.assertIn("0 lines updated", out.getvalue())
+
+
+@override_settings(SWAP_SESSION_TTL_MINUTES=30, SESSION_EVENTS={"PG_NOTIFY": False})
+class OpenSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_ruleset_cache()
+        Customer.objects.create(
+            msisdn="254700000040", full_name="Test", id_number="40", yob=1990, iprs_verified=True, iprs_approved=True
+        )
+        self.line = Line.objects.get(msisdn="254700000040")
+
+    def start(self):
+        return self.client.post("/swap/start/", {"msisdn": self.line.msisdn}).json()
+
+    def test_start_resumes_then_expires_the_open_session(self):
+        first = self.start()
+        self.assertNotIn("resumed", first)
+
+        SwapSession.objects.filter(pk=first["session_id"]).update(stage="DIDIT_PENDING")
+        resumed = self.start()
+        self.assertEqual(
+            (resumed["session_id"], resumed["next_step"], resumed["resumed"]), (first["session_id"], "DIDIT", True)
+        )
+
+        SwapSession.objects.filter(pk=first["session_id"]).update(updated_at=timezone.now() - timedelta(hours=1))
+        fresh = self.start()
+        self.assertNotEqual(fresh["session_id"], first["session_id"])
+        self.assertEqual(SwapSession.objects.get(pk=first["session_id"]).stage, "EXPIRED")
+
+    def test_constraints(self):
+        SwapSession.objects.create(line=self.line, stage="COMPLETED", didit_session_id="d-1")
+        SwapSession.objects.create(line=self.line, stage="STARTED")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SwapSession.objects.create(line=self.line, stage="PRIMARY_PASSED")
+
+        other = Line.objects.get(msisdn=Customer.objects.create(
+            msisdn="254700000041", full_name="Test", id_number="41", yob=1990
+        ).msisdn)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SwapSession.objects.create(line=other, stage="LOCKED", didit_session_id="d-1")
+
+
+@override_settings(SESSION_EVENTS={"PG_NOTIFY": False})
+class TransitionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_ruleset_cache()
+        Customer.objects.create(
+            msisdn="254700000050", full_name="Test", id_number="50", yob=1990, iprs_verified=True, iprs_approved=True
+        )
+        self.line = Line.objects.get(msisdn="254700000050")
+
+    def test_swap_id_is_persisted(self):
+        body = self.client.post("/swap/start/", {"msisdn": self.line.msisdn}).json()
+        session = SwapSession.objects.get(pk=body["session_id"])
+        self.assertEqual(session.swap_id, body["swapId"])
+        self.assertRegex(session.swap_id, r"^0x[0-9a-f]{64}$")
+
+    def test_conditional_update_and_event(self):
+        received = []
+
+        def receiver(sender, transitions, **kwargs):
+            received.extend(transitions)
+
+        session_transitioned.connect(receiver)
+        self.addCleanup(session_transitioned.disconnect, receiver)
+
+        session = SwapSession.objects.create(line=self.line, stage="STARTED")
+        stale = SwapSession.objects.get(pk=session.pk)
+        # The UPDATE and its outbox row, in a savepoint
+        with self.assertNumQueries(4):
+            self.assertTrue(transition(session, "PRIMARY_PASSED", primary_attempts=1))
+        self.assertEqual([(t.from_stage, t.to_stage) for t in received], [("STARTED", "PRIMARY_PASSED")])
+
+        # The stale copy still thinks it is STARTED, so its UPDATE matches nothing
+        self.assertFalse(transition(stale, "LOCKED"))
+        self.assertEqual((stale.stage, stale.is_locked), ("STARTED", False))
+        self.assertEqual(len(received), 1)
+
+        with self.assertRaises(InvalidTransition):
+            transition(session, "COMPLETED")
+
+    def test_complete_runs_once(self):
+        session = SwapSession.objects.create(line=self.line, stage="DIDIT_PASSED", swap_id="0x" + "1" * 64)
+        stale = SwapSession.objects.get(pk=session.pk)
+        self.assertEqual(self.client.post("/swap/complete/", {"session_id": session.id}).json(), {"success": True})
+
+        # A request that read DIDIT_PASSED before the completion committed
+        self.assertFalse(transition(stale, "COMPLETED"))
+        self.assertEqual(self.client.post("/swap/complete/", {"session_id": session.id}).json(), {"success": True})
+        self.line.refresh_from_db()
+        self.assertIsNotNone(self.line.last_swap_at)
+
+
+@override_settings(SESSION_EVENTS={"PG_NOTIFY": False}, AUDIT_BUFFER={"ENABLED": False})
+class SessionOutboxTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(msisdn="254700000060", full_name="Test", id_number="60", yob=1990)
+        self.session = SwapSession.objects.create(
+            line=Line.objects.get(msisdn=customer.msisdn), stage="DIDIT_PASSED", swap_id="0x" + "2" * 64
+        )
+
+    def complete(self):
+        return self.client.post("/swap/complete/", {"session_id": self.session.id}).json()
+
+    def test_completion_is_relayed_once(self):
+        self.assertEqual(self.complete(), {"success": True})
+        self.assertEqual(self.complete(), {"success": True})
+        self.assertEqual(
+            sorted(SessionOutbox.objects.values_list("effect", flat=True)), ["APPROVE", "AUDIT", "LEDGER"]
+        )
+        # Nothing is delivered in the request
+        self.assertFalse(Block.objects.exists())
+
+        self.assertEqual(OutboxRelay().run_once(), 3)
+        self.assertEqual(OutboxRelay().run_once(), 0)
+        self.assertEqual(list(Block.objects.values_list("event", "msisdn")), [("SWAP_COMPLETED", "254700000060")])
+        self.assertEqual(AuditLog.objects.get().event, "SWAP_COMPLETED")
+        self.assertEqual(BlockchainTransaction.objects.filter(function_name="approveSIMSwap").count(), 1)
+
+    def test_failed_call_is_retried_alone_after_backoff(self):
+        self.complete()
+        relay = OutboxRelay(max_attempts=3, backoff_base=60)
+        with mock.patch.object(blockchain_service, "approve_sim_swap", side_effect=RuntimeError("rpc down")) as approve:
+            self.assertEqual(relay.run_once(), 2)
+            # Not due yet: no second call, and nothing delivered
+            self.assertEqual(relay.run_once(), 0)
+        self.assertEqual(approve.call_count, 1)
+
+        row = SessionOutbox.objects.get(effect="APPROVE")
+        self.assertEqual((row.status, row.attempts), ("QUEUED", 1))
+        self.assertAlmostEqual(row.next_attempt_at, timezone.now() + timedelta(seconds=60), delta=timedelta(seconds=5))
+        self.assertEqual(
+            dict(SessionOutbox.objects.values_list("effect", "status")),
+            {"APPROVE": "QUEUED", "AUDIT": "DONE", "LEDGER": "DONE"},
+        )
+
+        SessionOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(relay.run_once(), 1)
+        self.assertEqual(SessionOutbox.objects.get(effect="APPROVE").attempts, 2)
+        self.assertEqual(Block.objects.count(), 1)
+
+    def test_chain_calls_are_leased_not_locked(self):
+        self.complete()
+        relay = OutboxRelay(claim_timeout=30)
+        during_call = []
+
+        def approve(*args):
+            row = SessionOutbox.objects.get(effect="APPROVE")
+            # The ledger block is already committed and the row is leased, so
+            # a parallel relay finds nothing due
+            during_call.append((Block.objects.count(), row.status, row.next_attempt_at > timezone.now()))
+            during_call.append(OutboxRelay().run_once())
+
+        with mock.patch.object(blockchain_service, "approve_sim_swap", side_effect=approve):
+            self.assertEqual(relay.run_once(), 3)
+        self.assertEqual(during_call, [(1, "QUEUED", True), 0])
+        self.assertEqual(SessionOutbox.objects.get(effect="APPROVE").status, "DONE")
+
+    def test_expired_lease_is_not_overwritten(self):
+        self.complete()
+
+        def approve(*args):
+            # The lease ran out and another relay took the row over
+            SessionOutbox.objects.filter(effect="APPROVE").update(next_attempt_at=timezone.now(), attempts=5)
+
+        with mock.patch.object(blockchain_service, "approve_sim_swap", side_effect=approve):
+            OutboxRelay().run_once()
+        row = SessionOutbox.objects.get(effect="APPROVE")
+        self.assertEqual((row.status, row.attempts), ("QUEUED", 5))
@@ -1,5 +1,16 @@
 import re
 
+# Error codes returned by normalize_msisdn_batch, with the message
+# normalize_msisdn raises for each
+MSISDN_ERRORS = {
+    "REQUIRED": "MSISDN is required",
+    "FORMAT": "Invalid Kenyan phone number format",
+    "PREFIX": "Invalid Kenyan mobile prefix",
+}
+
+_NON_DIGITS = re.compile(r"[^\d]")
+
+
 class InvalidMSISDN(Exception):
     pass
 
@@ -14,7 +25,7 @@ def normalize_msisdn(msisdn: str) -> str:
     """
 
     if not msisdn:
-        raise InvalidMSISDN("MSISDN is required")
+        raise InvalidMSISDN(MSISDN_ERRORS["REQUIRED"])
 
     # Remove spaces and +
     msisdn = msisdn.strip().replace(" ", "")
@@ -28,13 +39,57 @@ def normalize_msisdn(msisdn: str) -> str:
     if msisdn.startswith("254") and len(msisdn) == 12:
         pass
     else:
-        raise InvalidMSISDN("Invalid Kenyan phone number format")
+        raise InvalidMSISDN(MSISDN_ERRORS["FORMAT"])
 
     # Validate prefix
     if not (msisdn.startswith("2547") or msisdn.startswith("2541")):
-        raise InvalidMSISDN("Invalid Kenyan mobile prefix")
+        raise InvalidMSISDN(MSISDN_ERRORS["PREFIX"])
 
     if len(msisdn) != 12:
         raise InvalidMSISDN("MSISDN must be 12 digits")
 
     return msisdn
+
+
+def normalize_msisdn_batch(values):
+    """
+    normalize_msisdn for many numbers at once: an iterable of strings or
+    None, or a NumPy string array. Returns ``(normalized, errors)``, two
+    lists in input order. Each row has either the normalized number and
+    a None error, or None and a code from MSISDN_ERRORS. Nothing is
+    raised.
+
+    The rules are the same as normalize_msisdn, but they are checked once
+    per row without re-scanning the string. The regex only runs on rows
+    that are not already plain ASCII digits. The results agree with
+    normalize_msisdn for every input; swap.tests checks this.
+    """
+    if hasattr(values, "tolist"):
+        values = values.tolist()
+
+    normalized, errors = [], []
+    add_value, add_error = normalized.append, errors.append
+    strip_non_digits = _NON_DIGITS.sub
+
+    for raw in values:
+        if not raw:
+            add_value(None)
+            add_error("REQUIRED")
+            continue
+
+        # strip() and replace(" ") only remove characters \D removes too
+        digits = raw if raw.isascii() and raw.isdigit() else strip_non_digits("", raw)
+        if len(digits) == 10 and digits[0] == "0":
+            digits = "254" + digits[1:]
+
+        if len(digits) != 12 or not digits.startswith("254"):
+            add_value(None)
+            add_error("FORMAT")
+        elif digits[3] != "7" and digits[3] != "1":
+            add_value(None)
+            add_error("PREFIX")
+        else:
+            add_value(digits)
+            add_error(None)
+
+    return normalized, errors
@@ -1,16 +1,21 @@
 from django.shortcuts import render
 
+import asyncio
+import json
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from lines.models import Line
 from swap.models import SwapSession
 from swap.serializers import StartSwapSerializer
-from swap.services.eligibility import is_swap_allowed
+from swap.services.events import TERMINAL_STAGES, events_config, hub as events_hub, session_state
+from swap.services.sessions import NEXT_STEPS, open_session
+from swap.services.snapshot import get_snapshot
+from swap.services.transitions import transition
 from audit.services import log_audit
+from fraud.services.velocity import check_velocity, record_velocity, request_device
 from blockchain.services import blockchain_service
-from django.http import JsonResponse
-from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 
 def health_check(request):
     return JsonResponse({"status": "ok"})
@@ -23,34 +28,43 @@ class StartSwapView(APIView):
 
         msisdn = serializer.validated_data["msisdn"]
 
-        try:
-            line = Line.objects.select_related("customer").get(msisdn=msisdn)
-        except Line.DoesNotExist:
-            return Response({"allowed": False, "reason": "Line not found"})
+        # Cached line lookup, eligibility decision and locked-session check
+        snapshot = get_snapshot(msisdn)
 
-        allowed, reason = is_swap_allowed(line)
+        if not snapshot["found"]:
+            return Response({"allowed": False, "reason": "Line not found"})
 
-        if not allowed:
-            return Response({"allowed": False, "reason": reason})
+        rules_version = snapshot["rules_version"]
 
-        # Check for locked session
-        existing_locked = SwapSession.objects.filter(
-            line=line,
-            is_locked=True
-        ).exists()
+        if not snapshot["allowed"]:
+            log_audit(msisdn, "SWAP_INELIGIBLE", {"reason": snapshot["reason"], "rules_version": rules_version})
+            return Response({"allowed": False, "reason": snapshot["reason"]})
 
-        if existing_locked:
+        if snapshot["locked"]:
             return Response({
                 "allowed": False,
                 "redirect": "retail"
             })
 
-        session = SwapSession.objects.create(
-            line=line,
-            stage="STARTED"
-        )
+        velocity_keys = {"msisdn": msisdn, "id_number": snapshot.get("id_number"), "device": request_device(request)}
+        velocity_reason = check_velocity(**velocity_keys)
+        if velocity_reason:
+            log_audit(msisdn, "SWAP_VELOCITY_BLOCKED", {"reason": velocity_reason})
+            return Response({"allowed": False, "reason": velocity_reason})
 
-        log_audit(msisdn, "SWAP_STARTED")
+        session, created = open_session(snapshot["line_id"], rules_version)
+        if not created:
+            # The line already has a swap in progress; carry on with it
+            log_audit(msisdn, "SWAP_RESUMED", {"session_id": session.id, "stage": session.stage})
+            return Response({
+                "allowed": True,
+                "session_id": session.id,
+                "next_step": NEXT_STEPS[session.stage],
+                "resumed": True
+            })
+
+        log_audit(msisdn, "SWAP_STARTED", {"rules_version": rules_version})
+        record_velocity("SWAP_STARTED", **velocity_keys)
 
         # Blockchain Integration: Initiate SIM swap
         old_sim_serial = "old_sim_serial_mock"
@@ -58,14 +72,14 @@ class StartSwapView(APIView):
 
         swap_result = blockchain_service.initiate_sim_swap(
             request_id=str(session.id),
-            user_id=str(line.customer.id),
+            user_id=str(snapshot["customer_id"]),
             phone_number=msisdn,
             old_sim_serial=old_sim_serial,
             new_sim_serial=new_sim_serial
         )
 
-        session.swap_id = swap_result.get("swapId") or "0x0"
-        session.save()
+        session.swap_id = swap_result["swapId"]
+        session.save(update_fields=["swap_id"])
 
         return Response({
             "allowed": True,
@@ -77,13 +91,113 @@ class StartSwapView(APIView):
 
 class SwapSessionStatusView(APIView):
     def get(self, request, session_id):
-        session = SwapSession.objects.get(id=session_id)
+        session = SwapSession.objects.select_related("didit_job").get(id=session_id)
+        job = getattr(session, "didit_job", None)
 
         return Response({
-            "stage": session.stage,
-            "locked": session.is_locked,
+            **session_state(session),
+            # Only set for sessions queued for run_didit_jobs (DIDIT_ASYNC)
+            "didit_job": job.status if job else None,
         })
 
+
+async def session_events(request, session_id):
+    """
+    Waits for the session to change instead of being polled.
+
+    - ``Accept: text/event-stream``: Server-Sent Events. The current state
+      is sent first, then every change, until a terminal stage is reached.
+    - Otherwise long-poll: returns as soon as the state's ``updated_at``
+      differs from ``?since=``, or after ``?wait=`` seconds with
+      ``changed: false``.
+
+    Only the initial read touches the database; changes arrive through
+    swap/services/events.py.
+    """
+    try:
+        wait = min(float(request.GET.get("wait", events_config("MAX_WAIT", 30))), events_config("MAX_WAIT", 30))
+    except ValueError:
+        return JsonResponse({"error": "Invalid wait"}, status=400)
+    since = request.GET.get("since")
+
+    if not events_hub.listening:
+        await asyncio.to_thread(events_hub.ensure_listener)
+
+    # Subscribe before reading so a change committed in between is not missed
+    subscription = events_hub.subscribe(session_id)
+    try:
+        session = await SwapSession.objects.aget(id=session_id)
+    except SwapSession.DoesNotExist:
+        subscription.close()
+        return JsonResponse({"error": "Session not found"}, status=404)
+
+    state = session_state(session)
+
+    if "text/event-stream" in request.headers.get("Accept", ""):
+        response = StreamingHttpResponse(_event_stream(subscription, state), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    try:
+        if state["updated_at"] == since and state["stage"] not in TERMINAL_STAGES:
+            event = await subscription.get(timeout=wait)
+            if event is None:
+                return JsonResponse({**state, "changed": False})
+            state = event
+    finally:
+        subscription.close()
+
+    return JsonResponse({**state, "changed": True})
+
+
+async def _event_stream(subscription, state):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + events_config("SSE_MAX_DURATION", 300)
+    heartbeat = events_config("HEARTBEAT", 15)
+
+    try:
+        yield f"data: {json.dumps(state)}\n\n"
+        while state["stage"] not in TERMINAL_STAGES:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            event = await subscription.get(timeout=min(heartbeat, remaining))
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            state = event
+            yield f"data: {json.dumps(state)}\n\n"
+    finally:
+        subscription.close()
+
+def complete_swap(session_id):
+    """Shared by CompleteSwapView and its async variant. Returns (body, status)."""
+    try:
+        session = SwapSession.objects.select_related("line").get(id=session_id)
+    except SwapSession.DoesNotExist:
+        return {"error": "Session not found"}, status.HTTP_404_NOT_FOUND
+
+    # Idempotency: already completed
+    if session.stage == "COMPLETED":
+        return {"success": True}, status.HTTP_200_OK
+
+    # Only allow completion if DIDIT passed
+    if session.stage != "DIDIT_PASSED":
+        return {"error": "Invalid stage"}, status.HTTP_400_BAD_REQUEST
+
+    # One conditional UPDATE, no row lock: of two concurrent requests only
+    # one completes the session. The cooldown and the ledger, approval and
+    # audit outbox rows are written by session_transitioned receivers in
+    # the same transaction.
+    if not transition(session, "COMPLETED"):
+        stage = SwapSession.objects.values_list("stage", flat=True).get(pk=session.pk)
+        if stage != "COMPLETED":
+            return {"error": "Invalid stage"}, status.HTTP_400_BAD_REQUEST
+
+    return {"success": True}, status.HTTP_200_OK
+
+
 class CompleteSwapView(APIView):
 
     def post(self, request):
@@ -91,30 +205,5 @@ class CompleteSwapView(APIView):
         if not session_id:
             return Response({"error": "Missing session_id"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            with transaction.atomic():
-                # Lock row to prevent concurrent completion
-                session = SwapSession.objects.select_for_update().get(id=session_id)
-
-                # Idempotency: already completed
-                if session.stage == "COMPLETED":
-                    return Response({"success": True})
-
-                # Only allow completion if DIDIT passed
-                if session.stage != "DIDIT_PASSED":
-                    return Response({"error": "Invalid stage"}, status=status.HTTP_400_BAD_REQUEST)
-
-                # Mark session completed
-                session.stage = "COMPLETED"
-                session.save()
-
-                blockchain_service.log_event("SWAP_COMPLETED", session.line.msisdn)
-
-                # Real or demo blockchain approval
-                swap_id = getattr(session, "swap_id", str(session.id))
-                blockchain_service.approve_sim_swap(str(session.id), swap_id)
-
-        except SwapSession.DoesNotExist:
-            return Response({"error": "Session not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        return Response({"success": True})
\ No newline at end of file
+        body, code = complete_swap(session_id)
+        return Response(body, status=code)
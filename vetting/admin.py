@@ -1,3 +1,19 @@
 from django.contrib import admin
+from .models import DiditSessionJob, DiditWebhookInbox
 
-# Register your models here.
+
+@admin.register(DiditSessionJob)
+class DiditSessionJobAdmin(admin.ModelAdmin):
+    list_display = ("session", "status", "attempts", "created_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("session__id", "session__didit_session_id")
+    raw_id_fields = ("session",)
+    readonly_fields = ("created_at", "finished_at")
+
+
+@admin.register(DiditWebhookInbox)
+class DiditWebhookInboxAdmin(admin.ModelAdmin):
+    list_display = ("didit_session_id", "status", "received_at", "processed_at", "outcome")
+    list_filter = ("outcome", "status")
+    search_fields = ("=didit_session_id",)
+    readonly_fields = ("received_at", "processed_at")
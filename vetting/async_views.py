@@ -0,0 +1,119 @@
+"""
+Async variants of the vetting endpoints (see swap/async_views.py). The
+Didit call in primary vetting goes through the aiohttp client, so a slow
+Didit only holds a coroutine.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from swap.async_views import invalid_body, release_db_connection, request_data
+from swap.models import SwapSession
+from swap.services.didit import acreate_didit_session, verify_didit_signature
+from swap.services.didit_client import DiditError
+from swap.services.lock import lock_session
+from swap.services.transitions import can_transition, transition
+from fraud.services.velocity import record_velocity, request_device
+from vetting.models import DiditSessionJob, DiditWebhookInbox
+from vetting.serializers import PrimarySerializer
+from vetting.services.didit_jobs import (
+    didit_jobs_config, enqueue_didit_session, queued_didit_response, stored_didit_response
+)
+from vetting.services.primary import evaluate_primary
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class PrimaryVettingAsyncView(View):
+
+    async def post(self, request):
+        data = request_data(request)
+        if data is None:
+            return invalid_body()
+
+        serializer = PrimarySerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        try:
+            session = await SwapSession.objects.select_related(
+                "line__customer"
+            ).aget(id=serializer.validated_data["session_id"])
+        except SwapSession.DoesNotExist:
+            return JsonResponse({"error": "Session not found"}, status=404)
+
+        if session.is_locked:
+            return JsonResponse({"redirect": "retail"})
+
+        if session.stage == "DIDIT_PENDING":
+            # A client retrying after its Didit session was created or queued
+            if session.didit_session_id:
+                return JsonResponse(stored_didit_response(session))
+            if await DiditSessionJob.objects.filter(session=session).aexists():
+                return JsonResponse(queued_didit_response(session))
+
+        if not can_transition(session.stage, "PRIMARY_PASSED"):
+            return JsonResponse({"error": "Invalid stage"}, status=400)
+
+        customer = session.line.customer
+
+        session.primary_attempts += 1
+
+        passed = evaluate_primary(customer, serializer.validated_data)
+
+        if not passed:
+            await sync_to_async(lock_session)(session, "PRIMARY_FAILED", primary_attempts=session.primary_attempts)
+            await sync_to_async(record_velocity)(
+                "PRIMARY_FAILED", "LOCKED",
+                msisdn=session.line.msisdn, id_number=customer.id_number, device=request_device(request)
+            )
+            return JsonResponse({
+                "passed": False,
+                "locked": True,
+                "redirect": "retail"
+            })
+
+        if not await sync_to_async(transition)(session, "PRIMARY_PASSED", primary_attempts=session.primary_attempts):
+            return JsonResponse({"error": "Session changed, retry"}, status=409)
+
+        if didit_jobs_config("ASYNC"):
+            await sync_to_async(enqueue_didit_session)(session)
+            return JsonResponse(queued_didit_response(session))
+
+        # Call Didit
+        await release_db_connection()
+        try:
+            didit_response = await acreate_didit_session(session)
+        except DiditError:
+            return JsonResponse(
+                {"passed": True, "error": "Verification provider unavailable, retry shortly"},
+                status=503
+            )
+        return JsonResponse({
+            "passed": True,
+            "next_step": "DIDIT",
+            "didit_session": didit_response
+        })
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DiditWebhookAsyncView(View):
+    """Same contract as DiditWebhookView: verify, append to the inbox, return 200."""
+
+    async def post(self, request):
+        if not verify_didit_signature(request):
+            return JsonResponse({"error": "Invalid signature"}, status=403)
+
+        data = request_data(request)
+        if data is None:
+            return invalid_body()
+
+        delivery = DiditWebhookInbox.from_payload(data)
+        if delivery is None:
+            return JsonResponse({"error": "Missing session_id"}, status=400)
+
+        await DiditWebhookInbox.objects.abulk_create([delivery], ignore_conflicts=True)
+
+        # Always return 200 to prevent infinite retries
+        return JsonResponse({"ok": True})
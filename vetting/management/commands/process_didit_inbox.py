@@ -0,0 +1,35 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from vetting.services.didit_inbox import DiditInboxProcessor, inbox_metrics
+
+
+class Command(BaseCommand):
+    help = "Apply queued Didit webhook deliveries to swap sessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--interval", type=float, default=0.5, help="Seconds to sleep when the inbox is empty")
+        parser.add_argument("--once", action="store_true", help="Drain the current backlog and exit")
+        parser.add_argument("--stats", action="store_true", help="Print backlog depth and processing lag and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(inbox_metrics(), indent=2))
+            return
+
+        processor = DiditInboxProcessor(batch_size=options["batch_size"])
+
+        if options["once"]:
+            total = 0
+            while processed := processor.run_once():
+                total += processed
+            self.stdout.write(f"Processed {total} deliveries")
+            self.stdout.write(json.dumps(inbox_metrics()))
+            return
+
+        while True:
+            if not processor.run_once():
+                time.sleep(options["interval"])
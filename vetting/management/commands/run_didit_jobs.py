@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from vetting.services.didit_jobs import DiditJobRunner
+
+
+class Command(BaseCommand):
+    help = "Create Didit sessions for queued DiditSessionJob rows (DIDIT_ASYNC mode)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when there is nothing to do")
+        parser.add_argument("--once", action="store_true", help="Process a single batch and exit")
+
+    def handle(self, *args, **options):
+        runner = DiditJobRunner(batch_size=options["batch_size"])
+
+        while True:
+            processed = runner.run_once()
+            if options["once"]:
+                self.stdout.write(f"Processed {processed} jobs")
+                return
+            if not processed:
+                time.sleep(options["interval"])
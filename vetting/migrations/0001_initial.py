@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('swap', '0006_swapsession_didit_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiditSessionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='didit_job', to='swap.swapsession')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='vetting_did_status_79f728_idx')],
+            },
+        ),
+    ]
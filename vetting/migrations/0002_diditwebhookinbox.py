@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vetting', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiditWebhookInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dedup_key', models.CharField(max_length=320, unique=True)),
+                ('didit_session_id', models.CharField(max_length=255)),
+                ('status', models.CharField(max_length=50)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, choices=[('APPLIED', 'Applied'), ('DUPLICATE', 'Duplicate'), ('UNKNOWN_SESSION', 'Unknown session')], max_length=20)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='vetting_inbox_pending_idx'), models.Index(fields=['processed_at'], name='vetting_did_process_ddfaaa_idx')],
+            },
+        ),
+    ]
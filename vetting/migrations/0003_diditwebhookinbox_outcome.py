@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vetting', '0002_diditwebhookinbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='diditwebhookinbox',
+            name='outcome',
+            field=models.CharField(blank=True, choices=[('APPLIED', 'Applied'), ('DUPLICATE', 'Duplicate'), ('INVALID_STAGE', 'Invalid stage'), ('UNKNOWN_SESSION', 'Unknown session')], max_length=20),
+        ),
+    ]
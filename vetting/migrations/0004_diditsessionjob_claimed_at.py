@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vetting', '0003_diditwebhookinbox_outcome'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diditsessionjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diditsessionjob',
+            name='status',
+            field=models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=20),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vetting', '0004_diditsessionjob_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diditwebhookinbox',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
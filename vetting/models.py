@@ -1,3 +1,88 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class DiditSessionJob(models.Model):
+    """
+    A Didit session waiting to be created by ``manage.py run_didit_jobs``
+    (see vetting/services/didit_jobs.py). One per SwapSession, so retried
+    requests re-use the existing job instead of creating another session.
+    """
+    STATUS_CHOICES = [
+        ("QUEUED", "Queued"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    ]
+
+    session = models.OneToOneField("swap.SwapSession", on_delete=models.CASCADE, related_name="didit_job")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="QUEUED")
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self):
+        return f"Didit job for session {self.session_id} ({self.status})"
+
+
+class DiditWebhookInbox(models.Model):
+    """
+    Raw Didit webhook deliveries, written by DiditWebhookView and applied to
+    SwapSession rows in batches by ``manage.py process_didit_inbox`` (see
+    vetting/services/didit_inbox.py). Redeliveries of the same status for
+    the same session collapse onto one row through ``dedup_key``.
+    """
+    OUTCOME_CHOICES = [
+        ("APPLIED", "Applied"),
+        ("DUPLICATE", "Duplicate"),
+        ("INVALID_STAGE", "Invalid stage"),
+        ("UNKNOWN_SESSION", "Unknown session"),
+    ]
+
+    dedup_key = models.CharField(max_length=320, unique=True)
+    didit_session_id = models.CharField(max_length=255)
+    status = models.CharField(max_length=50)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(default=timezone.now)
+    # Deliveries for a session not known yet wait until then
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="vetting_inbox_pending_idx",
+            ),
+            models.Index(fields=["processed_at"]),
+        ]
+
+    @staticmethod
+    def make_dedup_key(didit_session_id, status):
+        return f"{didit_session_id}:{status}"
+
+    @classmethod
+    def from_payload(cls, payload):
+        """An unsaved row for a webhook body, or None if it names no session."""
+        didit_session_id = payload.get("session_id")
+        if not didit_session_id:
+            return None
+        status = (payload.get("status") or "").strip().lower()
+        return cls(
+            dedup_key=cls.make_dedup_key(didit_session_id, status),
+            didit_session_id=didit_session_id,
+            status=status,
+            payload=payload,
+        )
+
+    def __str__(self):
+        return f"{self.didit_session_id} {self.status}"
@@ -0,0 +1,134 @@
+"""
+Applies queued Didit webhook deliveries (DiditWebhookInbox) to SwapSessions.
+
+DiditWebhookView only checks the signature and inserts the raw delivery,
+so a retry burst from Didit costs one unique-index insert per request.
+``manage.py process_didit_inbox`` then drains the inbox: it claims a batch
+with SKIP LOCKED, locks the sessions it touches once, replays each
+session's events in arrival order with the same rules the view used to
+apply, and writes sessions and inbox rows back with bulk_update. The
+sessions stay locked until then, so stage changes follow
+swap.services.transitions.TRANSITIONS without a conditional UPDATE per
+session, and are announced with one session_transitioned signal per batch.
+
+A delivery can beat run_didit_jobs to the session id. One naming no known
+session stays unprocessed and is retried every DIDIT_INBOX_RETRY_DELAY
+seconds; only once it is DIDIT_INBOX_UNKNOWN_GRACE seconds old is it
+closed as UNKNOWN_SESSION.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, F, Min
+from django.utils import timezone
+
+from fraud.services.velocity import record_velocity
+from swap.models import SwapSession
+from swap.services.transitions import Transition, can_transition, send_transitions
+from vetting.models import DiditWebhookInbox
+
+logger = logging.getLogger(__name__)
+
+PASSED_STATUSES = ("approved", "on_review")
+
+
+def _apply(session, event):
+    """Apply one delivery to a session. Returns the inbox outcome."""
+    if session.didit_status == event.status:
+        return "DUPLICATE"
+
+    stage = "DIDIT_PASSED" if event.status in PASSED_STATUSES else "LOCKED"
+    if not can_transition(session.stage, stage):
+        # e.g. a decline arriving after the swap completed
+        return "INVALID_STAGE"
+
+    session.didit_payload = event.payload
+    session.didit_status = event.status
+    session.stage = stage
+
+    if stage == "LOCKED":
+        # Same effect as lock_session(session, "DIDIT_FAILED"), saved in bulk below
+        session.is_locked = True
+        record_velocity(
+            "DIDIT_FAILED", "LOCKED",
+            msisdn=session.line.msisdn, id_number=session.line.customer.id_number
+        )
+
+    return "APPLIED"
+
+
+class DiditInboxProcessor:
+    def __init__(self, batch_size=None, retry_delay=None, unknown_grace=None):
+        self.batch_size = batch_size or getattr(settings, "DIDIT_INBOX_BATCH_SIZE", 500)
+        self.retry_delay = retry_delay or getattr(settings, "DIDIT_INBOX_RETRY_DELAY", 5.0)
+        self.unknown_grace = unknown_grace if unknown_grace is not None else getattr(
+            settings, "DIDIT_INBOX_UNKNOWN_GRACE", 600.0
+        )
+
+    def run_once(self):
+        """Apply one batch of due deliveries. Returns the number processed, retries included."""
+        with transaction.atomic():
+            now = timezone.now()
+            events = list(
+                DiditWebhookInbox.objects
+                .select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True, next_attempt_at__lte=now)
+                .order_by("id")[: self.batch_size]
+            )
+            if not events:
+                return 0
+
+            sessions = {
+                s.didit_session_id: s
+                for s in SwapSession.objects
+                .select_for_update(of=("self",))
+                .select_related("line__customer")
+                .filter(didit_session_id__in={e.didit_session_id for e in events})
+                .order_by("id")
+            }
+
+            from_stages = {s.id: s.stage for s in sessions.values()}
+            give_up = now - timedelta(seconds=self.unknown_grace)
+            changed = {}
+            for event in events:
+                session = sessions.get(event.didit_session_id)
+                if session is None:
+                    if event.received_at > give_up:
+                        event.next_attempt_at = now + timedelta(seconds=self.retry_delay)
+                        continue
+                    event.outcome = "UNKNOWN_SESSION"
+                else:
+                    event.outcome = _apply(session, event)
+                    if event.outcome == "APPLIED":
+                        session.updated_at = now
+                        changed[session.id] = session
+                event.processed_at = now
+
+            SwapSession.objects.bulk_update(
+                changed.values(),
+                ["didit_payload", "didit_status", "stage", "is_locked", "updated_at"],
+            )
+            DiditWebhookInbox.objects.bulk_update(events, ["next_attempt_at", "processed_at", "outcome"])
+            send_transitions([Transition(s, from_stages[s.id], s.stage) for s in changed.values()])
+
+        logger.info(f"Didit inbox processed {len(events)} deliveries ({len(changed)} sessions updated)")
+        return len(events)
+
+
+def inbox_metrics(window_minutes=5):
+    """Backlog depth and how long deliveries wait before being applied."""
+    now = timezone.now()
+    pending = DiditWebhookInbox.objects.filter(processed_at__isnull=True)
+    oldest = pending.aggregate(oldest=Min("received_at"))["oldest"]
+
+    recent = DiditWebhookInbox.objects.filter(processed_at__gte=now - timedelta(minutes=window_minutes))
+    lag = recent.aggregate(lag=Avg(F("processed_at") - F("received_at")))["lag"]
+
+    return {
+        "backlog": pending.count(),
+        "oldestPendingSeconds": round((now - oldest).total_seconds(), 3) if oldest else 0,
+        "avgProcessingLagSeconds": round(lag.total_seconds(), 3) if lag else None,
+        "processedLastWindow": recent.count(),
+    }
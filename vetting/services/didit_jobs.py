@@ -0,0 +1,156 @@
+"""
+Creates Didit sessions outside the request path.
+
+With DIDIT_JOBS["ASYNC"] on, PrimaryVettingView only calls
+``enqueue_didit_session``; ``manage.py run_didit_jobs`` claims queued jobs
+with SKIP LOCKED, calls Didit for the whole batch in parallel through the
+pooled client, and stores the session id and URL on the SwapSession.
+
+The claim and the result are two short transactions, so no transaction is
+open while Didit is called. A claimed job is RUNNING, and another worker
+only takes it over after CLAIM_TIMEOUT seconds, which must exceed the
+client's timeouts. If a worker dies after Didit answered but before the
+result committed, the job is retried and Didit may hold an orphaned
+session; no swap ever points at it.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from swap.models import SwapSession
+from swap.services.didit import didit_session_payload
+from swap.services.didit_client import DiditUnavailable, get_didit_client
+from swap.services.events import publish_session_events
+from swap.services.transitions import transition
+from vetting.models import DiditSessionJob
+
+logger = logging.getLogger(__name__)
+
+
+def didit_jobs_config(key, default=None):
+    return getattr(settings, "DIDIT_JOBS", {}).get(key, default)
+
+
+def enqueue_didit_session(session):
+    """Move the session to DIDIT_PENDING and queue its Didit session. Safe to repeat."""
+    with transaction.atomic():
+        transition(session, "DIDIT_PENDING")
+        job, _ = DiditSessionJob.objects.get_or_create(session=session)
+    return job
+
+
+def queued_didit_response(session):
+    """Primary vetting response for a session whose Didit session is queued."""
+    return {
+        "passed": True,
+        "next_step": "DIDIT",
+        "stage": session.stage,
+        "status_url": reverse("session-status", args=[session.id])
+    }
+
+
+def stored_didit_response(session):
+    """Primary vetting response for a retry once the Didit session is stored."""
+    return {
+        "passed": True,
+        "next_step": "DIDIT",
+        "didit_session": {"session_id": session.didit_session_id, "url": session.didit_url}
+    }
+
+
+class DiditJobRunner:
+    def __init__(self, client=None, batch_size=None, max_attempts=None, claim_timeout=None):
+        self.client = client or get_didit_client()
+        self.batch_size = batch_size or didit_jobs_config("BATCH_SIZE", 20)
+        self.max_attempts = max_attempts or didit_jobs_config("MAX_ATTEMPTS", 5)
+        self.claim_timeout = claim_timeout or didit_jobs_config("CLAIM_TIMEOUT", 120.0)
+
+    def _create(self, session):
+        try:
+            return self.client.create_session(didit_session_payload(session)), None
+        except Exception as e:
+            return None, e
+
+    def claim(self):
+        """
+        Mark one batch of jobs RUNNING and return them. Jobs whose session
+        already has a Didit session, or no longer waits for one, are
+        finished here instead.
+        """
+        with transaction.atomic():
+            now = timezone.now()
+            stale = now - timedelta(seconds=self.claim_timeout)
+            jobs = list(
+                DiditSessionJob.objects
+                .select_for_update(skip_locked=True, of=("self",))
+                .select_related("session")
+                .filter(Q(status="QUEUED") | Q(status="RUNNING", claimed_at__lt=stale))
+                .order_by("id")[: self.batch_size]
+            )
+
+            claimed = []
+            for job in jobs:
+                session = job.session
+                if session.didit_session_id:
+                    job.status, job.finished_at = "DONE", now
+                elif session.is_locked or session.stage != "DIDIT_PENDING":
+                    job.status, job.finished_at = "FAILED", now
+                    job.last_error = f"Session is {session.stage}"
+                else:
+                    job.status, job.claimed_at = "RUNNING", now
+                    claimed.append(job)
+
+            DiditSessionJob.objects.bulk_update(jobs, ["status", "last_error", "claimed_at", "finished_at"])
+        return jobs, claimed
+
+    def run_once(self):
+        """
+        Process one batch of queued jobs. Returns the number of jobs that
+        reached Didit or were finished without it; 0 when the queue is
+        empty or the breaker is open.
+        """
+        jobs, claimed = self.claim()
+        if not jobs:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=max(len(claimed), 1)) as pool:
+            results = list(pool.map(self._create, [job.session for job in claimed]))
+
+        now = timezone.now()
+        sessions = []
+        attempted = 0
+        for job, (data, error) in zip(claimed, results):
+            job.status = "QUEUED"
+            if isinstance(error, DiditUnavailable):
+                # Didit was never called; try again once the breaker closes
+                continue
+            attempted += 1
+            job.attempts += 1
+            if error is not None:
+                job.last_error = str(error)
+                if job.attempts >= self.max_attempts:
+                    job.status, job.finished_at = "FAILED", now
+                logger.error(f"Didit job {job.id} (session {job.session_id}) failed: {error}")
+                continue
+
+            session = job.session
+            session.didit_session_id = data.get("session_id")
+            session.didit_url = data.get("url")
+            session.updated_at = now
+            sessions.append(session)
+            job.status, job.finished_at, job.last_error = "DONE", now, ""
+
+        with transaction.atomic():
+            SwapSession.objects.bulk_update(sessions, ["didit_session_id", "didit_url", "updated_at"])
+            # Clients waiting on /swap/session/<id>/events/ get the URL as soon as this commits
+            publish_session_events(sessions)
+            DiditSessionJob.objects.bulk_update(claimed, ["status", "attempts", "last_error", "finished_at"])
+
+        logger.info(f"Didit job runner processed {len(jobs)} jobs ({len(sessions)} sessions created)")
+        return attempted + len(jobs) - len(claimed)
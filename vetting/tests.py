@@ -1,3 +1,266 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection, connections
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from customers.models import Customer
+from lines.models import Line
+from swap.models import SwapSession
+from swap.services import didit_client
+from swap.services.didit_client import AsyncDiditClient, DiditClient
+from swap.services.didit_stub import DiditStubServer
+from vetting.async_views import DiditWebhookAsyncView, PrimaryVettingAsyncView
+from vetting.models import DiditSessionJob, DiditWebhookInbox
+from vetting.services.didit_inbox import DiditInboxProcessor, inbox_metrics
+from vetting.services.didit_jobs import DiditJobRunner, enqueue_didit_session
+
+
+class DiditJobTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(msisdn="254700000002", full_name="Test", id_number="2", yob=1990)
+        self.session = SwapSession.objects.create(line=Line.objects.get(msisdn=customer.msisdn), stage="PRIMARY_PASSED")
+        self.stub = DiditStubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.client = DiditClient(base_url=self.stub.url, api_key="key")
+        self.addCleanup(self.client.close)
+
+    def test_creates_one_didit_session_per_swap(self):
+        enqueue_didit_session(self.session)
+        enqueue_didit_session(self.session)
+        self.assertEqual(DiditSessionJob.objects.count(), 1)
+
+        runner = DiditJobRunner(client=self.client)
+        self.assertEqual(runner.run_once(), 1)
+        self.assertEqual(runner.run_once(), 0)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.stage, "DIDIT_PENDING")
+        self.assertTrue(self.session.didit_url.startswith(self.stub.url))
+        self.assertEqual(self.session.didit_job.status, "DONE")
+        self.assertEqual(len(self.stub.requests), 1)
+
+        # A retried primary vetting request must not queue a second session
+        enqueue_didit_session(self.session)
+        self.assertEqual(runner.run_once(), 0)
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_failures_are_retried_then_given_up(self):
+        self.stub.status = 400
+        enqueue_didit_session(self.session)
+
+        runner = DiditJobRunner(client=self.client, max_attempts=2)
+        runner.run_once()
+        self.assertEqual(DiditSessionJob.objects.get().status, "QUEUED")
+        runner.run_once()
+        job = DiditSessionJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ("FAILED", 2))
+
+    def test_jobs_of_a_dead_worker_are_claimed_again(self):
+        job = enqueue_didit_session(self.session)
+        DiditSessionJob.objects.filter(pk=job.pk).update(status="RUNNING", claimed_at=timezone.now())
+
+        runner = DiditJobRunner(client=self.client, claim_timeout=60)
+        self.assertEqual(runner.run_once(), 0)
+        self.assertEqual(len(self.stub.requests), 0)
+
+        DiditSessionJob.objects.filter(pk=job.pk).update(claimed_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(runner.run_once(), 1)
+        self.assertEqual(DiditSessionJob.objects.get().status, "DONE")
+
+
+class DiditJobTransactionTests(TransactionTestCase):
+    def test_didit_is_called_outside_a_transaction(self):
+        customer = Customer.objects.create(msisdn="254700000006", full_name="Test", id_number="6", yob=1990)
+        session = SwapSession.objects.create(line=Line.objects.get(msisdn=customer.msisdn), stage="PRIMARY_PASSED")
+        enqueue_didit_session(session)
+        runner_connection = connections["default"]
+        seen = []
+
+        class Client:
+            def create_session(self, payload):
+                try:
+                    # Another worker sees the committed claim and leaves the job alone
+                    seen.append((runner_connection.in_atomic_block, DiditJobRunner(client=self).claim()))
+                finally:
+                    connection.close()
+                return {"session_id": "d-6", "url": "https://didit.example/d-6"}
+
+        self.assertEqual(DiditJobRunner(client=Client()).run_once(), 1)
+        self.assertEqual(seen, [(False, ([], []))])
+        session.refresh_from_db()
+        self.assertEqual((session.didit_session_id, session.didit_job.status), ("d-6", "DONE"))
+
+
+@override_settings(DIDIT_JOBS={"ASYNC": True})
+class PrimaryVettingRetryTests(TestCase):
+    def test_retry_after_the_job_is_queued_gets_the_same_answer(self):
+        customer = Customer.objects.create(msisdn="254700000007", full_name="Test", id_number="7", yob=1990)
+        session = SwapSession.objects.create(line=Line.objects.get(msisdn=customer.msisdn), stage="STARTED")
+        body = {"session_id": session.id, "full_name": "Test", "id_number": "7", "yob": 1990}
+
+        first = self.client.post("/swap/primary/", body, content_type="application/json")
+        retry = self.client.post("/swap/primary/", body, content_type="application/json")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(first.json()["stage"], "DIDIT_PENDING")
+        self.assertEqual(DiditSessionJob.objects.count(), 1)
+        session.refresh_from_db()
+        self.assertEqual(session.primary_attempts, 1)
+
+    @override_settings(DIDIT_JOBS={"ASYNC": False})
+    def test_retry_after_the_didit_session_is_created_gets_it_back(self):
+        customer = Customer.objects.create(msisdn="254700000008", full_name="Test", id_number="8", yob=1990)
+        session = SwapSession.objects.create(line=Line.objects.get(msisdn=customer.msisdn), stage="STARTED")
+        body = {"session_id": session.id, "full_name": "Test", "id_number": "8", "yob": 1990}
+        stub = DiditStubServer().start()
+        self.addCleanup(stub.stop)
+
+        previous, didit_client._client = didit_client._client, DiditClient(base_url=stub.url, api_key="key")
+        try:
+            first = self.client.post("/swap/primary/", body, content_type="application/json")
+            retry = self.client.post("/swap/primary/", body, content_type="application/json")
+        finally:
+            didit_client._client = previous
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        session.refresh_from_db()
+        self.assertEqual(
+            retry.json()["didit_session"], {"session_id": session.didit_session_id, "url": session.didit_url}
+        )
+        self.assertEqual(retry.json()["didit_session"]["session_id"], first.json()["didit_session"]["session_id"])
+        self.assertEqual(session.primary_attempts, 1)
+
+
+@override_settings(DIDIT_WEBHOOK_SECRET="secret")
+class DiditInboxTests(TestCase):
+    def setUp(self):
+        sessions = []
+        for i, didit_session_id in enumerate(["d-1", "d-2"]):
+            customer = Customer.objects.create(msisdn=f"25470000003{i}", full_name="Test", id_number=f"3{i}", yob=1990)
+            line = Line.objects.get(msisdn=customer.msisdn)
+            sessions.append(SwapSession.objects.create(line=line, stage="DIDIT_PENDING", didit_session_id=didit_session_id))
+        self.passed, self.failed = sessions
+
+    def deliver(self, session_id, status, secret="secret"):
+        body = json.dumps({"session_id": session_id, "status": status}).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            "/didit/webhook/", body, content_type="application/json", headers={"X-Signature": signature}
+        )
+
+    def test_webhook_only_queues(self):
+        self.assertEqual(self.deliver("d-1", "Approved", secret="wrong").status_code, 403)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.deliver("d-1", "Approved").status_code, 200)
+        self.deliver("d-1", "Approved")
+        self.assertEqual(DiditWebhookInbox.objects.count(), 1)
+
+        self.passed.refresh_from_db()
+        self.assertEqual(self.passed.stage, "DIDIT_PENDING")
+        self.assertEqual(inbox_metrics()["backlog"], 1)
+
+    def test_processor_applies_in_bulk(self):
+        self.deliver("d-1", "Approved")
+        self.deliver("d-2", "Declined")
+        self.deliver("unknown", "Approved")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(DiditInboxProcessor().run_once(), 3)
+        self.assertEqual(DiditInboxProcessor().run_once(), 0)
+
+        self.passed.refresh_from_db()
+        self.failed.refresh_from_db()
+        self.assertEqual((self.passed.stage, self.passed.didit_status), ("DIDIT_PASSED", "approved"))
+        self.assertEqual((self.failed.stage, self.failed.is_locked), ("LOCKED", True))
+        self.assertEqual(
+            dict(DiditWebhookInbox.objects.values_list("didit_session_id", "outcome")),
+            {"d-1": "APPLIED", "d-2": "APPLIED", "unknown": ""},
+        )
+        # The unknown session's delivery waits to be retried
+        self.assertEqual(inbox_metrics()["backlog"], 1)
+
+    def test_delivery_before_the_session_id_is_retried(self):
+        SwapSession.objects.filter(pk=self.passed.pk).update(didit_session_id=None)
+        self.deliver("d-1", "Approved")
+        processor = DiditInboxProcessor(retry_delay=60)
+
+        self.assertEqual(processor.run_once(), 1)
+        self.assertEqual(processor.run_once(), 0)
+        delivery = DiditWebhookInbox.objects.get()
+        self.assertIsNone(delivery.processed_at)
+
+        # run_didit_jobs stores the id, then the retry is due
+        SwapSession.objects.filter(pk=self.passed.pk).update(didit_session_id="d-1")
+        DiditWebhookInbox.objects.update(next_attempt_at=timezone.now())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(processor.run_once(), 1)
+        self.passed.refresh_from_db()
+        self.assertEqual(self.passed.stage, "DIDIT_PASSED")
+        self.assertEqual(DiditWebhookInbox.objects.get().outcome, "APPLIED")
+
+    def test_unknown_session_is_given_up_after_the_grace_period(self):
+        self.deliver("unknown", "Approved")
+        DiditWebhookInbox.objects.update(received_at=timezone.now() - timedelta(seconds=61))
+
+        DiditInboxProcessor(unknown_grace=60).run_once()
+        delivery = DiditWebhookInbox.objects.get()
+        self.assertEqual(delivery.outcome, "UNKNOWN_SESSION")
+        self.assertIsNotNone(delivery.processed_at)
+
+    def test_decline_after_completion_is_rejected(self):
+        SwapSession.objects.filter(pk=self.passed.pk).update(stage="COMPLETED", didit_status="approved")
+        self.deliver("d-1", "Declined")
+        DiditInboxProcessor().run_once()
+
+        self.passed.refresh_from_db()
+        self.assertEqual((self.passed.stage, self.passed.is_locked), ("COMPLETED", False))
+        self.assertEqual(DiditWebhookInbox.objects.get().outcome, "INVALID_STAGE")
+
+
+class AsyncVettingViewTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(msisdn="254700000005", full_name="Test", id_number="5", yob=1990)
+        self.session = SwapSession.objects.create(line=Line.objects.get(msisdn=customer.msisdn), stage="STARTED")
+        self.stub = DiditStubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.factory = AsyncRequestFactory()
+
+    async def test_primary_creates_didit_session(self):
+        client = AsyncDiditClient(base_url=self.stub.url, api_key="key")
+        previous, didit_client._async_client = didit_client._async_client, client
+        try:
+            request = self.factory.post("/swap/primary/", {
+                "session_id": self.session.id, "full_name": "Test", "id_number": "5", "yob": 1990,
+            }, content_type="application/json")
+            response = await PrimaryVettingAsyncView.as_view()(request)
+        finally:
+            didit_client._async_client = previous
+            await client.close()
+
+        self.assertEqual(response.status_code, 200)
+        await self.session.arefresh_from_db()
+        self.assertEqual(self.session.stage, "DIDIT_PENDING")
+        self.assertTrue(self.session.didit_url.startswith(self.stub.url))
+
+    @override_settings(DIDIT_WEBHOOK_SECRET="secret")
+    async def test_webhook_queues(self):
+        body = json.dumps({"session_id": "d-1", "status": "Approved"}).encode()
+        signature = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+        view = DiditWebhookAsyncView.as_view()
+
+        for _ in range(2):
+            request = self.factory.post(
+                "/didit/webhook/", body, content_type="application/json", headers={"X-Signature": signature}
+            )
+            self.assertEqual((await view(request)).status_code, 200)
+
+        request = self.factory.post("/didit/webhook/", b"{", content_type="application/json")
+        self.assertEqual((await view(request)).status_code, 403)
+        self.assertEqual(await DiditWebhookInbox.objects.acount(), 1)
@@ -1,16 +1,22 @@
 from vetting.services.primary import evaluate_primary
 from vetting.services.secondary import evaluate_secondary
 from swap.services.lock import lock_session
+from swap.services.transitions import can_transition, transition
+from fraud.services.velocity import record_velocity, request_device
 from swap.models import SwapSession
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from vetting.models import DiditSessionJob, DiditWebhookInbox
 from vetting.serializers import PrimarySerializer, SecondarySerializer
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import status
 from swap.services.didit import verify_didit_signature, create_didit_session
+from swap.services.didit_client import DiditError
+from vetting.services.didit_jobs import (
+    didit_jobs_config, enqueue_didit_session, queued_didit_response, stored_didit_response
+)
 from vetting.services.biometric import validate_face, validate_id
 from django.db import transaction
-from blockchain.services import blockchain_service
 
 
 class PrimaryVettingView(APIView):
@@ -25,6 +31,16 @@ class PrimaryVettingView(APIView):
         if session.is_locked:
             return Response({"redirect": "retail"})
 
+        if session.stage == "DIDIT_PENDING":
+            # A client retrying after its Didit session was created or queued
+            if session.didit_session_id:
+                return Response(stored_didit_response(session))
+            if DiditSessionJob.objects.filter(session=session).exists():
+                return Response(queued_didit_response(session))
+
+        if not can_transition(session.stage, "PRIMARY_PASSED"):
+            return Response({"error": "Invalid stage"}, status=status.HTTP_400_BAD_REQUEST)
+
         customer = session.line.customer
 
         session.primary_attempts += 1
@@ -32,26 +48,33 @@ class PrimaryVettingView(APIView):
         passed = evaluate_primary(customer, serializer.validated_data)
 
         if not passed:
-            lock_session(session, "PRIMARY_FAILED")
+            lock_session(session, "PRIMARY_FAILED", primary_attempts=session.primary_attempts)
+            record_velocity(
+                "PRIMARY_FAILED", "LOCKED",
+                msisdn=session.line.msisdn, id_number=customer.id_number, device=request_device(request)
+            )
             return Response({
                 "passed": False,
                 "locked": True,
                 "redirect": "retail"
             })
         
-        session.stage = "PRIMARY_PASSED"
-        session.save()
+        if not transition(session, "PRIMARY_PASSED", primary_attempts=session.primary_attempts):
+            return Response({"error": "Session changed, retry"}, status=status.HTTP_409_CONFLICT)
 
-        # Blockchain integration: record verification
-        swap_id = str(session.swap_id) if getattr(session, "swap_id", None) else "0x0" # TODO Remove swap id for demo
-        blockchain_service.record_verification(
-            request_id=str(session.id),
-            swap_id=str(swap_id),
-            verification_type="PERSONAL_DETAILS"
-        )
+        if didit_jobs_config("ASYNC"):
+            # run_didit_jobs creates the Didit session; the client polls the status endpoint for its URL
+            enqueue_didit_session(session)
+            return Response(queued_didit_response(session))
 
         # Call Didit
-        didit_response = create_didit_session(session)
+        try:
+            didit_response = create_didit_session(session)
+        except DiditError:
+            return Response(
+                {"passed": True, "error": "Verification provider unavailable, retry shortly"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         return Response({
             "passed": True,
             "next_step": "DIDIT",
@@ -228,11 +251,9 @@ from rest_framework import status
 class DiditWebhookView(APIView):
     """
     Handles DIDIT webhook callbacks.
-    Production-safe:
-    - Signature verified
-    - Atomic transaction
-    - Row-level locking
-    - Idempotent status handling
+    Only verifies the signature and appends the delivery to
+    DiditWebhookInbox; `manage.py process_didit_inbox` applies it.
+    Redeliveries of the same status are dropped by the dedup key.
     """
 
     authentication_classes = []
@@ -246,62 +267,15 @@ class DiditWebhookView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        didit_session_id = request.data.get("session_id")
-        verification_status = (
-            request.data.get("status", "")
-            .strip()
-            .lower()
-        )
+        delivery = DiditWebhookInbox.from_payload(request.data)
 
-        if not didit_session_id:
+        if delivery is None:
             return Response(
                 {"error": "Missing session_id"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            with transaction.atomic():
-
-                # Lock row to prevent race conditions
-                session = (
-                    SwapSession.objects
-                    .select_for_update()
-                    .get(didit_session_id=didit_session_id)
-                )
-
-                # Idempotency protection
-                if session.didit_status == verification_status:
-                    return Response({"ok": True})
-
-                # Store payload & status
-                session.didit_payload = request.data
-                session.didit_status = verification_status
-
-                # Handle status transitions
-                if verification_status in ["approved", "on_review"]:
-
-                    session.stage = "DIDIT_PASSED"
-
-                    swap_id = (
-                        str(session.swap_id)
-                        if getattr(session, "swap_id", None)
-                        else "0x0"
-                    )
-
-                    blockchain_service.record_verification(
-                        request_id=str(session.id),
-                        swap_id=swap_id,
-                        verification_type="BIOMETRIC_AND_ID"
-                    )
-
-                else:
-                    session.stage = "DIDIT_FAILED"
-                    lock_session(session, "DIDIT_FAILED")
-
-                session.save()
-
-        except SwapSession.DoesNotExist:
-            # Always return 200 to prevent infinite retries
-            return Response({"ok": True})
+        DiditWebhookInbox.objects.bulk_create([delivery], ignore_conflicts=True)
 
-        return Response({"ok": True})
\ No newline at end of file
+        # Always return 200 to prevent infinite retries
+        return Response({"ok": True})